@@ -3,3 +3,4 @@ __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
 from ai.ai import AI, intent_is_real
+from ai.ai_registry import AIRegistry
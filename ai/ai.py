@@ -4,23 +4,52 @@ __version__ = "0.0.1"
 
 # copying the state of the world for reflection
 import copy
-import time
+
+# needed to hand the results of actions that run in the background over to the ai
+from collections import deque
 
 from highcliff.actions.actions import ActionStatus
 
 # AI, GOAP
-from goap.planner import RegressivePlanner
 from goap.algo.astar import PathNotFoundException
 
+# needed to plan on the ai's own thread, or in a pool of worker processes
+from highcliff.planning import LocalPlanner, CostEstimator
+
+# needed to decide which goals to pursue first
+from highcliff.goals import GoalScheduler, goals_from_definitions, goals_as_plain_data
+
 # used to create and access centralized infrastructure
 from infrastructure import LocalNetwork, AiMqttNetwork
 
+# needed to count and time the phases of each run
+from highcliff.metrics import Metrics
+
+# needed to keep a diary that can be queried while the ai runs
+from highcliff.diary import Diary
+
+# needed to run the ai on the real clock, or on a virtual clock in simulations
+from highcliff.clock import SystemClock
+
+# needed to follow the messages that lead to each run through its phases
+from highcliff.tracing import Tracer
+
+# needed to account for the memory the ai takes
+from highcliff.memory import deep_size_of, size_report, total_bytes
+
 # used to make AI a singleton
 from highcliff.singleton import Singleton
 
 # needed to log debug messages to the terminal window
 from highcliff.logging import log_event_to_the_terminal_window
 
+# the upper bounds of the buckets of the plan length and world size histograms
+_PLAN_LENGTH_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+_WORLD_SIZE_BUCKETS = (0, 10, 50, 100, 500, 1000, 5000, 10000)
+
+# the number of decimal places of the costs the ai learns. smaller changes in cost do not make the ai plan again
+_COST_DECIMAL_PLACES = 2
+
 
 def intent_is_real(intent, reality):
     is_real = True
@@ -38,40 +67,174 @@ def intent_is_real(intent, reality):
 
 @Singleton
 class AI:
-    _network = LocalNetwork.instance()
-    _goals = None
-    _capabilities = []
-    _diary = []
-    _debug_logging = False
+    def __init__(self):
+        # the clock the ai tells the time by and waits on. see set_clock
+        self._clock = SystemClock()
+
+        self._network = LocalNetwork.instance()
+        self._goals = None
+        self._goal_scheduler = GoalScheduler(clock=self._monotonic_time)
+        self._capabilities = []
+        self._diary = Diary(clock=self._time)
+        self._debug_logging = False
+        self._planner = LocalPlanner()
+
+        # learns the cost of each capability from the outcome of running it
+        self._cost_estimator = CostEstimator()
+
+        # the last plan made for each goal, reused while the world and the capabilities are unchanged
+        self._plans_by_goal = {}
+        self._capabilities_version = 0
+
+        # the time, in seconds, the ai may spend each run looking for a goal it can plan for. see _plan_within_budget
+        self._seconds_of_planning_per_run = 0
+
+        # counts and times the phases of each run. see metrics
+        self._metrics = self._new_metrics()
+
+        # links each run to the message that led to it. see Tracer
+        self._tracer = Tracer.instance()
+
+        # actions that ran in the background and finished since the last run. see complete_action
+        self._completed_actions = deque()
 
     def set_debug_logging(self, debug_logging):
         self._debug_logging = debug_logging
 
+    def debug_logging(self):
+        return self._debug_logging
+
     def network(self):
         return self._network
 
+    def set_network(self, network):
+        """Replace the network the AI perceives and acts through, for example with a network of its own"""
+        self._network = network
+
     def connect(self, endpoint="a15645u9kev0b1-ats.iot.eu-west-2.amazonaws.com",
                 port=8883, cert="/home/ubuntu/certs/certificate.pem.crt",
                 key="/home/ubuntu/certs/private.pem.key"):
         """Replace local network, which is default, with mqtt network, and connect to it"""
-        self.__network = AiMqttNetwork.instance()
-        self.__network.connect(endpoint, port, cert, key)
+        self._network = AiMqttNetwork.instance()
+        self._network.connect(endpoint, port, cert, key)
+
+    def connect_to_local_broker(self, broker):
+        """Replace local network, which is default, with mqtt network, and connect it to an in-process broker"""
+        self._network = AiMqttNetwork.instance()
+        self._network.connect_to_local_broker(broker)
+
+    def set_planner(self, planner):
+        """Replace the planner, which plans on the ai's own thread by default. See ProcessPoolPlanner"""
+        self._planner = planner
+
+    def cost_estimator(self):
+        return self._cost_estimator
+
+    def set_planning_budget(self, seconds_of_planning_per_run):
+        self._seconds_of_planning_per_run = seconds_of_planning_per_run
+
+    def set_clock(self, clock):
+        """Tell the time by, and wait on, the given clock. A VirtualClock lets simulations run far faster than real
+        time, and the same way every time"""
+        self._clock = clock
+
+    def _time(self):
+        return self._clock.time()
+
+    def _monotonic_time(self):
+        return self._clock.monotonic()
+
+    def set_tracer(self, tracer):
+        self._tracer = tracer
+
+    def metrics(self):
+        """The counters and histograms that show where the time of each run goes"""
+        return self._metrics
+
+    def memory_report(self):
+        """The number and size, in bytes, of the things the ai keeps in memory: its capabilities, goals, plan cache,
+        learned costs, diary and metrics, and the world and queues of its network. An object shared by several of
+        them is counted once, under the first to report it. See MemorySnapshots for finding the code that allocates
+        the memory"""
+        # capabilities refer back to the ai. it is not part of their size
+        seen = {id(self): self, id(self._network): self._network}
+        report = {
+            "capabilities": size_report(list(self._capabilities), seen),
+            "goals": {"bytes": deep_size_of([self._goals, self._goal_scheduler], seen)},
+            "plan_cache": size_report(dict(self._plans_by_goal), seen),
+            "cost_estimator": {"bytes": deep_size_of(self._cost_estimator, seen)},
+            "diary": self._diary.memory_report(seen),
+            "network": self._network.memory_report(seen),
+            "metrics": {"bytes": deep_size_of(self._metrics, seen)}
+        }
+        report["total_bytes"] = total_bytes(report)
+        return report
+
+    @staticmethod
+    def _new_metrics():
+        metrics = Metrics()
+        metrics.counter("highcliff_ai_runs_total", "Runs of the ai")
+        metrics.histogram("highcliff_ai_run_seconds", "Time taken by each run of the ai")
+        metrics.histogram("highcliff_ai_goal_selection_seconds", "Time taken to order the unmet goals")
+        metrics.histogram("highcliff_ai_plan_seconds", "Time taken by the planner to make a plan")
+        metrics.histogram("highcliff_ai_plan_length", "Number of actions in each plan made", _PLAN_LENGTH_BUCKETS)
+        metrics.counter("highcliff_ai_plan_cache_hits_total", "Plans reused because nothing they depend on changed")
+        metrics.counter("highcliff_ai_plan_cache_misses_total", "Plans made because there was none to reuse")
+        metrics.counter("highcliff_ai_plans_not_found_total", "Plans asked for that could not be made")
+        metrics.histogram("highcliff_ai_action_seconds", "Time taken to run each action")
+        metrics.counter("highcliff_ai_action_outcomes_total", "Outcomes of each run, by action status")
+        metrics.gauge("highcliff_ai_world_state_size", "Number of conditions in the world at the start of the last run")
+        metrics.histogram("highcliff_ai_world_state_size_per_run", "Number of conditions in the world at the start "
+                                                                   "of each run", _WORLD_SIZE_BUCKETS)
+        return metrics
 
     def set_goals(self, goals):
-        self._goals = goals
+        """Set the goals of the ai. Goals may be a flat dictionary of conditions and values, in which earlier goals
+        come first, or a dictionary of conditions and goal definitions with a value, priority, deadline and weight.
+        See Goal"""
+        goal_list = goals_from_definitions(goals) if goals is not None else []
+
+        # plans made for goals that have not changed stay valid
+        previous_goals = {goal.condition: goal.value for goal in self._goal_scheduler.goals()}
+        new_goals = {goal.condition: goal.value for goal in goal_list}
+        changed_goals = {goal for goal in set(previous_goals) | set(new_goals)
+                         if goal not in previous_goals or goal not in new_goals
+                         or previous_goals[goal] != new_goals[goal]}
+        self._plans_by_goal = {goal: plan for goal, plan in self._plans_by_goal.items()
+                               if not any(condition in changed_goals for condition, value in goal)}
+
+        # the goals are replaced, never changed in place, so a run in progress keeps the goals it started with
+        self._goal_scheduler.set_goals(goal_list)
+        self._goals = goals_as_plain_data(goals)
+
+    def goals(self):
+        return self._goals
 
     def capabilities(self):
         return self._capabilities
 
     def add_capability(self, action):
         self._capabilities.append(action)
+        self._capabilities_version += 1
 
         # log the registration of the action
         if self._debug_logging:
             log_event_to_the_terminal_window("Registered an action " +
                                              str(action) + " with effects " + str(action.effects))
 
-    # TODO: add code to remove a capability
+    def remove_capability(self, action):
+        # the ai stops planning with an action that is no longer available. the action is found by identity, so
+        # that removing an action registered by a client that has gone away never calls back to the client
+        remaining_capabilities = [capability for capability in self._capabilities if capability is not action]
+        if len(remaining_capabilities) == len(self._capabilities):
+            return
+        self._capabilities[:] = remaining_capabilities
+        self._capabilities_version += 1
+        self._cost_estimator.forget(action)
+
+        # log the removal of the action
+        if self._debug_logging:
+            log_event_to_the_terminal_window("Removed an action " + type(action).__name__)
 
     def run(self, life_span_in_iterations):
         seconds_to_pause_between_ai_runs = 2
@@ -92,7 +255,7 @@ class AI:
         while True:
             self._run_ai()
             # pause to allow for processing in other areas of the ai
-            time.sleep(seconds_to_pause_between_ai_runs)
+            self._clock.sleep(seconds_to_pause_between_ai_runs)
 
     def _run_temporarily(self, life_span_in_iterations, seconds_to_pause_between_ai_runs):
         # log that the ai is running
@@ -102,62 +265,116 @@ class AI:
         for iteration in range(life_span_in_iterations):
             self._run_ai()
             # pause to allow for processing in other areas of the ai
-            time.sleep(seconds_to_pause_between_ai_runs)
+            self._clock.sleep(seconds_to_pause_between_ai_runs)
 
     def reset(self):
         self._network.reset()
         self._goals = None
-        self._diary = []
+        self._goal_scheduler = GoalScheduler(clock=self._monotonic_time)
+        self._diary = Diary(clock=self._time)
         self._capabilities = []
+        self._plans_by_goal = {}
+        self._capabilities_version += 1
+        self._cost_estimator = CostEstimator()
+        self._metrics = self._new_metrics()
+        self._completed_actions = deque()
+
+    def complete_action(self, action, actual_effects, seconds_acting):
+        """Report the actual effects of an action that runs in the background, such as a remote capability. They
+        are applied to the world at the start of the next run, so the ai never waits for the action to finish"""
+        self._completed_actions.append((action, actual_effects, seconds_acting))
+
+    def time_out_action(self, action, seconds_acting):
+        """Report that an action that runs in the background did not finish in time. It has no effect on the world,
+        and is learned from as a failure on the next run"""
+        self._completed_actions.append((action, None, seconds_acting))
+
+    def _apply_completed_actions(self):
+        while self._completed_actions:
+            action, actual_effects, seconds_acting = self._completed_actions.popleft()
+            if actual_effects is None:
+                action_status = ActionStatus.FAIL
+            else:
+                action.update_the_world(self._network, actual_effects)
+
+                # the action is a success if the world now matches its intended effect
+                action_status = ActionStatus.SUCCESS if intent_is_real(action.effects, self._get_world_state()) \
+                    else ActionStatus.FAIL
+            self._metrics.get("highcliff_ai_action_seconds").observe(seconds_acting)
+            self._learn_the_cost_of(action, action_status, seconds_acting)
 
     def _get_world_state(self):
         # this function returns the current state of the world
         return self._network.the_world()
 
-    def _select_goal(self, prioritized_goals):
-        # work on the next highest-priority goal that has not yet been met
-
-        # the default is to select an empty goal
-        selected_goal = {}
-
-        # go through goals in priority order
-        for goal in self._goals:
-            # if the condition is not in the world, add it to the world, assume the goal is not met, pursue the goal
-            if goal not in self._get_world_state():
-                goal_not_met = not self._goals[goal]
-                self._network.update_the_world({goal: goal_not_met})
-                selected_goal = {goal: self._goals[goal]}
+    def _select_goals(self):
+        # the unmet goals, most urgent first. see GoalScheduler
+        candidate_goals = self._goal_scheduler.schedule(self._get_world_state())
+
+        # if the condition of the selected goal is not in the world, add it to the world and assume the goal is not met
+        if candidate_goals:
+            self._record_the_condition_of(candidate_goals[0])
+
+        return candidate_goals
+
+    def _record_the_condition_of(self, goal):
+        if goal.condition not in self._get_world_state():
+            self._network.update_the_world({goal.condition: not goal.value})
+
+    def _plan_within_budget(self, candidate_goals):
+        # plan for the most urgent goal. while there is planning time left, fall back to less urgent goals when the
+        # more urgent ones cannot be planned for
+        if not candidate_goals:
+            return {}, self._plan({})
+
+        planning_ends = self._clock.monotonic() + self._seconds_of_planning_per_run
+        selected_goal, selected_plan = candidate_goals[0], None
+        for candidate_goal in candidate_goals:
+            # a less urgent goal is only recorded in the world once the ai falls back to it
+            self._record_the_condition_of(candidate_goal)
+            plan = self._plan({candidate_goal.condition: candidate_goal.value})
+            if candidate_goal is candidate_goals[0]:
+                selected_plan = plan
+            if plan:
+                selected_goal, selected_plan = candidate_goal, plan
                 break
-
-            # if the goal is already met (matches the condition of the world) then skip it
-            if self._goals[goal] == self._get_world_state()[goal]:
-                pass
-
-            # if the goal is not met (mismatches the condition of the world) pursue it
-            if self._goals[goal] != self._get_world_state()[goal]:
-                selected_goal = {goal: self._goals[goal]}
+            if self._clock.monotonic() >= planning_ends:
                 break
 
-        return selected_goal
+        self._goal_scheduler.pursued(selected_goal)
+        return {selected_goal.condition: selected_goal.value}, selected_plan
 
-    def _reflect(self, goal, world_state_before, plan, action_status, world_state_after):
+    def _reflect(self, goal, world_state_before, plan, action_status, world_state_after, seconds_acting=None):
         diary_entry = {
             "my_goal": goal,
             "the_world_state_before": world_state_before,
             "my_plan": plan,
             "action_status": action_status,
-            "the_world_state_after": world_state_after
+            "the_world_state_after": world_state_after,
+            "seconds_acting": seconds_acting
         }
         self._diary.append(diary_entry)
 
     def _plan(self, goal):
-        # create a planner capable of achieving the selected goal
-        planner = RegressivePlanner(self._get_world_state(), self.capabilities())
+        # reuse the last plan for this goal if nothing it depended on has changed
+        cached_plan = self._plans_by_goal.get(tuple(goal.items()))
+        if cached_plan is not None:
+            world_state, capabilities_version, plan = cached_plan
+            if capabilities_version == self._capabilities_version and world_state == self._get_world_state():
+                self._metrics.get("highcliff_ai_plan_cache_hits_total").increment()
+                return plan
+
+        self._metrics.get("highcliff_ai_plan_cache_misses_total").increment()
+
+        world_state = copy.copy(self._get_world_state())
+        capabilities_version = self._capabilities_version
         plan = None
+        started_planning = self._clock.monotonic()
 
         try:
-            # make a plan
-            plan = planner.find_plan(goal)
+            # make a plan capable of achieving the selected goal
+            plan = self._planner.find_plan(self._get_world_state(), self.capabilities(), goal)
+            self._metrics.get("highcliff_ai_plan_length").observe(len(plan))
 
             # log that a plan has been created
             if self._debug_logging:
@@ -177,6 +394,11 @@ class AI:
             if self._debug_logging:
                 log_event_to_the_terminal_window("The AI has no registered actions capable of satisfying the goal")
 
+        self._metrics.get("highcliff_ai_plan_seconds").observe(self._clock.monotonic() - started_planning)
+        if plan is None:
+            self._metrics.get("highcliff_ai_plans_not_found_total").increment()
+
+        self._plans_by_goal[tuple(goal.items())] = (world_state, capabilities_version, plan)
         return plan
 
     def _act(self, plan):
@@ -213,12 +435,20 @@ class AI:
         return intended_effect
 
     def _run_ai(self):
-        # select a single goal from the list of goals
-        goal = self._select_goal(self._goals)
+        started_run = self._clock.monotonic()
 
-        # log that a goal has been selected
-        if self._debug_logging:
-            log_event_to_the_terminal_window("The AI has selected a goal: " + str(goal))
+        # actions that finished in the background since the last run change the world this run starts from
+        self._apply_completed_actions()
+
+        run_started_at = self._clock.time()
+        world_state_size = len(self._get_world_state())
+        self._metrics.get("highcliff_ai_world_state_size").set(world_state_size)
+        self._metrics.get("highcliff_ai_world_state_size_per_run").observe(world_state_size)
+
+        # order the unmet goals by urgency
+        candidate_goals = self._select_goals()
+        seconds_selecting = self._clock.monotonic() - started_run
+        self._metrics.get("highcliff_ai_goal_selection_seconds").observe(seconds_selecting)
 
         # start by assuming that there is no plan, the action will have no effect and will fail
         action_status = ActionStatus.FAIL
@@ -226,12 +456,24 @@ class AI:
         # take a snapshot of the current world state before taking action that may change it
         world_state_snapshot = copy.copy(self._get_world_state())
 
-        # make a plan
-        plan = self._plan(goal)
+        # make a plan for the most urgent goal that can be planned for
+        started_planning = self._clock.monotonic()
+        goal, plan = self._plan_within_budget(candidate_goals)
+        seconds_planning = self._clock.monotonic() - started_planning
+
+        # a run with a goal carries on the trace of the message that led to it
+        trace_id = self._trace_of(goal, plan) if goal and self._tracer.enabled() else None
+
+        # log that a goal has been selected
+        if self._debug_logging:
+            log_event_to_the_terminal_window("The AI has selected a goal: " + str(goal))
 
         # execute the first act in the plan. it will affect the world and get us one step closer to the goal
         # the plan will be updated and actions executed until the goal is reached
-        intended_effect = self._act(plan)
+        started_acting = self._clock.monotonic()
+        with self._tracer.working_on(trace_id):
+            intended_effect = self._act(plan)
+        seconds_acting = self._clock.monotonic() - started_acting
 
         # the action is a success if the altered world matches the action's intended effect
         actual_effect = copy.copy(self._get_world_state())
@@ -239,8 +481,63 @@ class AI:
         if action_had_intended_effect:
             action_status = ActionStatus.SUCCESS
 
+        # an action that runs in the background has not had its effect yet
+        action_in_progress = bool(plan) and plan[0].action.in_progress()
+        if action_in_progress:
+            action_status = ActionStatus.IN_PROGRESS
+
         # record the results of this iteration
-        self._reflect(copy.copy(goal), world_state_snapshot, copy.copy(plan), copy.copy(action_status), copy.copy(self._get_world_state()))
+        self._reflect(copy.copy(goal), world_state_snapshot, copy.copy(plan), copy.copy(action_status), copy.copy(self._get_world_state()),
+                      seconds_acting if plan else None)
+
+        # learn what the action costs from how it turned out. an action still running in the background is learned
+        # from when it finishes
+        if plan and not action_in_progress:
+            self._metrics.get("highcliff_ai_action_seconds").observe(seconds_acting)
+            self._learn_the_cost_of(plan[0].action, action_status, seconds_acting)
+
+        self._metrics.get("highcliff_ai_action_outcomes_total").increment(status=action_status.value)
+        self._metrics.get("highcliff_ai_runs_total").increment()
+        self._metrics.get("highcliff_ai_run_seconds").observe(self._clock.monotonic() - started_run)
+
+        if trace_id is not None:
+            phases = {"select goals": (started_run, started_run + seconds_selecting),
+                      "plan": (started_planning, started_planning + seconds_planning),
+                      "act": (started_acting, started_acting + seconds_acting)}
+            self._trace_the_run(trace_id, run_started_at, started_run, phases, goal, plan, action_status)
+
+    def _trace_of(self, goal, plan):
+        # the trace that last set the goal's condition, or the conditions the first action of the plan depends on
+        conditions = list(goal) + (list(plan[0].action.preconditions) if plan else [])
+        trace_ids = self._network.trace_ids_of(conditions)
+        for condition in conditions:
+            if condition in trace_ids:
+                return trace_ids[condition]
+
+        # a run that no traced message led to starts a trace of its own
+        return self._tracer.new_id()
+
+    def _trace_the_run(self, trace_id, run_started_at, started_run, phases, goal, plan, action_status):
+        # the phases were timed on the monotonic clock. spans are placed on the wall clock, where messages are
+        def wall_clock(monotonic_time):
+            return run_started_at + monotonic_time - started_run
+
+        ended_run = max(ended for started, ended in phases.values())
+        run_span_id = self._tracer.record("ai run", trace_id, run_started_at, ended_run - started_run,
+                                          goal=goal, action=type(plan[0].action).__name__ if plan else None,
+                                          action_status=action_status.value)
+        for phase, (started, ended) in phases.items():
+            self._tracer.record(phase, trace_id, wall_clock(started), ended - started, run_span_id)
+
+    def _learn_the_cost_of(self, action, action_status, seconds_acting):
+        estimated_cost = round(self._cost_estimator.record(action, action_status == ActionStatus.SUCCESS,
+                                                           seconds_acting), _COST_DECIMAL_PLACES)
+
+        # a change in cost may change the best plan. the planner only sees rounded costs, so the plans are kept until
+        # the cost changes by more than the rounding
+        if estimated_cost != action.get_cost({}):
+            action.estimated_cost = estimated_cost
+            self._capabilities_version += 1
 
     def diary(self):
         return self._diary
@@ -0,0 +1,145 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to copy plain data to and from the ai server
+import json
+
+# needed to give each remote capability a unique id
+from uuid import uuid4
+
+# needed to run capability behaviors and heartbeats without holding up the connection
+from threading import Thread, Event
+
+# needed to serve the server's requests to run capability behaviors
+import rpyc
+
+
+class AIServiceError(Exception):
+    pass
+
+
+class AIClient:
+    """A client for the plain-data service api of the AI server. Calls are queued and sent to the server together,
+    in a single round trip, when the client is flushed. Flushing returns the results of the queued calls"""
+    def __init__(self, connection, tenant_id=None, seconds_between_heartbeats=10):
+        self._connection = connection
+        self._tenant_id = tenant_id
+        self._queued_requests = []
+
+        # the behaviors of the capabilities this client registered, by capability id
+        self._behaviors = {}
+        self._serving_thread = None
+
+        # the capabilities this client registers are held under a lease, kept alive by regular heartbeats
+        self._lease_id = str(uuid4())
+        self._seconds_between_heartbeats = seconds_between_heartbeats
+        self._heartbeat_thread = None
+        self._closed = Event()
+
+    def register_capability(self, effects, preconditions, behavior, cost=1.0, timeout=10, name=None):
+        """Register a capability by value. The behavior is called with a dictionary of the intended effects
+        and may change it to report the actual effects. If the behavior takes longer than the timeout, in seconds,
+        the AI treats the action as having had no effect"""
+        capability_id = str(uuid4())
+        self._behaviors[capability_id] = behavior
+
+        # the server asks for behaviors to be run at any time, not only while the client is making a call
+        if self._serving_thread is None:
+            self._serving_thread = rpyc.BgServingThread(self._connection)
+            self._heartbeat_thread = Thread(target=self._send_heartbeats, daemon=True)
+            self._heartbeat_thread.start()
+
+        self._queue("register_capability", capability_id=capability_id, effects=effects,
+                    preconditions=preconditions, cost=cost, timeout=timeout, name=name)
+        return capability_id
+
+    def remove_capability(self, capability_id):
+        self._queue("remove_capability", capability_id=capability_id)
+        self._behaviors.pop(capability_id, None)
+
+    def update_the_world(self, update):
+        self._queue("update_the_world", update=update)
+
+    def the_world(self):
+        self._queue("the_world")
+
+    def set_goals(self, goals):
+        self._queue("set_goals", goals=goals)
+
+    def diary_length(self):
+        self._queue("diary_length")
+
+    def diary_page(self, start=0, count=50):
+        self._queue("diary_page", start=start, count=count)
+
+    def diary_query(self, goal=None, action=None, status=None, since=None, until=None, start=0, count=50):
+        self._queue("diary_query", goal=goal, action=action, status=status, since=since, until=until, start=start,
+                    count=count)
+
+    def diary_count(self, goal=None, action=None, status=None, since=None, until=None):
+        self._queue("diary_count", goal=goal, action=action, status=status, since=since, until=until)
+
+    def diary_success_rate(self, goal=None, action=None, since=None, until=None):
+        self._queue("diary_success_rate", goal=goal, action=action, since=since, until=until)
+
+    def diary_summary(self, since=None, until=None, percentiles=(50, 95, 99)):
+        self._queue("diary_summary", since=since, until=until, percentiles=list(percentiles))
+
+    def metrics(self):
+        self._queue("metrics")
+
+    def memory_report(self):
+        self._queue("memory_report")
+
+    def flush(self):
+        """Send every queued call to the server in one batch and return their results, in order"""
+        requests, self._queued_requests = self._queued_requests, []
+        if not requests:
+            return []
+
+        responses = json.loads(self._connection.root.call(json.dumps(requests), self._dispatch,
+                                                             self._lease_id))
+
+        results = []
+        for request, response in zip(requests, responses):
+            if "error" in response:
+                raise AIServiceError(request["method"] + " failed: " + response["error"])
+            results.append(response["result"])
+        return results
+
+    def heartbeat(self):
+        """Renew the lease on this client's capabilities"""
+        renewal = [{"method": "renew_lease", "args": {"lease_id": self._lease_id}, "tenant": self._tenant_id}]
+        self._connection.root.call(json.dumps(renewal))
+
+    def close(self):
+        """Unregister this client's capabilities from the AI"""
+        self._closed.set()
+        if self._serving_thread is not None:
+            release = [{"method": "release_lease", "args": {"lease_id": self._lease_id}, "tenant": self._tenant_id}]
+            self._connection.root.call(json.dumps(release))
+            self._serving_thread.stop()
+            self._serving_thread = None
+
+    def _send_heartbeats(self):
+        while not self._closed.wait(self._seconds_between_heartbeats):
+            self.heartbeat()
+
+    def _queue(self, method, **args):
+        self._queued_requests.append({"method": method, "args": args, "tenant": self._tenant_id})
+
+    def _dispatch(self, capability_id, request_id, intended_effects_json):
+        # the ai asks for a behavior to be run. run it in the background and report back when it completes
+        behavior_thread = Thread(target=self._run_behavior, args=(capability_id, request_id, intended_effects_json),
+                                 daemon=True)
+        behavior_thread.start()
+
+    def _run_behavior(self, capability_id, request_id, intended_effects_json):
+        actual_effects = json.loads(intended_effects_json)
+        self._behaviors[capability_id](actual_effects)
+
+        # report the actual effects of the behavior as plain data
+        completion = [{"method": "complete_action", "args": {"request_id": request_id, "actual_effects": actual_effects},
+                       "tenant": self._tenant_id}]
+        self._connection.root.call(json.dumps(completion))
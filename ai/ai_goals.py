@@ -0,0 +1,96 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to read goal files
+import json
+import os
+
+# needed to watch the goal file in the background
+import threading
+
+# needed to read goal definitions
+from highcliff.goals import goals_from_definitions, InvalidGoal
+
+# needed to log debug messages to the terminal window
+from highcliff.logging import log_event_to_the_terminal_window
+
+
+class InvalidGoals(Exception):
+    pass
+
+
+def validate_goals(goals):
+    """Goals are a json object that maps each condition of the world to the plain value the AI should bring it to,
+    or to a goal definition with a value, priority, deadline and weight. See Goal"""
+    if not isinstance(goals, dict):
+        raise InvalidGoals("goals must be a json object, not " + type(goals).__name__)
+    try:
+        goal_list = goals_from_definitions(goals)
+    except InvalidGoal as error:
+        raise InvalidGoals(str(error))
+    for goal in goal_list:
+        if not isinstance(goal.value, (bool, int, float, str)):
+            raise InvalidGoals("the goal for " + goal.condition + " must be a boolean, number or string")
+    return goals
+
+
+def load_goals(goals_file_path):
+    try:
+        with open(goals_file_path) as json_file:
+            return validate_goals(json.load(json_file))
+    except ValueError as error:
+        raise InvalidGoals(str(error))
+
+
+class GoalFileWatcher:
+    """Watches a goal file by polling its modification time. When the file changes, its goals are validated and, if
+    valid, handed to the given callback. Invalid goals are reported and ignored, so the AI keeps its current goals"""
+    def __init__(self, goals_file_path, on_new_goals, seconds_between_checks=1.0, debug_logging=False):
+        self._goals_file_path = goals_file_path
+        self._on_new_goals = on_new_goals
+        self._seconds_between_checks = seconds_between_checks
+        self._debug_logging = debug_logging
+        self._last_seen_version = self._file_version()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _file_version(self):
+        try:
+            file_status = os.stat(self._goals_file_path)
+        except FileNotFoundError:
+            return None
+        return file_status.st_mtime_ns, file_status.st_size
+
+    def check(self):
+        """Load the goal file if it has changed since it was last seen. Returns true if new goals were handed over"""
+        version = self._file_version()
+        if version is None or version == self._last_seen_version:
+            return False
+        self._last_seen_version = version
+
+        try:
+            goals = load_goals(self._goals_file_path)
+        except (InvalidGoals, OSError) as error:
+            log_event_to_the_terminal_window("Ignored the changed goal file " + self._goals_file_path + ": " +
+                                             str(error))
+            return False
+
+        self._on_new_goals(goals)
+
+        # log the new goals
+        if self._debug_logging:
+            log_event_to_the_terminal_window("Reloaded the goals from " + self._goals_file_path + ": " + str(goals))
+
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _watch(self):
+        while not self._stopped.wait(self._seconds_between_checks):
+            self.check()
@@ -0,0 +1,124 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to give each tenant a goal set of its own
+import copy
+
+# needed to keep the registry consistent while tenants come and go
+import threading
+
+# needed to share a pool of workers between the tenants
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ai import AI
+
+# needed to give each tenant a world of its own
+from infrastructure import LocalNetwork
+
+# needed to log debug messages to the terminal window
+from highcliff.logging import log_event_to_the_terminal_window
+
+# needed to pause between rounds of ai runs, on the real clock or on a virtual clock in simulations
+from highcliff.clock import SystemClock
+
+
+class TenantAlreadyRegistered(Exception):
+    pass
+
+
+class AIRegistry:
+    """Hosts many independent AI instances, one per tenant (a home, for example), in a single process.
+    Every tenant has its own network, goals, capabilities and diary. Their runs share a pool of workers"""
+    def __init__(self, number_of_workers=4, debug_logging=False, planner=None):
+        self._tenants = {}
+        self._lock = threading.Lock()
+        self._workers = ThreadPoolExecutor(max_workers=number_of_workers, thread_name_prefix="ai-tenant")
+        self._debug_logging = debug_logging
+
+        # a planner shared by every tenant. by default, each tenant plans on its own worker thread
+        self._planner = planner
+
+        # the clock the registry, and every tenant's ai, tell the time by and wait on. see set_clock
+        self._clock = SystemClock()
+
+    def set_clock(self, clock):
+        """Tell the time by, and wait on, the given clock, in the registry and in every tenant's AI. A VirtualClock
+        lets simulations run far faster than real time"""
+        with self._lock:
+            self._clock = clock
+            tenant_ais = list(self._tenants.values())
+        for ai in tenant_ais:
+            ai.set_clock(clock)
+
+    def create(self, tenant_id, goals=None, network=None):
+        """Create an isolated AI for the given tenant. Unless a network is given, the AI gets a local network of its
+        own"""
+        ai = AI.new_instance()
+        ai.set_network(network if network is not None else LocalNetwork.new_instance())
+        ai.set_debug_logging(self._debug_logging)
+        ai.set_clock(self._clock)
+        if self._planner is not None:
+            ai.set_planner(self._planner)
+        if goals is not None:
+            ai.set_goals(copy.deepcopy(goals))
+
+        with self._lock:
+            if tenant_id in self._tenants:
+                raise TenantAlreadyRegistered(tenant_id)
+            self._tenants[tenant_id] = ai
+
+        # log the new tenant
+        if self._debug_logging:
+            log_event_to_the_terminal_window("Created an AI for tenant " + str(tenant_id))
+
+        return ai
+
+    def get(self, tenant_id):
+        with self._lock:
+            return self._tenants[tenant_id]
+
+    def get_or_create(self, tenant_id, goals=None):
+        with self._lock:
+            if tenant_id in self._tenants:
+                return self._tenants[tenant_id]
+        try:
+            return self.create(tenant_id, goals)
+        except TenantAlreadyRegistered:
+            # another client created the tenant at the same time
+            return self.get(tenant_id)
+
+    def remove(self, tenant_id):
+        with self._lock:
+            return self._tenants.pop(tenant_id)
+
+    def tenants(self):
+        with self._lock:
+            return list(self._tenants.keys())
+
+    def run_once(self):
+        """Run one iteration of every tenant's AI on the worker pool and wait for them all to finish"""
+        with self._lock:
+            tenant_ais = [ai for ai in self._tenants.values() if ai._goals is not None]
+
+        # a tenant's AI never runs concurrently with itself: each appears once per round
+        runs = [self._workers.submit(ai._run_ai) for ai in tenant_ais]
+        wait(runs)
+
+        # report problems in one tenant without stopping the others
+        for run in runs:
+            if run.exception() is not None and self._debug_logging:
+                log_event_to_the_terminal_window("A tenant's AI failed to run: " + str(run.exception()))
+
+    def run(self, life_span_in_iterations, seconds_to_pause_between_ai_runs=2):
+        """Run every tenant's AI for the given number of iterations, or forever if the life span is -1"""
+        iteration = 0
+        while life_span_in_iterations < 0 or iteration < life_span_in_iterations:
+            self.run_once()
+            iteration += 1
+
+            # pause to allow for processing in other areas of the ai
+            self._clock.sleep(seconds_to_pause_between_ai_runs)
+
+    def shutdown(self):
+        self._workers.shutdown(wait=True)
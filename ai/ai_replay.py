@@ -0,0 +1,129 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to measure the cost of processing each message and each run, and to pace replays in real time
+import time
+
+# needed to feed recorded messages to the ai the way a broker would
+import json
+
+from ai import AI
+
+# needed to give the replayed ai a world of its own, updated from recorded traffic
+from infrastructure import AiMqttNetwork, LocalBroker
+
+# needed to replay recorded time without waiting for it
+from highcliff.clock import VirtualClock
+
+# needed to describe the actions the ai decided on
+from highcliff.diary import describe_action
+
+
+def _summarise(timings):
+    if not timings:
+        return {"count": 0}
+    ordered_timings = sorted(timings)
+    return {
+        "count": len(timings),
+        "total_seconds": sum(timings),
+        "p50_seconds": ordered_timings[len(ordered_timings) // 2],
+        "p99_seconds": ordered_timings[min(len(ordered_timings) - 1, int(len(ordered_timings) * 0.99))],
+        "max_seconds": ordered_timings[-1]
+    }
+
+
+class Replay:
+    """Replays recorded traffic to an ai. Each recorded message is fed to the ai's network as if its broker had just
+    delivered it, and the ai runs every given number of recorded seconds in between, on a virtual clock that follows
+    the recording. By default the replay runs as fast as it can. Given a speed, it waits out the gaps between messages
+    in real time, divided by the speed, so a speed of 1 replays with the original timing. A replay can be run again
+    with more recorded messages, and carries on from where the last run stopped"""
+    def __init__(self, ai=None, topic_rules=None, seconds_between_runs=2, speed=None, debug_logging=False):
+        self.ai = ai or AI.new_instance()
+        self.seconds_between_runs = seconds_between_runs
+        self.speed = speed
+
+        # the network prints every message it sends and receives. that output is not part of the cost
+        self.network = AiMqttNetwork.new_instance()
+        self.network.set_debug_logging(debug_logging)
+        if topic_rules is not None:
+            self.network.set_topic_rules(topic_rules)
+        self.ai.set_network(self.network)
+
+        self._broker = LocalBroker()
+        self.network.connect_to_local_broker(self._broker, client_id="replay")
+
+        # the virtual clock and the recorded time of the next run are set by the first recorded message
+        self._clock = None
+        self._next_run_at = None
+
+    def _start_the_clock(self, timestamp):
+        self._clock = VirtualClock(start=timestamp)
+        self.ai.set_clock(self._clock)
+        self.network.set_clock(self._clock)
+        self._next_run_at = timestamp
+
+    def _wait_until(self, timestamp):
+        if self.speed is not None and timestamp > self._clock.time():
+            time.sleep((timestamp - self._clock.time()) / self.speed)
+        self._clock.advance(max(0, timestamp - self._clock.time()))
+
+    def _deliver(self, recorded_message):
+        payload = recorded_message.payload
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload)
+
+        started = time.perf_counter()
+        self.network.process_external_world_update(recorded_message.topic, payload)
+        return time.perf_counter() - started
+
+    def _run_the_ai(self):
+        started = time.perf_counter()
+        self.ai._run_ai()
+        return time.perf_counter() - started
+
+    def run(self, recorded_messages, runs_after_the_last_message=1):
+        """Replay the recorded messages, in the order they were recorded, and report the ai's decisions and the cost
+        of processing each message and each run"""
+        message_timings = []
+        run_timings = []
+        replay_started = time.perf_counter()
+        recorded_start = None if self._clock is None else self._clock.time()
+
+        for recorded_message in recorded_messages:
+            if self._clock is None:
+                self._start_the_clock(recorded_message.timestamp)
+                recorded_start = recorded_message.timestamp
+
+            # the ai runs on schedule until the next message arrives
+            while self._next_run_at < recorded_message.timestamp:
+                self._wait_until(self._next_run_at)
+                run_timings.append(self._run_the_ai())
+                self._next_run_at += self.seconds_between_runs
+
+            self._wait_until(recorded_message.timestamp)
+            message_timings.append(self._deliver(recorded_message))
+
+        if self._clock is None:
+            self._start_the_clock(0)
+            recorded_start = 0
+
+        for run in range(runs_after_the_last_message):
+            self._wait_until(self._next_run_at)
+            run_timings.append(self._run_the_ai())
+            self._next_run_at += self.seconds_between_runs
+
+        return {
+            "recorded_seconds": self._clock.time() - recorded_start,
+            "replay_seconds": time.perf_counter() - replay_started,
+            "messages": _summarise(message_timings),
+            "runs": _summarise(run_timings),
+            "decisions": self.decisions()
+        }
+
+    def decisions(self):
+        """The actions the ai decided on, with the recorded time it decided on them and how they turned out"""
+        return [{"timestamp": entry["timestamp"], "goal": entry["my_goal"],
+                 "action": describe_action(entry["my_plan"][0].action), "action_status": entry["action_status"].value}
+                for entry in self.ai.diary() if entry["my_plan"]]
@@ -0,0 +1,237 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to read the router's configuration
+import os
+
+# needed to place homes on the hash ring
+import hashlib
+from bisect import bisect
+
+# needed to pass plain data between the router and the shards
+import json
+
+# needed to keep routing consistent while homes move between shards
+import threading
+
+# needed to connect to the shards and to serve clients
+import rpyc
+from rpyc.utils.server import ThreadedServer
+
+# needed to log debug messages to the terminal window
+from highcliff.logging import log_event_to_the_terminal_window
+
+
+class NoShardsAvailable(Exception):
+    pass
+
+
+class ShardCallFailed(Exception):
+    pass
+
+
+class HomeHandoverFailed(Exception):
+    pass
+
+
+class HashRing:
+    """Assigns homes to shards by consistent hashing. Each shard owns many points on the ring, so that homes spread
+    evenly and only the homes next to a shard's points move when the shard joins or leaves"""
+    def __init__(self, virtual_nodes_per_shard=64):
+        self._virtual_nodes_per_shard = virtual_nodes_per_shard
+        self._points = []
+        self._shard_at_point = {}
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+    def add_shard(self, shard_id):
+        for virtual_node in range(self._virtual_nodes_per_shard):
+            point = self._hash(shard_id + "#" + str(virtual_node))
+            self._shard_at_point[point] = shard_id
+        self._points = sorted(self._shard_at_point)
+
+    def remove_shard(self, shard_id):
+        self._shard_at_point = {point: shard for point, shard in self._shard_at_point.items() if shard != shard_id}
+        self._points = sorted(self._shard_at_point)
+
+    def copy(self):
+        ring = HashRing(self._virtual_nodes_per_shard)
+        ring._shard_at_point = dict(self._shard_at_point)
+        ring._points = list(self._points)
+        return ring
+
+    def shards(self):
+        return sorted(set(self._shard_at_point.values()))
+
+    def shard_for(self, home_id):
+        if not self._points:
+            raise NoShardsAvailable(home_id)
+
+        # a home belongs to the first shard point clockwise from the home's own point
+        index = bisect(self._points, self._hash(str(home_id))) % len(self._points)
+        return self._shard_at_point[self._points[index]]
+
+
+class ShardRouter:
+    """Routes the plain-data service calls for each home to the AI server (shard) that hosts the home, and moves
+    homes, with their world state and goals, when shards join or leave. A home that could not be handed over stays
+    on the shard that has it, and calls for it go there, until a later change of shards moves it"""
+    def __init__(self, debug_logging=False):
+        # the ring, the connections and the homes held back from the ring are replaced, never changed, so that calls
+        # can be routed with a snapshot of them taken under the lock, and forwarded without holding it
+        self._ring = HashRing()
+        self._connections = {}
+        self._held_homes = {}
+        self._lock = threading.Lock()
+
+        # shards join and leave one at a time
+        self._membership_lock = threading.Lock()
+        self._debug_logging = debug_logging
+
+    def add_shard(self, shard_id, connection):
+        """Add a shard and move to it the homes it now owns"""
+        with self._membership_lock:
+            ring, connections, _ = self._snapshot()
+            new_ring = ring.copy()
+            new_ring.add_shard(shard_id)
+            new_connections = dict(connections)
+            new_connections[shard_id] = connection
+            self._move_homes(self._homes_by_shard(connections), new_ring, new_connections)
+
+    def remove_shard(self, shard_id):
+        """Move the homes of a shard to the remaining shards, then stop routing to it and return its connection. If
+        any of its homes could not be moved, the router keeps the shard's connection, and routes those homes to it,
+        until remove_shard is called again"""
+        with self._membership_lock:
+            ring, connections, _ = self._snapshot()
+            new_ring = ring.copy()
+            new_ring.remove_shard(shard_id)
+            new_connections = {other_shard_id: connection for other_shard_id, connection in connections.items()
+                               if other_shard_id != shard_id}
+            self._move_homes(self._homes_by_shard(connections), new_ring, new_connections, connections)
+            return connections[shard_id]
+
+    def shards(self):
+        return self._snapshot()[0].shards()
+
+    def shard_for(self, home_id):
+        ring, _, held_homes = self._snapshot()
+        return self._shard_for(ring, held_homes, home_id)
+
+    @staticmethod
+    def _shard_for(ring, held_homes, home_id):
+        # a home that could not be handed over is routed to the shard that still has it
+        if home_id in held_homes:
+            return held_homes[home_id]
+        return ring.shard_for(home_id)
+
+    def _snapshot(self):
+        with self._lock:
+            return self._ring, self._connections, self._held_homes
+
+    def call_batch(self, requests, dispatcher=None, lease_id=None):
+        """Forward a batch of requests, one batch per shard, and return the responses in the original order"""
+        responses = [None] * len(requests)
+        ring, connections, held_homes = self._snapshot()
+
+        requests_by_shard = {}
+        for index, request in enumerate(requests):
+            if request.get("tenant") is None:
+                responses[index] = {"error": "NoHome: requests through the router must name a home"}
+                continue
+            shard_id = self._shard_for(ring, held_homes, request["tenant"])
+            requests_by_shard.setdefault(shard_id, []).append((index, request))
+
+        for shard_id, indexed_requests in requests_by_shard.items():
+            shard_requests = [request for _, request in indexed_requests]
+            shard_responses = self._call_shard(connections[shard_id], shard_requests, dispatcher, lease_id)
+            for (index, _), response in zip(indexed_requests, shard_responses):
+                responses[index] = response
+
+        return responses
+
+    @staticmethod
+    def _call_shard(connection, requests, dispatcher=None, lease_id=None):
+        responses_json = connection.root.call(json.dumps(requests), dispatcher, lease_id)
+        return json.loads(responses_json)
+
+    @classmethod
+    def _call_shard_once(cls, connection, method, home_id=None, args=None):
+        # a single call whose failure is raised rather than returned
+        response = cls._call_shard(connection, [{"method": method, "args": args or {}, "tenant": home_id}])[0]
+        if "error" in response:
+            raise ShardCallFailed(method + " " + str(home_id) + ": " + response["error"])
+        return response["result"]
+
+    def _homes_by_shard(self, connections):
+        homes = {}
+        for shard_id, connection in connections.items():
+            for home_id in self._call_shard_once(connection, "homes"):
+                homes[home_id] = shard_id
+        return homes
+
+    def _move_homes(self, current_owners, new_ring, new_connections, current_connections=None):
+        # hand each home whose owner has changed over to its new shard, then route by the new ring. until then,
+        # calls for a home go to the shard that still has it
+        current_connections = current_connections or new_connections
+        failed_handovers = []
+        held_homes = {}
+        for home_id, current_shard_id in current_owners.items():
+            new_shard_id = new_ring.shard_for(home_id)
+            if new_shard_id == current_shard_id:
+                continue
+
+            # a home is only forgotten by its shard once its new shard has it
+            try:
+                exported = self._call_shard_once(current_connections[current_shard_id], "export_home", home_id)
+                self._call_shard_once(new_connections[new_shard_id], "import_home", home_id, exported)
+                self._call_shard_once(current_connections[current_shard_id], "forget_home", home_id)
+            except ShardCallFailed as error:
+                failed_handovers.append(str(error))
+                held_homes[home_id] = current_shard_id
+                continue
+
+            # log the move
+            if self._debug_logging:
+                log_event_to_the_terminal_window("Moved home " + str(home_id) + " from shard " +
+                                                 current_shard_id + " to shard " + new_shard_id)
+
+        # a shard that still has homes stays connected, even if it has left the ring
+        new_connections = dict(new_connections)
+        for shard_id in set(held_homes.values()):
+            new_connections[shard_id] = current_connections[shard_id]
+
+        with self._lock:
+            self._ring, self._connections, self._held_homes = new_ring, new_connections, held_homes
+
+        if failed_handovers:
+            raise HomeHandoverFailed("; ".join(failed_handovers))
+
+
+class ShardRouterService(rpyc.Service):
+    """The router speaks the same plain-data service api as an AI server, so clients connect to it in the same way"""
+    _router = None
+
+    def exposed_call(self, requests_json, dispatcher=None, lease_id=None):
+        return json.dumps(self._router.call_batch(json.loads(requests_json), dispatcher, lease_id))
+
+
+def start_ai_router():
+    # the shards are given as a comma-separated list of host:port addresses
+    debug_logging = os.environ["debug_logging"] == "True"
+    router = ShardRouter(debug_logging)
+    for shard_address in os.environ["shards"].split(","):
+        host, port = shard_address.split(":")
+        router.add_shard(shard_address, rpyc.connect(host, int(port)))
+
+    ShardRouterService._router = router
+    port = int(os.environ["port"])
+    thread = ThreadedServer(ShardRouterService, port=port)
+    thread.start()
+
+
+if __name__ == "__main__":
+    start_ai_router()
@@ -5,16 +5,43 @@ __version__ = "0.0.1"
 # needed to run the ai
 import os
 
+# needed to give each ai a copy of the goals of its own
+import copy
+
 from ai import AI
 
+# needed to host an isolated ai for each tenant
+from ai_registry import AIRegistry
+
+# needed to plan in worker processes, so large searches do not stall the clients of the server
+from highcliff.planning import ProcessPoolPlanner
+
+# needed to serve clients with plain data rather than references to server-side objects
+from ai_service import AIService, CapabilityLeases
+
 # needed to run the ai as a remote service
 import rpyc
 
 # needed to start the server in its own thread
 from rpyc.utils.server import ThreadedServer
 
-# needed to reference the json ai goal file
-import json
+# needed to recognise the capabilities that are references to objects on a client
+from rpyc.core.netref import BaseNetref
+
+# needed to read the ai goal file, and to reload it when it changes
+from ai_goals import load_goals, GoalFileWatcher
+
+# needed to serve the metrics of the ais to scrapers
+from highcliff.metrics import render_prometheus_text, render_metrics_json, serve_metrics
+
+# needed to export traces of the messages the ais react to
+from highcliff.tracing import Tracer, JsonLinesSink
+
+# needed to profile a running server without restarting it
+from highcliff.profiling import SamplingProfiler
+
+# needed to find the code behind the memory a running server gains
+from highcliff.memory import MemorySnapshots
 
 # needed to log initializing the server
 from highcliff.logging import log_event_to_the_terminal_window
@@ -22,12 +49,43 @@ from highcliff.logging import log_event_to_the_terminal_window
 # needed to start ai server execution in its own thread
 from threading import Thread
 
+# needed to pause between checks for lapsed capability leases
+import time
+
 
 class AIServer(rpyc.Service):
     _ai_instance = AI.instance()
     _ai_initialized = False
     _debug_logging = os.environ["debug_logging"] == "True"
 
+    # when the number of planning workers is set, the ais plan in a pool of worker processes they share
+    _planner = ProcessPoolPlanner(int(os.environ["planning_workers"])) if "planning_workers" in os.environ else None
+    _ai_registry = AIRegistry(debug_logging=_debug_logging, planner=_planner)
+
+    # samples the stacks of the server's threads, only while switched on
+    _profiler = SamplingProfiler()
+
+    _ai_goals_file_path = "ai_goals.json"
+    _ai_goals = None
+
+    @classmethod
+    def _read_ai_goals(cls):
+        # determine the AI's goals using an external goals file. the goals are re-read when the file changes
+        if cls._ai_goals is None:
+            cls._ai_goals = load_goals(cls._ai_goals_file_path)
+        return copy.deepcopy(cls._ai_goals)
+
+    @classmethod
+    def _reload_ai_goals(cls, goals):
+        # the shared ai, and every tenant that still follows the goal file, takes the new goals
+        previous_goals = cls._ai_goals
+        cls._ai_goals = goals
+        cls._ai_instance.set_goals(copy.deepcopy(goals))
+        for tenant_id in cls._ai_registry.tenants():
+            tenant_ai = cls._ai_registry.get(tenant_id)
+            if tenant_ai.goals() == previous_goals:
+                tenant_ai.set_goals(copy.deepcopy(goals))
+
     def _init_ai(self):
         # log a debug event
         if self._debug_logging:
@@ -36,6 +94,14 @@ class AIServer(rpyc.Service):
         # set the debug logging level for the ai instance
         self._ai_instance.set_debug_logging(self._debug_logging)
 
+        # export a span for each step from a message to the action it leads to, if the server is configured to
+        if "trace_file" in os.environ:
+            Tracer.instance().set_sink(JsonLinesSink(os.environ["trace_file"]))
+
+        # plan in worker processes, if the server is configured to
+        if self._planner is not None:
+            self._ai_instance.set_planner(self._planner)
+
         # get a reference to the centralized infrastructure
         network = self._ai_instance.network()
 
@@ -47,9 +113,7 @@ class AIServer(rpyc.Service):
             log_event_to_the_terminal_window("The world state for the AI server has been reset")
 
         # determine the AI's goals using an external goals file
-        with open("ai_goals.json") as json_file:
-            ai_goals = json.load(json_file)
-        self._ai_instance.set_goals(ai_goals)
+        self._ai_instance.set_goals(self._read_ai_goals())
 
         # log a debug event
         if self._debug_logging:
@@ -60,32 +124,140 @@ class AIServer(rpyc.Service):
         ai_execution_thread = Thread(target=self._ai_instance.run, kwargs={"life_span_in_iterations": run_indefinitely})
         ai_execution_thread.start()
 
+        # pick up changes to the goal file without restarting the server
+        seconds_between_goal_checks = float(os.environ.get("seconds_between_goal_checks", 1))
+        goal_file_watcher = GoalFileWatcher(self._ai_goals_file_path, self._reload_ai_goals,
+                                            seconds_between_goal_checks, self._debug_logging)
+        goal_file_watcher.start()
+
+        # remove the capabilities of clients that stop renewing their leases
+        lease_expiry_thread = Thread(target=self._expire_capability_leases, daemon=True)
+        lease_expiry_thread.start()
+
+        # run the AIs of every tenant in the same way, sharing a pool of workers
+        tenant_execution_thread = Thread(target=self._ai_registry.run,
+                                         kwargs={"life_span_in_iterations": run_indefinitely}, daemon=True)
+        tenant_execution_thread.start()
+
+        # serve the metrics of every ai over http, if the server is configured to
+        if "metrics_port" in os.environ:
+            serve_metrics(int(os.environ["metrics_port"]), self._labelled_metrics)
+
         # log a debug event
         if self._debug_logging:
             log_event_to_the_terminal_window("AI Server is initialized")
 
+    @staticmethod
+    def _expire_capability_leases():
+        seconds_to_pause_between_lease_checks = 5
+        while True:
+            time.sleep(seconds_to_pause_between_lease_checks)
+            CapabilityLeases.instance().expire()
+
     def on_connect(self, conn):
-        if not self._ai_initialized:
+        # the capability leases held by this connection, and the ais handed to it. they are set before the ai is
+        # initialized, so that the connection can be closed cleanly even if initialization fails
+        self._lease_ids = set()
+        self._ais_handed_out = []
+
+        # each connection has its own service instance. initialization is shared by all of them
+        if not AIServer._ai_initialized:
             self._init_ai()
 
         # initialization should not be repeated the next time a client connects
-        self._ai_initialized = True
+        AIServer._ai_initialized = True
 
     def on_disconnect(self, conn):
-        pass
+        # the capabilities of a disconnected client can no longer be run
+        for lease_id in self._lease_ids:
+            CapabilityLeases.instance().release(lease_id)
+
+        # nor can the capabilities it added directly to the ais it was handed
+        for ai in self._ais_handed_out:
+            self._remove_capabilities_of(ai, conn)
+
+    @staticmethod
+    def _remove_capabilities_of(ai, conn):
+        # a capability added through a reference to a server-side ai is a reference to an object on its client
+        for capability in list(ai.capabilities()):
+            if issubclass(type(capability), BaseNetref) and object.__getattribute__(capability, "____conn__") is conn:
+                ai.remove_capability(capability)
+
+    def exposed_get_ai_instance(self, tenant_id=None):
+        # without a tenant, clients share the server's own ai
+        if tenant_id is None:
+            ai = self._ai_instance
+        else:
+            # each tenant gets an isolated ai, created with the server's goals the first time it is asked for
+            ai = self._ai_registry.get_or_create(tenant_id, self._read_ai_goals())
+
+        # the client may add capabilities to the ai. they are removed when it disconnects
+        if not any(ai is ai_handed_out for ai_handed_out in self._ais_handed_out):
+            self._ais_handed_out.append(ai)
+        return ai
+
+    @classmethod
+    def _labelled_metrics(cls):
+        # the shared ai has no tenant
+        labelled_metrics = [({"tenant": ""}, cls._ai_instance.metrics())]
+        for tenant_id in cls._ai_registry.tenants():
+            labelled_metrics.append(({"tenant": tenant_id}, cls._ai_registry.get(tenant_id).metrics()))
+        return labelled_metrics
+
+    def exposed_metrics(self, output_format="prometheus"):
+        # the metrics of every ai on the server, as prometheus text or as json
+        if output_format == "json":
+            return render_metrics_json(self._labelled_metrics())
+        return render_prometheus_text(self._labelled_metrics())
+
+    def exposed_start_profiling(self, seconds=30):
+        # sample the server for a bounded window. if the server is configured with a profile directory, the collapsed
+        # stacks of the window are also written there when it ends
+        output_path = None
+        if "profile_directory" in os.environ:
+            output_path = os.path.join(os.environ["profile_directory"],
+                                       "profile-" + time.strftime("%Y%m%d-%H%M%S") + ".collapsed")
+        self._profiler.start(seconds, output_path)
+        return output_path
+
+    def exposed_stop_profiling(self):
+        # end the window early. returns the collapsed stacks of the last window, ready for flamegraph.pl
+        return self._profiler.stop()
+
+    def exposed_take_memory_snapshot(self, label):
+        # the first snapshot starts tracing memory allocations, which slows the server until they are stopped
+        MemorySnapshots.instance().take(label)
+
+    def exposed_compare_memory_snapshots(self, first_label, second_label, limit=10):
+        # the lines of code that allocated the most memory between two snapshots
+        return MemorySnapshots.instance().compare(first_label, second_label, limit=limit)
+
+    def exposed_stop_memory_snapshots(self):
+        MemorySnapshots.instance().stop()
+
+    def exposed_call(self, requests_json, dispatcher=None, lease_id=None):
+        # run a batch of plain-data requests in a single round trip. see AIClient
+        ai_service = AIService(self.exposed_get_ai_instance, self._ai_registry)
+
+        # remote actions are dispatched to the client without waiting for a reply
+        if dispatcher is not None:
+            dispatcher = rpyc.async_(dispatcher)
+
+        # capabilities registered through this connection end with it
+        if lease_id is not None:
+            self._lease_ids.add(lease_id)
 
-    def exposed_get_ai_instance(self):
-        return self._ai_instance
+        return ai_service.call_batch_json(requests_json, dispatcher, lease_id)
 
 
 def start_ai_server():
     port = int(os.environ["port"])
-    thread = ThreadedServer(AIServer(), port=port, protocol_config={"allow_all_attrs": True,
-                                                                    "allow_public_attrs": True,
-                                                                    "allow_setattr": True,
-                                                                    "instantiate_custom_exceptions": True,
-                                                                    "import_custom_exceptions": True
-                                                                    })
+    thread = ThreadedServer(AIServer, port=port, protocol_config={"allow_all_attrs": True,
+                                                                  "allow_public_attrs": True,
+                                                                  "allow_setattr": True,
+                                                                  "instantiate_custom_exceptions": True,
+                                                                  "import_custom_exceptions": True
+                                                                  })
     thread.start()
 
 
@@ -0,0 +1,395 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to copy plain data in and out of the service
+import json
+
+# needed to wait for remote clients to complete their actions
+import threading
+
+# needed to identify each request to run a remote action
+from itertools import count
+
+# needed to expire the leases of remote capabilities
+import time
+
+# the framework class for actions registered by remote clients
+from highcliff.actions import AIaction
+
+# needed to share the pending remote executions between service calls
+from highcliff.singleton import Singleton
+
+# needed to describe the actions in diary entries
+from highcliff.diary import describe_action
+
+# needed to copy goals out of the service as plain data
+from highcliff.goals import goals_as_plain_data
+
+# needed to log debug messages to the terminal window
+from highcliff.logging import log_event_to_the_terminal_window
+
+
+class UnknownServiceMethod(Exception):
+    pass
+
+
+class NoDispatcher(Exception):
+    pass
+
+
+def diary_entry_as_plain_data(diary_entry):
+    """Return a copy of a diary entry that holds only plain data: goals, world states, action names and statuses"""
+    plan = diary_entry["my_plan"]
+    return {
+        "my_goal": diary_entry["my_goal"],
+        "the_world_state_before": diary_entry["the_world_state_before"],
+        "my_plan": None if plan is None else [describe_action(step.action) for step in plan],
+        "action_status": diary_entry["action_status"].value,
+        "the_world_state_after": diary_entry["the_world_state_after"],
+        "timestamp": diary_entry.get("timestamp"),
+        "seconds_acting": diary_entry.get("seconds_acting")
+    }
+
+
+@Singleton
+class RemoteExecutions:
+    """Requests to run remote actions that are waiting for their clients to report completion"""
+    def __init__(self):
+        self._request_ids = count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def start(self, on_completion, timeout, on_timeout=None):
+        """Start a request that will call on_completion with the actual effects of the action, if its client reports
+        them within the timeout, or on_timeout once it has timed out"""
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = {"on_completion": on_completion, "on_timeout": on_timeout,
+                                         "expires": time.monotonic() + timeout}
+        return request_id
+
+    def complete(self, request_id, actual_effects):
+        """Record the actual effects of a remote action. Returns false if the request is unknown or has timed out"""
+        with self._lock:
+            execution = self._pending.pop(request_id, None)
+        if execution is None:
+            return False
+        if execution["expires"] < time.monotonic():
+            self._time_out([execution])
+            return False
+        execution["on_completion"](actual_effects)
+        return True
+
+    def is_pending(self, request_id):
+        """Whether a request is still waiting for its client. A request that has timed out is forgotten"""
+        with self._lock:
+            expired_executions = self._forget_expired_requests()
+            is_pending = request_id in self._pending
+        self._time_out(expired_executions)
+        return is_pending
+
+    def pending(self):
+        with self._lock:
+            expired_executions = self._forget_expired_requests()
+            number_pending = len(self._pending)
+        self._time_out(expired_executions)
+        return number_pending
+
+    def _forget_expired_requests(self):
+        now = time.monotonic()
+        expired_request_ids = [request_id for request_id, execution in self._pending.items()
+                               if execution["expires"] < now]
+        return [self._pending.pop(request_id) for request_id in expired_request_ids]
+
+    @staticmethod
+    def _time_out(executions):
+        # the callbacks run outside the lock, since they may start requests of their own
+        for execution in executions:
+            if execution["on_timeout"] is not None:
+                execution["on_timeout"]()
+
+
+@Singleton
+class CapabilityLeases:
+    """Remote capabilities are held under leases. A lease ends when its client releases it, when its client
+    disconnects, or when its client stops renewing it. The capabilities held under a lease are removed from their
+    AI when the lease ends, so the AI never plans with actions that can no longer be run"""
+    def __init__(self):
+        # the number of seconds a lease lasts without being renewed
+        self.lease_duration = 30
+
+        self._leases = {}
+        self._lease_for_capability = {}
+        self._lock = threading.Lock()
+
+    def grant(self, lease_id, ai, capability):
+        """Hold the given capability of the given ai under a lease"""
+        with self._lock:
+            lease = self._leases.setdefault(lease_id, {"capabilities": {}, "expires": 0})
+            lease["capabilities"][capability.capability_id] = (ai, capability)
+            lease["expires"] = time.monotonic() + self.lease_duration
+            self._lease_for_capability[capability.capability_id] = lease_id
+
+    def renew(self, lease_id):
+        """Extend a lease. Returns false if the lease has already ended"""
+        with self._lock:
+            if lease_id not in self._leases:
+                return False
+            self._leases[lease_id]["expires"] = time.monotonic() + self.lease_duration
+            return True
+
+    def release(self, lease_id):
+        """End a lease and remove every capability held under it"""
+        with self._lock:
+            lease = self._leases.pop(lease_id, None)
+            if lease is None:
+                return 0
+            for capability_id in lease["capabilities"]:
+                del self._lease_for_capability[capability_id]
+
+        for ai, capability in lease["capabilities"].values():
+            ai.remove_capability(capability)
+        return len(lease["capabilities"])
+
+    def remove(self, capability_id):
+        """Remove a single capability from its lease and its AI. Returns false if the capability is unknown"""
+        with self._lock:
+            lease_id = self._lease_for_capability.pop(capability_id, None)
+            if lease_id is None:
+                return False
+            ai, capability = self._leases[lease_id]["capabilities"].pop(capability_id)
+
+        ai.remove_capability(capability)
+        return True
+
+    def expire(self):
+        """End every lease that has not been renewed in time. Returns the ids of the leases that ended"""
+        now = time.monotonic()
+        with self._lock:
+            lapsed_lease_ids = [lease_id for lease_id, lease in self._leases.items() if lease["expires"] < now]
+        for lease_id in lapsed_lease_ids:
+            self.release(lease_id)
+        return lapsed_lease_ids
+
+    def leases(self):
+        with self._lock:
+            return list(self._leases.keys())
+
+
+class RemoteCapability(AIaction):
+    """An action registered by value. The AI plans with a local copy of its effects, preconditions and cost, so
+    planning never waits on the network. Only the behavior runs on the client: the AI dispatches a request
+    without waiting for a reply, and the client reports the actual effects through the complete_action call. The
+    AI applies them on its next run"""
+    def __init__(self, ai, capability_id, name, effects, preconditions, cost, timeout, dispatcher):
+        # a capability that cannot be dispatched to its client could never run
+        if dispatcher is None:
+            raise NoDispatcher("the capability " + str(name) + " was registered without a dispatcher")
+
+        super().__init__(ai)
+        self.capability_id = capability_id
+        self.name = name
+        self.effects = effects
+        self.preconditions = preconditions
+        self.cost = cost
+        self.timeout = timeout
+        self._ai = ai
+        self._dispatcher = dispatcher
+
+        # the request the client is running, if any, and when it was dispatched
+        self._request_id = None
+        self._dispatched_at = None
+
+    def act(self, network):
+        # the action has no effect on the world until its client reports back. see AI.complete_action
+        self.actual_effects = {}
+        executions = RemoteExecutions.instance()
+
+        # the client is still running the last request. it is not asked to run the behavior again
+        if self.in_progress():
+            return
+
+        self._dispatched_at = time.monotonic()
+        self._request_id = executions.start(self._complete, self.timeout, self._time_out)
+
+        # the dispatcher returns without waiting for the client to run the behavior
+        self._dispatcher(self.capability_id, self._request_id, json.dumps(self.effects))
+
+    def in_progress(self):
+        return self._request_id is not None and RemoteExecutions.instance().is_pending(self._request_id)
+
+    def behavior(self):
+        # the behavior runs on the client
+        pass
+
+    def _complete(self, actual_effects):
+        self._request_id = None
+        self._ai.complete_action(self, actual_effects, time.monotonic() - self._dispatched_at)
+
+    def _time_out(self):
+        # a remote action that doesn't complete in time has no effect on the world, and counts as a failure
+        self._request_id = None
+        if self._ai.debug_logging():
+            log_event_to_the_terminal_window("The remote action " + self.name + " did not complete in time")
+        self._ai.time_out_action(self, time.monotonic() - self._dispatched_at)
+
+
+class AIService:
+    """The plain-data service api of the AI server. Every call copies plain data in and out, so a client never
+    holds a reference to a server-side object, and many calls can travel together in one batch"""
+    def __init__(self, ai_for_tenant, ai_registry=None):
+        # finds the ai that serves a tenant. a tenant of None is the server's shared ai
+        self._ai_for_tenant = ai_for_tenant
+
+        # the registry of tenant ais, needed to hand homes over between shards. see ShardRouter
+        self._ai_registry = ai_registry
+
+        # the methods clients may call
+        self._methods = {
+            "register_capability": self._register_capability,
+            "update_the_world": self._update_the_world,
+            "the_world": self._the_world,
+            "set_goals": self._set_goals,
+            "diary_length": self._diary_length,
+            "diary_page": self._diary_page,
+            "diary_query": self._diary_query,
+            "diary_count": self._diary_count,
+            "diary_success_rate": self._diary_success_rate,
+            "diary_summary": self._diary_summary,
+            "complete_action": self._complete_action,
+            "remove_capability": self._remove_capability,
+            "renew_lease": self._renew_lease,
+            "release_lease": self._release_lease,
+            "homes": self._homes,
+            "export_home": self._export_home,
+            "import_home": self._import_home,
+            "forget_home": self._forget_home,
+            "metrics": self._metrics,
+            "memory_report": self._memory_report
+        }
+
+    def call_batch(self, requests, dispatcher=None, lease_id=None):
+        """Run a batch of requests, in order, and return a response for each one. A failing request does not stop
+        the others. Each request is a dictionary with a method name, optional arguments and an optional tenant.
+        Capabilities registered in the batch are held under the given lease"""
+        responses = []
+        for request in requests:
+            try:
+                result = self.call(request["method"], request.get("args", {}), request.get("tenant"), dispatcher,
+                                   lease_id)
+                responses.append({"result": result})
+            except Exception as error:
+                responses.append({"error": type(error).__name__ + ": " + str(error)})
+        return responses
+
+    def call_batch_json(self, requests_json, dispatcher=None, lease_id=None):
+        """Run a batch of requests given, and answered, as a json document"""
+        return json.dumps(self.call_batch(json.loads(requests_json), dispatcher, lease_id))
+
+    def call(self, method, args, tenant=None, dispatcher=None, lease_id=None):
+        try:
+            handler = self._methods[method]
+        except KeyError:
+            raise UnknownServiceMethod(method)
+
+        ai = self._ai_for_tenant(tenant)
+        if method == "register_capability":
+            return handler(ai, dispatcher=dispatcher, lease_id=lease_id, **args)
+        return handler(ai, **args)
+
+    @staticmethod
+    def _register_capability(ai, capability_id, effects, preconditions=None, cost=1.0, timeout=10, name=None,
+                             dispatcher=None, lease_id=None):
+        capability = RemoteCapability(ai, capability_id, name or capability_id, effects, preconditions or {}, cost,
+                                      timeout, dispatcher)
+        if lease_id is not None:
+            CapabilityLeases.instance().grant(lease_id, ai, capability)
+        return capability_id
+
+    @staticmethod
+    def _remove_capability(ai, capability_id):
+        return CapabilityLeases.instance().remove(capability_id)
+
+    @staticmethod
+    def _renew_lease(ai, lease_id):
+        return CapabilityLeases.instance().renew(lease_id)
+
+    @staticmethod
+    def _release_lease(ai, lease_id):
+        return CapabilityLeases.instance().release(lease_id)
+
+    @staticmethod
+    def _complete_action(ai, request_id, actual_effects):
+        return RemoteExecutions.instance().complete(request_id, actual_effects)
+
+    @staticmethod
+    def _update_the_world(ai, update):
+        ai.network().update_the_world(update)
+
+    @staticmethod
+    def _the_world(ai):
+        return dict(ai.network().the_world())
+
+    @staticmethod
+    def _set_goals(ai, goals):
+        ai.set_goals(goals)
+
+    @staticmethod
+    def _diary_length(ai):
+        return len(ai.diary())
+
+    @staticmethod
+    def _diary_page(ai, start=0, count=50):
+        return [diary_entry_as_plain_data(entry) for entry in ai.diary()[start:start + count]]
+
+    @staticmethod
+    def _diary_query(ai, goal=None, action=None, status=None, since=None, until=None, start=0, count=50):
+        # the diary is queried where it is kept. only the matching entries are copied to the client
+        return [diary_entry_as_plain_data(entry)
+                for entry in ai.diary().query(goal, action, status, since, until, start, count)]
+
+    @staticmethod
+    def _diary_count(ai, goal=None, action=None, status=None, since=None, until=None):
+        return ai.diary().count(goal, action, status, since, until)
+
+    @staticmethod
+    def _diary_success_rate(ai, goal=None, action=None, since=None, until=None):
+        return ai.diary().success_rate(goal, action, since, until)
+
+    @staticmethod
+    def _diary_summary(ai, since=None, until=None, percentiles=(50, 95, 99)):
+        return ai.diary().summary_by_action(since, until, percentiles)
+
+    @staticmethod
+    def _metrics(ai):
+        return ai.metrics().as_plain_data()
+
+    @staticmethod
+    def _memory_report(ai):
+        return ai.memory_report()
+
+    def _homes(self, ai):
+        return self._ai_registry.tenants()
+
+    @staticmethod
+    def _export_home(ai):
+        # a home's state is its world and its goals. capabilities stay with the clients that registered them
+        return {"the_world": dict(ai.network().the_world()), "goals": goals_as_plain_data(ai.goals())}
+
+    @staticmethod
+    def _import_home(ai, the_world, goals):
+        ai.network().update_the_world(the_world)
+        ai.set_goals(goals)
+
+    def _forget_home(self, ai):
+        # the capabilities of a home that has moved can no longer be run here
+        for capability in list(ai.capabilities()):
+            if isinstance(capability, RemoteCapability):
+                CapabilityLeases.instance().remove(capability.capability_id)
+
+        for tenant_id in self._ai_registry.tenants():
+            if self._ai_registry.get(tenant_id) is ai:
+                self._ai_registry.remove(tenant_id)
+                return True
+        return False
@@ -0,0 +1,80 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to draw simulated sensor readings the same way on every run of a simulation
+import random
+
+from ai import AI
+
+# needed to give the simulated ai a world of its own, and a clock that only moves when it waits
+from infrastructure import LocalNetwork
+from highcliff.clock import VirtualClock
+
+# needed to time stamp the events logged during a simulation by its clock
+from highcliff.logging import set_logging_clock, logging_clock
+
+
+def sensor_message(event_source, effects, timestamp, data=None):
+    """A message, as a sensor would publish it, that sets the given effects on the world"""
+    return {
+        "event_type": "reading",
+        "event_tags": [],
+        "event_source": event_source,
+        "timestamp": timestamp,
+        "device_info": {},
+        "application_info": {},
+        "user_info": {},
+        "environment": "simulation",
+        "context": {},
+        "effects": effects,
+        "data": data or {}
+    }
+
+
+class Simulation:
+    """Runs an ai on a virtual clock, over a local network of its own, with simulated sensors publishing to it. The
+    ai's pauses between runs move the clock forward instead of waiting, so thousands of runs take seconds. Sensor
+    readings are drawn from a random number generator seeded by the simulation, so a simulation with the same seed
+    plays out the same way every time"""
+    def __init__(self, seed=0, start_time=0.0):
+        self.clock = VirtualClock(start_time)
+        self.random = random.Random(seed)
+        self.network = LocalNetwork.new_instance()
+        self.ai = AI.new_instance()
+        self.ai.set_network(self.network)
+        self.ai.set_clock(self.clock)
+
+    def add_sensor(self, topic, read_the_sensor, seconds_between_readings, first_reading_in=0):
+        """Publish a reading to the given topic every given number of seconds. read_the_sensor is called with the
+        simulation's random number generator and the time, and returns the effects of the reading on the world, or
+        None for no reading"""
+        if topic not in self.network.topics():
+            self.network.create_topic(topic)
+
+        def publish_a_reading():
+            effects = read_the_sensor(self.random, self.clock.time())
+            if effects is not None:
+                self.network.publish(topic, sensor_message(topic, effects, self.clock.time()))
+
+        self.clock.call_every(seconds_between_readings, publish_a_reading, first_reading_in)
+
+    def run(self, number_of_runs):
+        """Run the ai the given number of times and return its diary. Events logged during the simulation are time
+        stamped by its clock"""
+        # the ai runs forever when it is not given a positive number of runs. a simulation always ends
+        if not isinstance(number_of_runs, int) or isinstance(number_of_runs, bool) or number_of_runs < 0:
+            raise ValueError("the number of runs must be zero or a positive whole number")
+
+        # readings due at the start of the simulation arrive before the first run
+        self.clock.advance(0)
+        if number_of_runs == 0:
+            return self.ai.diary()
+
+        previous_logging_clock = logging_clock()
+        set_logging_clock(self.clock)
+        try:
+            self.ai.run(life_span_in_iterations=number_of_runs)
+        finally:
+            set_logging_clock(previous_logging_clock)
+        return self.ai.diary()
@@ -3,17 +3,24 @@ __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
 import os
+import json
 import unittest
 
 from highcliff.exampleactions import MonitorBodyTemperature
 from ai import AI
 from highcliff.actions import ActionStatus
+from highcliff.planning import LocalPlanner
+from highcliff.goals import Goal
+from highcliff.tracing import Tracer, MemorySink
 
 # needed to start up the remote ai server
 import rpyc
-from ai_server import start_ai_server
+from ai_server import start_ai_server, AIServer
 from threading import Thread
 
+# needed to connect a client to a server within the test
+from rpyc.utils.factory import connect_thread
+
 
 class TestAI(unittest.TestCase):
     def setUp(self):
@@ -76,6 +83,23 @@ class TestAI(unittest.TestCase):
         # the two instances should still be the same after resting one
         self.assertTrue(first_ai is second_ai)
 
+    def test_remove_capability(self):
+        # define a test body temperature monitor with a blank custom behavior
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        test_action = TestAction(self.highcliff)
+        self.assertEqual([test_action], self.highcliff.capabilities())
+
+        # a removed capability is no longer used in plans
+        self.highcliff.remove_capability(test_action)
+        self.assertEqual([], self.highcliff.capabilities())
+
+        # removing a capability the ai doesn't have changes nothing
+        self.highcliff.remove_capability(test_action)
+        self.assertEqual([], self.highcliff.capabilities())
+
     def test_goal_not_in_any_actions(self):
         # if the ai has no registered actions to achieve a goal, it should end with no plan
 
@@ -122,6 +146,23 @@ class TestAI(unittest.TestCase):
         unmet_goal = {"is_room_temperature_change_needed": False}
         self.assertEqual(unmet_goal, self.highcliff.diary()[0]['the_world_state_before'])
 
+    def test_only_the_selected_goal_is_recorded_in_the_world(self):
+        # the conditions of goals the ai has not pursued yet stay out of the world
+        self.highcliff.network().update_the_world({})
+        self.highcliff.set_goals({"is_room_temperature_change_needed": {"value": True, "priority": 10},
+                                  "is_room_lit": {"value": True, "priority": 1}})
+        self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual({"is_room_temperature_change_needed": False}, self.highcliff.network().the_world())
+
+    def test_goals_are_kept_as_plain_data(self):
+        self.highcliff.set_goals([Goal("is_room_lit", True, priority=2, deadline=60)])
+        self.assertEqual({"is_room_lit": {"value": True, "priority": 2, "deadline": 60, "weight": 1.0}},
+                         json.loads(json.dumps(self.highcliff.goals())))
+
+        # the plain data sets the same goals
+        self.highcliff.set_goals(self.highcliff.goals())
+        self.assertEqual([Goal("is_room_lit", True, priority=2, deadline=60)], self.highcliff._goal_scheduler.goals())
+
     def test_aimless_iterations(self):
         # the ai should be able to handle iterations with no goals
 
@@ -150,6 +191,199 @@ class TestAI(unittest.TestCase):
         self.assertEqual(no_plan, self.highcliff.diary()[1]['my_plan'])
         self.assertEqual(no_plan, self.highcliff.diary()[2]['my_plan'])
 
+    def test_prioritized_goals(self):
+        # define a test body temperature monitor with a blank custom behavior
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        TestAction(self.highcliff)
+        self.highcliff.network().update_the_world({"is_room_lit": False, "is_room_temperature_change_needed": False})
+
+        # the goal with the higher priority is pursued first, wherever it appears in the goals
+        self.highcliff.set_goals({"is_room_lit": {"value": True, "priority": 1},
+                                  "is_room_temperature_change_needed": {"value": True, "priority": 10}})
+        self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual({"is_room_temperature_change_needed": True}, self.highcliff.diary()[0]['my_goal'])
+
+        # with time to plan, the ai moves on to goals it can plan for
+        self.highcliff.network().update_the_world({"is_room_temperature_change_needed": False})
+        self.highcliff.set_goals({"is_room_lit": {"value": True, "priority": 10},
+                                  "is_room_temperature_change_needed": {"value": True, "priority": 1}})
+        self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual({"is_room_lit": True}, self.highcliff.diary()[1]['my_goal'])
+        self.assertEqual(None, self.highcliff.diary()[1]['my_plan'])
+
+        self.highcliff.set_planning_budget(1)
+        self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual({"is_room_temperature_change_needed": True}, self.highcliff.diary()[2]['my_goal'])
+        self.assertEqual(ActionStatus.SUCCESS, self.highcliff.diary()[2]['action_status'])
+        self.highcliff.set_planning_budget(0)
+
+    def test_plans_are_reused_until_their_goal_changes(self):
+        # count the plans the ai actually makes
+        class CountingPlanner(LocalPlanner):
+            plans_made = 0
+
+            def find_plan(self, world_state, capabilities, goal):
+                CountingPlanner.plans_made += 1
+                return super().find_plan(world_state, capabilities, goal)
+
+        self.highcliff.set_planner(CountingPlanner())
+        MonitorBodyTemperature(self.highcliff)
+        self.highcliff.network().update_the_world({"is_room_temperature_change_needed": False,
+                                                   "is_room_temperature_change_authorized": False})
+        self.highcliff.set_goals({"is_room_temperature_change_needed": True,
+                                  "is_room_temperature_change_authorized": False})
+
+        # nothing has changed, so the plan is reused
+        first_plan = self.highcliff._plan({"is_room_temperature_change_needed": True})
+        self.assertTrue(first_plan is self.highcliff._plan({"is_room_temperature_change_needed": True}))
+        self.assertEqual(1, CountingPlanner.plans_made)
+
+        # changing a different goal leaves the plan in place
+        self.highcliff.set_goals({"is_room_temperature_change_needed": True,
+                                  "is_room_temperature_change_authorized": True})
+        self.assertTrue(first_plan is self.highcliff._plan({"is_room_temperature_change_needed": True}))
+
+        # changing the goal, the world or the capabilities makes the ai plan again
+        self.highcliff.set_goals({"is_room_temperature_change_authorized": True})
+        self.highcliff._plan({"is_room_temperature_change_needed": True})
+        self.assertEqual(2, CountingPlanner.plans_made)
+        self.highcliff.network().update_the_world({"is_room_temperature_change_authorized": True})
+        self.highcliff._plan({"is_room_temperature_change_needed": True})
+        self.assertEqual(3, CountingPlanner.plans_made)
+        MonitorBodyTemperature(self.highcliff)
+        self.highcliff._plan({"is_room_temperature_change_needed": True})
+        self.assertEqual(4, CountingPlanner.plans_made)
+
+        self.highcliff.set_planner(LocalPlanner())
+
+    def test_learning_a_cost_that_barely_changes_keeps_the_plan(self):
+        class CountingPlanner(LocalPlanner):
+            plans_made = 0
+
+            def find_plan(self, world_state, capabilities, goal):
+                CountingPlanner.plans_made += 1
+                return super().find_plan(world_state, capabilities, goal)
+
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        self.highcliff.set_planner(CountingPlanner())
+        test_action = TestAction(self.highcliff)
+        self.highcliff.set_goals({"is_room_temperature_change_needed": True})
+
+        # the same world every run. the quick action's cost rounds to what it declares, so the plan is kept
+        for run in range(5):
+            self.highcliff.network().update_the_world({"is_room_temperature_change_needed": False})
+            self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual(1, CountingPlanner.plans_made)
+        self.assertEqual(None, test_action.estimated_cost)
+
+        # a failure changes the cost enough to plan again
+        test_action.behavior = lambda: test_action.actual_effects.update({"is_room_temperature_change_needed": False})
+        self.highcliff.network().update_the_world({"is_room_temperature_change_needed": False})
+        self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual(1.25, test_action.estimated_cost)
+        self.highcliff.run(life_span_in_iterations=1)
+        self.assertEqual(2, CountingPlanner.plans_made)
+
+        self.highcliff.set_planner(LocalPlanner())
+
+    def test_metrics(self):
+        # define a test body temperature monitor with a blank custom behavior
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        TestAction(self.highcliff)
+        self.highcliff.network().update_the_world({})
+        self.highcliff.set_goals({"is_room_temperature_change_needed": True})
+        self.highcliff.run(life_span_in_iterations=3)
+
+        # every run is counted and timed, along with its outcome
+        metrics = self.highcliff.metrics()
+        self.assertEqual(3, metrics.get("highcliff_ai_runs_total").value())
+        self.assertEqual(3, metrics.get("highcliff_ai_run_seconds").count())
+        self.assertEqual(3, metrics.get("highcliff_ai_goal_selection_seconds").count())
+        self.assertEqual(3, metrics.get("highcliff_ai_action_outcomes_total").value(status="success"))
+
+        # the first run plans and acts. the goal is met after that, so the empty plan is reused
+        self.assertEqual(1, metrics.get("highcliff_ai_action_seconds").count())
+        self.assertEqual(2, metrics.get("highcliff_ai_plan_cache_misses_total").value())
+        self.assertEqual(1, metrics.get("highcliff_ai_plan_cache_hits_total").value())
+        self.assertEqual(2, metrics.get("highcliff_ai_plan_length").count())
+        self.assertEqual(1, metrics.get("highcliff_ai_plan_length").sum())
+        self.assertEqual(1, metrics.get("highcliff_ai_world_state_size").value())
+
+        # resetting the ai starts its metrics over
+        self.highcliff.reset()
+        self.assertEqual(0, self.highcliff.metrics().get("highcliff_ai_runs_total").value())
+
+    def test_memory_report(self):
+        # define a test body temperature monitor with a blank custom behavior
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        TestAction(self.highcliff)
+        self.highcliff.set_goals({"is_room_temperature_change_needed": True})
+        report_before = self.highcliff.memory_report()
+        self.highcliff.run(life_span_in_iterations=3)
+        report_after = self.highcliff.memory_report()
+
+        # the report counts what the ai keeps, and how much memory it takes
+        self.assertEqual(1, report_after["capabilities"]["count"])
+        self.assertEqual(3, report_after["diary"]["entries"])
+        self.assertTrue(report_after["plan_cache"]["count"] > report_before["plan_cache"]["count"])
+        self.assertTrue(report_after["diary"]["bytes"] > report_before["diary"]["bytes"])
+        self.assertTrue(report_after["total_bytes"] > report_after["diary"]["bytes"] > 0)
+
+        # the world is reported by the network that keeps it
+        self.assertEqual(1, report_after["network"]["world"]["conditions"])
+
+    def test_runs_carry_on_the_trace_of_the_message_that_led_to_them(self):
+        # define a test body temperature monitor with a blank custom behavior
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        TestAction(self.highcliff)
+        sink = MemorySink()
+        tracer = Tracer.new_instance()
+        tracer.set_sink(sink)
+        network = self.highcliff.network()
+        network.set_tracer(tracer)
+        self.highcliff.set_tracer(tracer)
+
+        # a reading that leaves a goal unmet starts a trace
+        network.create_topic("temperature")
+        network.publish("temperature", {"event_type": "reading", "event_tags": [], "event_source": "thermometer",
+                                        "timestamp": 0, "device_info": {}, "application_info": {}, "user_info": {},
+                                        "environment": "test", "context": {},
+                                        "effects": {"is_room_temperature_change_needed": False}, "data": {}})
+        self.highcliff.set_goals({"is_room_temperature_change_needed": True})
+        self.highcliff.run(life_span_in_iterations=2)
+
+        # the run that reacts to the reading, and each of its phases, belong to the trace of the reading
+        trace_id = sink.spans[0].trace_id
+        self.assertEqual(["receive message", "ai run", "select goals", "plan", "act"],
+                         [span.name for span in sink.spans])
+        self.assertEqual({trace_id}, {span.trace_id for span in sink.spans})
+        run_span = sink.spans[1]
+        self.assertEqual("success", run_span.attributes["action_status"])
+        self.assertEqual({run_span.span_id}, {span.parent_span_id for span in sink.spans[2:]})
+
+        # the effects of the action carry the trace on. the run with no goal is not traced
+        self.assertEqual({"is_room_temperature_change_needed": trace_id},
+                         network.trace_ids_of(["is_room_temperature_change_needed"]))
+        self.assertTrue(sink.spans[-1].attributes["seconds_since_trace_started"] > 0)
+
+        network.set_tracer(Tracer.instance())
+        self.highcliff.set_tracer(Tracer.instance())
+
     def test_run_and_connect_to_remote_ai_server(self):
         # run the remote server
         ai_server_thread = Thread(target=start_ai_server, daemon=True)
@@ -167,5 +401,52 @@ class TestAI(unittest.TestCase):
         self.assertEqual(expected_type_for_ai_object, str(type(ai)))
 
 
+class TestAIServerConnections(unittest.TestCase):
+    def test_a_connection_that_fails_to_initialize_can_disconnect(self):
+        def fail_to_initialize():
+            raise FileNotFoundError("ai_goals.json")
+
+        # the server has not been initialized by an earlier connection
+        initialized = AIServer._ai_initialized
+        self.addCleanup(setattr, AIServer, "_ai_initialized", initialized)
+        AIServer._ai_initialized = False
+
+        server = AIServer()
+        server._init_ai = fail_to_initialize
+        with self.assertRaises(FileNotFoundError):
+            server.on_connect(None)
+        server.on_disconnect(None)
+
+    def test_capabilities_added_by_a_client_are_removed_when_it_disconnects(self):
+        served_ai = AI.new_instance()
+        server_connections = []
+
+        class TestServer(rpyc.Service):
+            def on_connect(self, conn):
+                server_connections.append(conn)
+
+            def exposed_get_ai_instance(self):
+                return served_ai
+
+        class ClientAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        class ServerAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        ServerAction(served_ai)
+        connection = connect_thread(remote_service=TestServer, config={"allow_all_attrs": True},
+                                    remote_config={"allow_all_attrs": True})
+        ClientAction(connection.root.get_ai_instance())
+        self.assertEqual(2, len(served_ai.capabilities()))
+
+        # the client's capability is a reference to an object on the client, which can no longer be reached
+        connection.close()
+        AIServer._remove_capabilities_of(served_ai, server_connections[0])
+        self.assertEqual([ServerAction], [type(capability) for capability in served_ai.capabilities()])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import unittest
+
+from ai.ai_goals import validate_goals, load_goals, GoalFileWatcher, InvalidGoals
+
+# needed to write test goal files
+import json
+import os
+import tempfile
+
+
+class TestGoalFileWatcher(unittest.TestCase):
+    def setUp(self):
+        self.goals_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        self.goals_file.close()
+        self._write_goals({"is_room_temperature_change_needed": True})
+
+        self.reloaded_goals = []
+        self.watcher = GoalFileWatcher(self.goals_file.name, self.reloaded_goals.append)
+
+    def tearDown(self):
+        os.remove(self.goals_file.name)
+
+    def _write_goals(self, goals_text):
+        with open(self.goals_file.name, "w") as goals_file:
+            goals_file.write(goals_text if isinstance(goals_text, str) else json.dumps(goals_text))
+
+        # make sure every write is seen as a change, however coarse the clock of the file system
+        status = os.stat(self.goals_file.name)
+        modified = getattr(self, "_modified", status.st_mtime_ns) + 1000000000
+        self._modified = modified
+        os.utime(self.goals_file.name, ns=(status.st_atime_ns, modified))
+
+    def test_goals_are_validated(self):
+        self.assertEqual({"is_room_temperature_comfortable": True},
+                         validate_goals({"is_room_temperature_comfortable": True}))
+        self.assertRaises(InvalidGoals, validate_goals, ["is_room_temperature_comfortable"])
+        self.assertRaises(InvalidGoals, validate_goals, {"is_room_temperature_comfortable": None})
+
+        # goals may carry a priority, deadline and weight
+        prioritized_goals = {"is_medication_given": {"value": True, "priority": 10, "deadline": 60}}
+        self.assertEqual(prioritized_goals, validate_goals(prioritized_goals))
+        self.assertRaises(InvalidGoals, validate_goals, {"is_medication_given": {"value": True, "priority": "high"}})
+        self.assertEqual({"is_room_temperature_change_needed": True}, load_goals(self.goals_file.name))
+
+    def test_changed_goals_are_reloaded(self):
+        # an unchanged file is not reloaded
+        self.assertFalse(self.watcher.check())
+
+        self._write_goals({"is_room_temperature_comfortable": True})
+        self.assertTrue(self.watcher.check())
+        self.assertEqual([{"is_room_temperature_comfortable": True}], self.reloaded_goals)
+
+    def test_invalid_goals_are_ignored(self):
+        self._write_goals("{not json")
+        self.assertFalse(self.watcher.check())
+
+        self._write_goals({"is_room_temperature_comfortable": [True]})
+        self.assertFalse(self.watcher.check())
+        self.assertEqual([], self.reloaded_goals)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import unittest
+
+from highcliff.exampleactions import MonitorBodyTemperature
+from ai import AI, AIRegistry
+from highcliff.actions import ActionStatus
+from highcliff.clock import VirtualClock
+
+
+class TestAIRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = AIRegistry(number_of_workers=2)
+
+    def tearDown(self):
+        self.registry.shutdown()
+        AI.instance().reset()
+
+    def test_tenants_are_isolated(self):
+        # define a test body temperature monitor with a blank custom behavior
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        goals = {"is_room_temperature_change_needed": True}
+        first_home = self.registry.create("first home", goals)
+        second_home = self.registry.create("second home", goals)
+
+        # only the first home has a capability that can reach the goal
+        TestAction(first_home)
+        self.assertEqual(1, len(first_home.capabilities()))
+        self.assertEqual([], second_home.capabilities())
+
+        # run every tenant once
+        self.registry.run_once()
+
+        # each tenant has its own diary and its own world
+        self.assertEqual(ActionStatus.SUCCESS, first_home.diary()[0]['action_status'])
+        self.assertEqual(1, len(first_home.diary()[0]['my_plan']))
+        self.assertEqual(None, second_home.diary()[0]['my_plan'])
+        self.assertEqual({"is_room_temperature_change_needed": True}, first_home.network().the_world())
+        self.assertEqual({"is_room_temperature_change_needed": False}, second_home.network().the_world())
+
+        # the shared ai is untouched by the tenants
+        self.assertEqual([], AI.instance().diary())
+        self.assertEqual({}, AI.instance().network().the_world())
+
+    def test_tenants_are_created_once(self):
+        home = self.registry.get_or_create("home")
+        self.assertTrue(home is self.registry.get_or_create("home"))
+        self.assertEqual(["home"], self.registry.tenants())
+
+        self.registry.remove("home")
+        self.assertEqual([], self.registry.tenants())
+
+    def test_a_registry_can_run_on_a_virtual_clock(self):
+        clock = VirtualClock(start=100)
+        first_home = self.registry.create("first home", {"is_room_temperature_change_needed": True})
+        self.registry.set_clock(clock)
+        second_home = self.registry.create("second home", {"is_room_temperature_change_needed": True})
+
+        # the pauses between rounds move the clock forward instead of waiting
+        self.registry.run(life_span_in_iterations=50, seconds_to_pause_between_ai_runs=60)
+        self.assertEqual(100 + 50 * 60, clock.time())
+
+        # every tenant tells the time by the registry's clock
+        self.assertEqual([100 + run * 60 for run in range(50)],
+                         [entry["timestamp"] for entry in first_home.diary()])
+        self.assertEqual(first_home.diary()[-1]["timestamp"], second_home.diary()[-1]["timestamp"])
+
+
+if __name__ == '__main__':
+    unittest.main()
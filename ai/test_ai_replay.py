@@ -0,0 +1,110 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import os
+import io
+import time
+import tempfile
+import unittest
+
+# needed to check that replays keep the networks quiet
+from contextlib import redirect_stdout
+
+from ai.ai_replay import Replay
+from highcliff.exampleactions import MonitorBodyTemperature
+from highcliff.actions import ActionStatus
+from infrastructure import TopicRule, TopicRules, RecordedMessage, read_temperature_csv, read_topic_dump, \
+    write_topic_dump
+
+
+class ReplayedBodyTemperatureMonitor(MonitorBodyTemperature):
+    def behavior(self):
+        pass
+
+
+def replay_of_temperatures(speed=None):
+    # a temperature of 39 or more needs the room temperature to change
+    topic_rules = TopicRules([TopicRule("test/temperatures", "value", "is_room_temperature_change_needed",
+                                        comparison=">=", threshold=39, value=False, otherwise=True)])
+    replay = Replay(topic_rules=topic_rules, speed=speed)
+    ReplayedBodyTemperatureMonitor(replay.ai)
+    replay.ai.set_goals({"is_room_temperature_change_needed": True})
+    return replay
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.temperatures = os.path.join(self.directory, "temps.csv")
+        with open(self.temperatures, "w") as csv_file:
+            csv_file.write("2022-02-22 12:00:00,36.6\n"
+                           "2022-02-22 12:00:10,40.9\n"
+                           "2022-02-22 12:00:20,36.8\n"
+                           "2022-02-22 12:00:30,39.5\n")
+
+    def test_recorded_temperatures_drive_the_ai(self):
+        report = replay_of_temperatures().run(read_temperature_csv(self.temperatures))
+
+        self.assertEqual(4, report["messages"]["count"])
+        self.assertTrue(report["messages"]["max_seconds"] >= report["messages"]["p50_seconds"] > 0)
+
+        # the ai ran every two recorded seconds, and once more after the last message
+        self.assertEqual(30, report["recorded_seconds"])
+        self.assertEqual(16, report["runs"]["count"])
+
+        # the ai reacted to each of the two hot readings, at the time it read them
+        decisions = report["decisions"]
+        start = 1645531200
+        self.assertEqual([start + 10, start + 30], [decision["timestamp"] for decision in decisions])
+        self.assertEqual({ActionStatus.SUCCESS.value}, {decision["action_status"] for decision in decisions})
+        self.assertEqual({"ReplayedBodyTemperatureMonitor"}, {decision["action"] for decision in decisions})
+
+    def test_replays_run_faster_than_the_recording(self):
+        started = time.monotonic()
+        replay_of_temperatures().run(read_temperature_csv(self.temperatures))
+        self.assertTrue(time.monotonic() - started < 5)
+
+    def test_scaled_timing(self):
+        # at a hundred times the recorded speed, thirty recorded seconds take about a third of a second
+        report = replay_of_temperatures(speed=100).run(read_temperature_csv(self.temperatures))
+        self.assertTrue(0.3 <= report["replay_seconds"] < 5)
+
+    def test_a_replay_carries_on_from_its_last_run(self):
+        replay = replay_of_temperatures()
+        first_report = replay.run(read_temperature_csv(self.temperatures))
+
+        # thirty more recorded seconds, with one more hot reading
+        start = 1645531200
+        second_report = replay.run([RecordedMessage(start + 40, "test/temperatures", {"value": 36.5}),
+                                    RecordedMessage(start + 60, "test/temperatures", {"value": 41.0})])
+        self.assertEqual(30, first_report["recorded_seconds"])
+        self.assertEqual(30, second_report["recorded_seconds"])
+        self.assertEqual(2, second_report["messages"]["count"])
+        self.assertEqual([start + 10, start + 30, start + 60],
+                         [decision["timestamp"] for decision in second_report["decisions"]])
+
+    def test_replays_keep_the_network_quiet(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            replay_of_temperatures().run(read_temperature_csv(self.temperatures))
+        self.assertEqual("", output.getvalue())
+
+    def test_topic_dumps(self):
+        dump = os.path.join(self.directory, "dump.jsonl")
+        write_topic_dump(dump, read_temperature_csv(self.temperatures))
+        self.assertEqual(list(read_temperature_csv(self.temperatures)), list(read_topic_dump(dump)))
+
+        report = replay_of_temperatures().run(read_topic_dump(dump))
+        self.assertEqual(2, len(report["decisions"]))
+
+    def test_messages_that_are_not_for_the_world(self):
+        replay = replay_of_temperatures()
+        report = replay.run([RecordedMessage(0, "test/unrelated", {"value": 41})], runs_after_the_last_message=0)
+        self.assertEqual(1, report["messages"]["count"])
+        self.assertEqual({"count": 0}, report["runs"])
+        self.assertNotIn("is_room_temperature_change_needed", replay.network.the_world())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import json
+import unittest
+
+# needed to hold a shard's reply while other calls go through the router
+import threading
+
+from ai import AI, AIRegistry
+from ai.ai_service import AIService
+from ai.ai_router import HashRing, ShardRouter, ShardRouterService, NoShardsAvailable, HomeHandoverFailed
+from ai.ai_client import AIClient
+
+# needed to connect the router, its shards and a client within the test
+import rpyc
+from rpyc.utils.factory import connect_thread
+
+
+def start_test_shard(failing_methods=(), held_methods=(), release=None):
+    # a shard hosts the ais of the homes assigned to it. it can be made to fail some methods, and to hold its reply
+    # to others until it is released
+    ai_registry = AIRegistry(number_of_workers=1)
+    shared_ai = AI.new_instance()
+    ai_service = AIService(lambda tenant: shared_ai if tenant is None else ai_registry.get_or_create(tenant),
+                           ai_registry)
+
+    class TestShard(rpyc.Service):
+        def exposed_call(self, requests_json, dispatcher=None, lease_id=None):
+            methods = [request["method"] for request in json.loads(requests_json)]
+            if any(method in failing_methods for method in methods):
+                return json.dumps([{"error": "ShardError: " + method} for method in methods])
+            if any(method in held_methods for method in methods):
+                release.wait(5)
+            if dispatcher is not None:
+                dispatcher = rpyc.async_(dispatcher)
+            return ai_service.call_batch_json(requests_json, dispatcher, lease_id)
+
+    return ai_registry, connect_thread(remote_service=TestShard)
+
+
+class TestHashRing(unittest.TestCase):
+    def test_homes_spread_over_the_shards(self):
+        ring = HashRing()
+        for shard_id in ["first shard", "second shard", "third shard"]:
+            ring.add_shard(shard_id)
+
+        homes = ["home " + str(number) for number in range(300)]
+        homes_per_shard = {}
+        for home in homes:
+            homes_per_shard[ring.shard_for(home)] = homes_per_shard.get(ring.shard_for(home), 0) + 1
+
+        self.assertEqual(["first shard", "second shard", "third shard"], sorted(homes_per_shard))
+        self.assertTrue(min(homes_per_shard.values()) > 50)
+
+    def test_only_the_homes_of_a_new_shard_move(self):
+        ring = HashRing()
+        ring.add_shard("first shard")
+        ring.add_shard("second shard")
+        homes = ["home " + str(number) for number in range(300)]
+        shards_before = {home: ring.shard_for(home) for home in homes}
+
+        ring.add_shard("third shard")
+        for home in homes:
+            if ring.shard_for(home) != shards_before[home]:
+                self.assertEqual("third shard", ring.shard_for(home))
+
+        # removing the shard puts every home back where it was
+        ring.remove_shard("third shard")
+        self.assertEqual(shards_before, {home: ring.shard_for(home) for home in homes})
+
+    def test_an_empty_ring_has_no_shards(self):
+        self.assertRaises(NoShardsAvailable, HashRing().shard_for, "home")
+
+
+class TestShardRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ShardRouter()
+        self.shards = {}
+        for shard_id in ["first shard", "second shard"]:
+            self.shards[shard_id] = start_test_shard()
+            self.router.add_shard(shard_id, self.shards[shard_id][1])
+
+        # clients connect to the router exactly as they would to a single ai server
+        ShardRouterService._router = self.router
+        self.connection = connect_thread(remote_service=ShardRouterService)
+
+    def tearDown(self):
+        self.connection.close()
+        for ai_registry, shard_connection in self.shards.values():
+            shard_connection.close()
+            ai_registry.shutdown()
+
+    def _update_homes(self, homes):
+        for home in homes:
+            client = AIClient(self.connection, tenant_id=home)
+            client.update_the_world({"home": home})
+            client.set_goals({"is_room_temperature_change_needed": True})
+            client.flush()
+
+    def _read_homes(self, homes):
+        worlds = {}
+        for home in homes:
+            client = AIClient(self.connection, tenant_id=home)
+            client.the_world()
+            worlds[home] = client.flush()[0]
+        return worlds
+
+    def test_homes_are_hosted_by_their_shard(self):
+        homes = ["home " + str(number) for number in range(20)]
+        self._update_homes(homes)
+
+        for home in homes:
+            ai_registry = self.shards[self.router.shard_for(home)][0]
+            self.assertEqual({"home": home}, ai_registry.get(home).network().the_world())
+
+        hosted_homes = [home for ai_registry, _ in self.shards.values() for home in ai_registry.tenants()]
+        self.assertEqual(sorted(homes), sorted(hosted_homes))
+
+    def test_homes_move_with_their_state_when_shards_join_and_leave(self):
+        homes = ["home " + str(number) for number in range(20)]
+        self._update_homes(homes)
+
+        # a new shard takes over some of the homes, with their worlds and goals
+        self.shards["third shard"] = start_test_shard()
+        self.router.add_shard("third shard", self.shards["third shard"][1])
+        moved_homes = self.shards["third shard"][0].tenants()
+        self.assertTrue(len(moved_homes) > 0)
+        for home in moved_homes:
+            self.assertEqual({"is_room_temperature_change_needed": True},
+                             self.shards["third shard"][0].get(home).goals())
+        self.assertEqual({home: {"home": home} for home in homes}, self._read_homes(homes))
+
+        # when a shard leaves, its homes move to the shards that remain
+        self.router.remove_shard("first shard")
+        self.assertEqual([], self.shards["first shard"][0].tenants())
+        self.assertEqual({home: {"home": home} for home in homes}, self._read_homes(homes))
+
+    def test_a_home_is_only_forgotten_once_its_new_shard_has_it(self):
+        homes = ["home " + str(number) for number in range(20)]
+        self._update_homes(homes)
+
+        # the new shard fails to import the homes it now owns. they stay, with their state, where they were
+        self.shards["third shard"] = start_test_shard(failing_methods=["import_home"])
+        with self.assertRaises(HomeHandoverFailed):
+            self.router.add_shard("third shard", self.shards["third shard"][1])
+        hosted_homes = [home for ai_registry, _ in self.shards.values() for home in ai_registry.tenants()]
+        self.assertEqual(sorted(homes), sorted(hosted_homes))
+
+        # calls for those homes still go to the shards that have them, not to the shard the ring gives them to
+        ring = HashRing()
+        for shard_id in self.router.shards():
+            ring.add_shard(shard_id)
+        held_home = next(home for home in homes if ring.shard_for(home) == "third shard")
+        self.assertNotEqual("third shard", self.router.shard_for(held_home))
+        self.assertEqual({held_home: {"home": held_home}}, self._read_homes([held_home]))
+
+    def test_a_shard_that_still_has_homes_is_kept_until_they_move(self):
+        failing_methods = ["export_home"]
+        self.shards["third shard"] = start_test_shard(failing_methods=failing_methods)
+        self.router.add_shard("third shard", self.shards["third shard"][1])
+        homes = ["home " + str(number) for number in range(20)]
+        self._update_homes(homes)
+        third_shard_homes = self.shards["third shard"][0].tenants()
+        self.assertTrue(len(third_shard_homes) > 0)
+
+        # the shard cannot hand its homes over, so it leaves the ring but keeps serving them
+        with self.assertRaises(HomeHandoverFailed):
+            self.router.remove_shard("third shard")
+        self.assertEqual(["first shard", "second shard"], self.router.shards())
+        self.assertEqual({home: "third shard" for home in third_shard_homes},
+                         {home: self.router.shard_for(home) for home in third_shard_homes})
+        self.assertEqual({home: {"home": home} for home in homes}, self._read_homes(homes))
+
+        # once it can hand them over, removing it again moves them
+        failing_methods.clear()
+        self.assertTrue(self.router.remove_shard("third shard") is self.shards["third shard"][1])
+        self.assertEqual([], self.shards["third shard"][0].tenants())
+        self.assertEqual({home: {"home": home} for home in homes}, self._read_homes(homes))
+
+    def test_a_slow_shard_does_not_hold_up_the_others(self):
+        release = threading.Event()
+        self.shards["slow shard"] = start_test_shard(held_methods=["the_world"], release=release)
+        self.router.add_shard("slow shard", self.shards["slow shard"][1])
+        homes = ["home " + str(number) for number in range(20)]
+        slow_home = next(home for home in homes if self.router.shard_for(home) == "slow shard")
+        other_home = next(home for home in homes if self.router.shard_for(home) != "slow shard")
+
+        slow_call = threading.Thread(target=self.router.call_batch,
+                                     args=([{"method": "the_world", "tenant": slow_home}],))
+        slow_call.start()
+        try:
+            # a call for a home on another shard goes through while the slow shard holds its reply
+            response = self.router.call_batch([{"method": "the_world", "tenant": other_home}])[0]
+            self.assertEqual({}, response["result"])
+            self.assertFalse(release.is_set())
+        finally:
+            release.set()
+            slow_call.join()
+
+    def test_requests_must_name_a_home(self):
+        self.assertEqual("NoHome", self.router.call_batch([{"method": "the_world"}])[0]["error"].split(":")[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import json
+import unittest
+
+# needed to simulate slow remote actions, and to wait for them
+import time
+
+from ai import AI
+from ai.ai_service import AIService, RemoteExecutions, CapabilityLeases
+from highcliff.actions import ActionStatus
+from highcliff.goals import Goal
+from ai.ai_client import AIClient, AIServiceError
+from infrastructure import LocalNetwork
+
+# needed to connect a client and a service within the test
+import rpyc
+from rpyc.utils.factory import connect_thread
+
+
+def wait_for(condition, seconds=5):
+    waiting_until = time.monotonic() + seconds
+    while not condition() and time.monotonic() < waiting_until:
+        time.sleep(0.01)
+
+
+class TestAIService(unittest.TestCase):
+    def setUp(self):
+        # serve an isolated ai through the plain-data service api
+        self.ai = AI.new_instance()
+        self.ai.set_network(LocalNetwork.new_instance())
+        ai_service = AIService(lambda tenant: self.ai)
+
+        class TestServer(rpyc.Service):
+            def exposed_call(self, requests_json, dispatcher=None, lease_id=None):
+                if dispatcher is not None:
+                    dispatcher = rpyc.async_(dispatcher)
+                return ai_service.call_batch_json(requests_json, dispatcher, lease_id)
+
+        self.connection = connect_thread(remote_service=TestServer)
+        self.client = AIClient(self.connection)
+
+    def tearDown(self):
+        self.client.close()
+        self.connection.close()
+
+    def test_batched_calls(self):
+        behaviors_run = []
+
+        def monitor_body_temperature(actual_effects):
+            behaviors_run.append(actual_effects)
+
+        # register a capability, update the world and set goals in a single round trip
+        self.client.register_capability({"is_room_temperature_change_needed": True}, {}, monitor_body_temperature,
+                                        name="monitor body temperature")
+        self.client.update_the_world({"is_room_temperature_change_needed": False})
+        self.client.set_goals({"is_room_temperature_change_needed": True})
+        self.client.flush()
+
+        # the server plans with its own copy of the capability. only the behavior runs on the client, and its
+        # effects are applied on the ai's next run
+        self.ai._run_ai()
+        wait_for(lambda: not self.ai.capabilities()[0].in_progress())
+        self.ai._run_ai()
+        self.assertEqual([{"is_room_temperature_change_needed": True}], behaviors_run)
+
+        # read the results back as plain data
+        self.client.the_world()
+        self.client.diary_length()
+        self.client.diary_page(start=0, count=10)
+        the_world, diary_length, diary_page = self.client.flush()
+
+        self.assertEqual({"is_room_temperature_change_needed": True}, the_world)
+        self.assertEqual(2, diary_length)
+        self.assertEqual(["monitor body temperature"], diary_page[0]["my_plan"])
+        self.assertEqual("in_progress", diary_page[0]["action_status"])
+        self.assertEqual("success", diary_page[1]["action_status"])
+
+        # the diary can be queried and summarised where it is kept
+        self.client.diary_query(action="monitor body temperature", status="in_progress")
+        self.client.diary_count(goal={"is_room_temperature_change_needed": True})
+        self.client.diary_success_rate()
+        self.client.diary_summary(percentiles=[50])
+        entries, count, success_rate, summary = self.client.flush()
+        self.assertEqual(["monitor body temperature"], entries[0]["my_plan"])
+        self.assertEqual(1, count)
+
+        # the run that is still in progress is left out of the success rate
+        self.assertEqual(1.0, success_rate)
+        self.assertEqual(1, summary["monitor body temperature"]["count"])
+        self.assertEqual(["p50"], list(summary["monitor body temperature"]["seconds_acting"]))
+
+        # the metrics of the ai are plain data too
+        self.client.metrics()
+        metrics, = self.client.flush()
+        self.assertEqual([{"labels": {}, "value": 2}], metrics["highcliff_ai_runs_total"]["values"])
+        self.assertEqual([{"labels": {"status": "in_progress"}, "value": 1},
+                          {"labels": {"status": "success"}, "value": 1}],
+                         metrics["highcliff_ai_action_outcomes_total"]["values"])
+
+        # and so is the memory it takes
+        self.client.memory_report()
+        memory_report, = self.client.flush()
+        self.assertEqual(2, memory_report["diary"]["entries"])
+        self.assertEqual(1, memory_report["capabilities"]["count"])
+
+    def test_the_ai_does_not_wait_for_remote_actions(self):
+        def slow_behavior(actual_effects):
+            time.sleep(0.5)
+
+        self.client.register_capability({"is_room_temperature_change_needed": True}, {}, slow_behavior)
+        self.client.set_goals({"is_room_temperature_change_needed": True})
+        self.client.flush()
+
+        # the first run dispatches the action and carries on. runs made while it is running do not dispatch it again
+        started = time.monotonic()
+        self.ai._run_ai()
+        self.ai._run_ai()
+        self.assertTrue(time.monotonic() - started < 0.5)
+        self.assertEqual(1, RemoteExecutions.instance().pending())
+        self.assertEqual(ActionStatus.IN_PROGRESS, self.ai.diary()[-1]["action_status"])
+        self.assertNotEqual(True, self.ai.network().the_world().get("is_room_temperature_change_needed"))
+
+        # the run after the action completes applies its effects
+        wait_for(lambda: RemoteExecutions.instance().pending() == 0)
+        self.ai._run_ai()
+        self.assertEqual({"is_room_temperature_change_needed": True}, self.ai.network().the_world())
+        self.assertEqual(ActionStatus.SUCCESS, self.ai.diary()[-1]["action_status"])
+
+    def test_remote_actions_that_do_not_complete_in_time_have_no_effect(self):
+        def slow_behavior(actual_effects):
+            time.sleep(0.5)
+
+        self.client.register_capability({"is_room_temperature_change_needed": True}, {}, slow_behavior, timeout=0.1)
+        self.client.set_goals({"is_room_temperature_change_needed": True})
+        self.client.flush()
+
+        self.ai._run_ai()
+        self.assertEqual(ActionStatus.IN_PROGRESS, self.ai.diary()[0]["action_status"])
+
+        # the completion arrives too late, and is ignored
+        time.sleep(0.8)
+        self.assertEqual(0, RemoteExecutions.instance().pending())
+        self.ai.set_goals({})
+        self.ai._run_ai()
+        self.assertNotEqual(True, self.ai.network().the_world().get("is_room_temperature_change_needed"))
+
+        # the ai learns from the time out as it would from any failure
+        self.assertAlmostEqual(0.8, self.ai._cost_estimator.outcomes(self.ai.capabilities()[0])["success_rate"])
+        self.assertTrue(self.ai.capabilities()[0].get_cost({}) > 1.0)
+
+    def test_capabilities_need_a_dispatcher(self):
+        responses = AIService(lambda tenant: self.ai).call_batch(
+            [{"method": "register_capability", "args": {"capability_id": "monitor",
+                                                        "effects": {"is_room_temperature_change_needed": True}}}])
+        self.assertEqual("NoDispatcher", responses[0]["error"].split(":")[0])
+        self.assertEqual([], self.ai.capabilities())
+
+    def test_homes_with_prioritised_goals_can_be_exported(self):
+        self.ai.set_goals([Goal("is_room_lit", True, priority=2)])
+        ai_service = AIService(lambda tenant: self.ai)
+        exported = json.loads(ai_service.call_batch_json(json.dumps([{"method": "export_home"}])))[0]["result"]
+
+        # a home exported from one ai sets the same goals on another
+        other_ai = AI.new_instance()
+        other_ai.set_network(LocalNetwork.new_instance())
+        AIService(lambda tenant: other_ai).call("import_home", exported)
+        self.assertEqual(self.ai.goals(), other_ai.goals())
+
+    def test_capabilities_are_removed_when_their_client_closes(self):
+        first_capability = self.client.register_capability({"is_room_temperature_change_needed": True}, {}, print)
+        self.client.register_capability({"is_room_temperature_change_authorized": True}, {}, print)
+        self.client.flush()
+        self.assertEqual(2, len(self.ai.capabilities()))
+
+        # a client can remove a single capability
+        self.client.remove_capability(first_capability)
+        self.client.flush()
+        self.assertEqual(["is_room_temperature_change_authorized"], list(self.ai.capabilities()[0].effects))
+
+        # closing the client removes the rest
+        self.client.close()
+        self.assertEqual([], self.ai.capabilities())
+
+    def test_capabilities_are_removed_when_their_lease_lapses(self):
+        leases = CapabilityLeases.instance()
+        self.client.register_capability({"is_room_temperature_change_needed": True}, {}, print)
+        self.client.flush()
+
+        # a lease that is renewed stays alive
+        leases.lease_duration = 0
+        self.client.heartbeat()
+        self.assertEqual(1, len(self.ai.capabilities()))
+
+        # a lease that is not renewed in time ends
+        time.sleep(0.01)
+        leases.expire()
+        leases.lease_duration = 30
+        self.assertEqual([], self.ai.capabilities())
+
+    def test_errors_are_reported_per_call(self):
+        self.client.update_the_world("not a dictionary")
+        self.assertRaises(AIServiceError, self.client.flush)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import io
+import time
+import unittest
+
+# needed to read the events the ai logs during a simulation
+from contextlib import redirect_stdout
+
+from ai.ai_simulation import Simulation
+from highcliff.exampleactions import MonitorBodyTemperature
+from highcliff.actions import ActionStatus
+from highcliff.clock import VirtualClock
+from highcliff.logging import logging_clock
+
+
+class SimulatedBodyTemperatureMonitor(MonitorBodyTemperature):
+    def behavior(self):
+        pass
+
+
+def simulate(seed, number_of_runs):
+    simulation = Simulation(seed)
+    SimulatedBodyTemperatureMonitor(simulation.ai)
+    simulation.ai.set_goals({"is_room_temperature_change_needed": True})
+
+    # now and then, the room drifts away from a comfortable temperature
+    def read_the_thermometer(random, now):
+        if random.random() < 0.3:
+            return {"is_room_temperature_change_needed": False}
+        return None
+
+    simulation.add_sensor("thermometer", read_the_thermometer, seconds_between_readings=5)
+    diary = simulation.run(number_of_runs)
+    return simulation, [(entry["timestamp"], entry["my_goal"], entry["action_status"]) for entry in diary]
+
+
+class TestVirtualClock(unittest.TestCase):
+    def test_events_run_in_time_order_as_the_clock_advances(self):
+        clock = VirtualClock()
+        events = []
+        clock.call_later(3, lambda: events.append(("later", clock.time())))
+        clock.call_every(2, lambda: events.append(("every", clock.time())), first_call_in=1)
+        clock.call_at(3, lambda: events.append(("at", clock.time())))
+
+        clock.sleep(5)
+        self.assertEqual([("every", 1), ("later", 3), ("at", 3), ("every", 3), ("every", 5)], events)
+        self.assertEqual(5, clock.time())
+
+
+class TestSimulation(unittest.TestCase):
+    def test_thousands_of_runs_take_seconds(self):
+        started = time.monotonic()
+        simulation, diary = simulate(seed=1, number_of_runs=2000)
+        self.assertTrue(time.monotonic() - started < 30)
+
+        # the ai paused two simulated seconds after every run
+        self.assertEqual(4000, simulation.clock.time())
+        self.assertEqual(2000, len(diary))
+
+        # the ai reacted to the readings that left its goal unmet
+        reactions = [entry for entry in diary if entry[1] == {"is_room_temperature_change_needed": True}]
+        self.assertTrue(len(reactions) > 100)
+        self.assertEqual({ActionStatus.SUCCESS}, {entry[2] for entry in reactions})
+
+    def test_simulations_with_the_same_seed_play_out_the_same_way(self):
+        self.assertEqual(simulate(seed=7, number_of_runs=200)[1], simulate(seed=7, number_of_runs=200)[1])
+        self.assertNotEqual(simulate(seed=7, number_of_runs=200)[1], simulate(seed=8, number_of_runs=200)[1])
+
+    def test_a_simulation_without_runs_ends_at_once(self):
+        simulation, diary = simulate(seed=1, number_of_runs=0)
+        self.assertEqual([], diary)
+        self.assertEqual(0, simulation.clock.time())
+        self.assertRaises(ValueError, Simulation().run, -1)
+
+    def test_events_are_logged_by_the_simulated_clock(self):
+        simulation = Simulation(start_time=60)
+        simulation.ai.set_debug_logging(True)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            simulation.run(1)
+
+        self.assertTrue(output.getvalue().startswith("1970-01-01 00:01:00 AM | "))
+        self.assertEqual(None, logging_clock())
+
+
+if __name__ == '__main__':
+    unittest.main()
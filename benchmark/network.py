@@ -0,0 +1,213 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to time each call and drive the network from several threads
+import time
+import threading
+
+# needed to disconnect the mqtt networks between runs
+import gc
+
+# needed to report results in a machine-readable form
+import json
+import sys
+import argparse
+
+from infrastructure import LocalNetwork, MqttNetwork, AiMqttNetwork, LocalBroker
+from infrastructure.validation import message_validator
+
+# the networks the load generator can drive
+NETWORKS = ["local", "mqtt"]
+
+# the calls the load generator times
+OPERATIONS = ["subscribe", "publish", "update_the_world"]
+
+
+def _percentile(ordered_timings, fraction):
+    return ordered_timings[min(len(ordered_timings) - 1, int(len(ordered_timings) * fraction))]
+
+
+def _summarise(timings, seconds):
+    if not timings:
+        return {"calls": 0}
+    ordered_timings = sorted(timings)
+    return {
+        "calls": len(timings),
+        "calls_per_second": len(timings) / seconds if seconds > 0 else None,
+        "p50_seconds": _percentile(ordered_timings, 0.5),
+        "p99_seconds": _percentile(ordered_timings, 0.99),
+        "max_seconds": ordered_timings[-1]
+    }
+
+
+def _message(effects, size_of_data):
+    return {
+        "event_type": "load",
+        "event_tags": [],
+        "event_source": "network benchmark",
+        "timestamp": time.time(),
+        "device_info": {},
+        "application_info": {},
+        "user_info": {},
+        "environment": "benchmark",
+        "context": {},
+        "effects": effects,
+        "data": {"padding": "x" * size_of_data}
+    }
+
+
+class _LocalTarget:
+    # every publisher, subscriber and the ai share one local network
+    def __init__(self, number_of_publishers):
+        self.ai_network = LocalNetwork.new_instance()
+        self.publishers = [self.ai_network] * number_of_publishers
+
+    def new_subscriber(self):
+        return self.ai_network
+
+    def create_topic(self, topic):
+        self.ai_network.create_topic(topic)
+
+    def close(self):
+        pass
+
+
+class _MqttTarget:
+    # the ai's network, each publisher and each subscriber have their own connection to a local broker. the networks
+    # print every message they publish and receive unless debug logging is off. that output is not part of the load
+    def __init__(self, number_of_publishers, broker_latency=0.0):
+        self.broker = LocalBroker(latency=broker_latency)
+        self.ai_network = AiMqttNetwork.new_instance()
+        self.ai_network.set_debug_logging(False)
+        self.ai_network.connect_to_local_broker(self.broker, client_id="benchmark-ai")
+        self.publishers = [self.new_subscriber() for publisher in range(number_of_publishers)]
+
+    def new_subscriber(self):
+        network = MqttNetwork()
+        network.set_debug_logging(False)
+        network.connect_to_local_broker(self.broker)
+        return network
+
+    def create_topic(self, topic):
+        pass
+
+    def close(self):
+        # mqtt networks disconnect when they are collected
+        self.ai_network.reset()
+        self.ai_network = None
+        self.publishers = []
+        self.broker = None
+        gc.collect()
+
+
+def _drive(calls, number_of_threads):
+    # share the calls between the threads and return the time each took, and the time they all took
+    timings = []
+    timings_lock = threading.Lock()
+
+    def run(calls_of_this_thread):
+        thread_timings = []
+        for call in calls_of_this_thread:
+            started = time.perf_counter()
+            call()
+            thread_timings.append(time.perf_counter() - started)
+        with timings_lock:
+            timings.extend(thread_timings)
+
+    threads = [threading.Thread(target=run, args=(calls[thread_number::number_of_threads],))
+               for thread_number in range(number_of_threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, time.perf_counter() - started
+
+
+def _load(target, number_of_messages, number_of_topics, subscribers_per_topic, effects_per_message, size_of_data,
+          world_size, concurrency):
+    topics = ["load/" + str(topic_number) for topic_number in range(number_of_topics)]
+    for topic in topics:
+        target.create_topic(topic)
+
+    # start from a world of the given size
+    target.ai_network.update_the_world({"condition_" + str(number): False for number in range(world_size)})
+
+    delivered = []
+
+    def on_message(topic, *args, **kwargs):
+        delivered.append(topic)
+
+    subscribers = [(topic, target.new_subscriber()) for topic in topics for number in range(subscribers_per_topic)]
+    subscriptions = [lambda topic=topic, subscriber=subscriber: subscriber.subscribe(topic, on_message)
+                     for topic, subscriber in subscribers]
+    subscribe_timings, subscribe_seconds = _drive(subscriptions, 1)
+
+    # each message changes conditions of its own, so every update changes the world
+    def effects(message_number):
+        return {"condition_" + str(message_number) + "_" + str(effect_number): True
+                for effect_number in range(effects_per_message)}
+
+    publishes = [lambda number=number: target.publishers[number % concurrency].publish(
+                     topics[number % number_of_topics], _message(effects(number), size_of_data))
+                 for number in range(number_of_messages)]
+    publish_timings, publish_seconds = _drive(publishes, concurrency)
+
+    updates = [lambda number=number: target.ai_network.update_the_world({key: False for key in effects(number)})
+               for number in range(number_of_messages)]
+    update_timings, update_seconds = _drive(updates, concurrency)
+
+    return {
+        "deliveries": len(delivered),
+        "final_world_size": len(target.ai_network.the_world()),
+        "operations": {
+            "subscribe": _summarise(subscribe_timings, subscribe_seconds),
+            "publish": _summarise(publish_timings, publish_seconds),
+            "update_the_world": _summarise(update_timings, update_seconds)
+        }
+    }
+
+
+def benchmark_network(network="local", number_of_messages=1000, number_of_topics=1, subscribers_per_topic=1,
+                      effects_per_message=1, size_of_data=0, world_size=0, concurrency=1, broker_latency=0.0):
+    """Drive a network with subscriptions, publishes and world updates, and report the latency and throughput of
+    each. Messages are spread over the given number of topics, each with the given number of subscribers, and are
+    published from the given number of threads. The world starts with the given number of conditions. The mqtt
+    network runs against a local broker, with the given delivery latency"""
+    if network not in NETWORKS:
+        raise ValueError("unknown network " + network + ". choose one of " + ", ".join(NETWORKS))
+
+    # the message validator is compiled the first time it is used. that is a cost of startup, not of load
+    message_validator()
+
+    target = _LocalTarget(concurrency) if network == "local" else _MqttTarget(concurrency, broker_latency)
+    try:
+        results = _load(target, number_of_messages, number_of_topics, subscribers_per_topic, effects_per_message,
+                        size_of_data, world_size, concurrency)
+    finally:
+        target.close()
+
+    results["configuration"] = {"network": network, "number_of_messages": number_of_messages,
+                                "number_of_topics": number_of_topics, "subscribers_per_topic": subscribers_per_topic,
+                                "effects_per_message": effects_per_message, "size_of_data": size_of_data,
+                                "world_size": world_size, "concurrency": concurrency,
+                                "broker_latency": broker_latency}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the latency and throughput of a network under load")
+    parser.add_argument("--network", default="local", choices=NETWORKS)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--topics", type=int, default=1)
+    parser.add_argument("--subscribers", type=int, default=1, help="subscribers per topic")
+    parser.add_argument("--effects", type=int, default=1, help="effects per message")
+    parser.add_argument("--data-size", type=int, default=0, help="bytes of data padding per message")
+    parser.add_argument("--world-size", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=1, help="publishing threads")
+    parser.add_argument("--broker-latency", type=float, default=0.0)
+    arguments = parser.parse_args()
+    json.dump(benchmark_network(arguments.network, arguments.messages, arguments.topics, arguments.subscribers,
+                                arguments.effects, arguments.data_size, arguments.world_size, arguments.concurrency,
+                                arguments.broker_latency), sys.stdout, indent=2)
@@ -0,0 +1,55 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to time imports in fresh interpreters
+import subprocess
+import sys
+import os
+
+# needed to report results in a machine-readable form
+import json
+
+# needed to summarise the timings of several runs
+import statistics
+
+# modules that must not be loaded until they are first used
+LAZILY_IMPORTED_MODULES = ["awscrt", "awsiot", "jsonschema", "rpyc", "arrow", "multiprocessing"]
+
+# the root of the repository, so that the benchmark imports the working copy
+_repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# measures one import in a fresh interpreter and reports the time it took and the lazy modules it loaded
+_measurement = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {lazy_modules!r} if name in sys.modules]}}))
+"""
+
+
+def measure_startup(module="ai", number_of_runs=5):
+    """Import the given module in fresh interpreters and report how long the import took and which of the lazily
+    imported modules it loaded anyway"""
+    code = _measurement.format(module=module, lazy_modules=LAZILY_IMPORTED_MODULES)
+    runs = []
+    for run in range(number_of_runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=_repository_root, capture_output=True, text=True,
+                                check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    timings = [run["seconds"] for run in runs]
+    return {
+        "module": module,
+        "number_of_runs": number_of_runs,
+        "median_seconds": statistics.median(timings),
+        "minimum_seconds": min(timings),
+        "maximum_seconds": max(timings),
+        "lazy_modules_loaded": runs[0]["loaded"]
+    }
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or ["ai", "infrastructure"]
+    print(json.dumps([measure_startup(module) for module in modules], indent=2))
@@ -0,0 +1,40 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import io
+import unittest
+from benchmark.network import benchmark_network, NETWORKS, OPERATIONS
+
+# needed to check that the networks under load print nothing
+from contextlib import redirect_stdout
+
+
+class TestNetworkBenchmark(unittest.TestCase):
+    def test_every_operation_is_measured_on_every_network(self):
+        for network in NETWORKS:
+            result = benchmark_network(network, number_of_messages=20, number_of_topics=2, subscribers_per_topic=3,
+                                       effects_per_message=2, world_size=10, concurrency=2)
+
+            # every message reaches every subscriber of its topic, and every update reaches the world
+            self.assertEqual(20 * 3, result["deliveries"])
+            self.assertEqual(10 + 20 * 2, result["final_world_size"])
+
+            self.assertEqual(2 * 3, result["operations"]["subscribe"]["calls"])
+            for operation in OPERATIONS:
+                summary = result["operations"][operation]
+                self.assertTrue(summary["p50_seconds"] <= summary["p99_seconds"] <= summary["max_seconds"])
+                self.assertTrue(summary["calls_per_second"] > 0)
+
+    def test_the_networks_under_load_print_nothing(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            benchmark_network("mqtt", number_of_messages=20, number_of_topics=2)
+        self.assertEqual("", output.getvalue())
+
+    def test_unknown_networks_are_refused(self):
+        self.assertRaises(ValueError, benchmark_network, "carrier pigeon")
+
+
+if __name__ == '__main__':
+    unittest.main()
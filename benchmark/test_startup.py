@@ -0,0 +1,20 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import unittest
+from benchmark.startup import measure_startup
+
+
+class TestStartup(unittest.TestCase):
+    def test_importing_the_ai_loads_no_lazy_modules(self):
+        result = measure_startup("ai", number_of_runs=1)
+        self.assertEqual([], result["lazy_modules_loaded"])
+        self.assertTrue(result["median_seconds"] > 0)
+
+    def test_importing_the_infrastructure_loads_no_lazy_modules(self):
+        self.assertEqual([], measure_startup("infrastructure", number_of_runs=1)["lazy_modules_loaded"])
+
+
+if __name__ == '__main__':
+    unittest.main()
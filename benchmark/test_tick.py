@@ -0,0 +1,29 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import unittest
+from benchmark.tick import benchmark_tick, build_capability_graph, PHASES
+from ai import AI
+
+
+class TestTickBenchmark(unittest.TestCase):
+    def test_capability_graphs_grow_with_copies_and_depth(self):
+        ai = AI.new_instance()
+        goals = build_capability_graph(ai, number_of_copies=2, depth=3, families=["temperature"])
+        self.assertEqual({"temperature_step_2_0": True, "temperature_step_2_1": True}, goals)
+        self.assertEqual(2 * (3 + 3), len(ai.capabilities()))
+
+    def test_every_phase_is_timed(self):
+        result = benchmark_tick(number_of_copies=2, depth=1, families=["temperature", "airflow"])
+
+        # the ai works through the whole graph without pausing between runs
+        self.assertEqual(4, result["goals_met"])
+        self.assertEqual(16, result["configuration"]["number_of_runs"])
+        for phase in PHASES:
+            self.assertEqual(16, result["phases"][phase]["calls"])
+            self.assertTrue(result["phases"][phase]["p95_seconds"] <= result["phases"][phase]["max_seconds"])
+
+
+if __name__ == '__main__':
+    unittest.main()
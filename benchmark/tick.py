@@ -0,0 +1,146 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to time each phase of the ai's run
+import time
+import functools
+
+# needed to summarise the timings and report them in a machine-readable form
+import statistics
+import json
+import sys
+import argparse
+
+from ai import AI
+from highcliff.actions import AIaction
+from infrastructure import LocalNetwork
+
+# the action families the synthetic capability graphs are built from
+from highcliff.temperature import MonitorTemperature, AuthorizeTemperatureAdjustment, AdjustTemperature
+from highcliff.airflow import MonitorAirflow, AuthorizeAirflowAdjustment, AdjustAirflow
+from highcliff.bed import MonitorBed, RequestBedAdjustment, ConfirmBedAdjustment
+from highcliff.medication import MonitorMedication, RequestMedication, ConfirmMedicationGiven
+from highcliff.catheter import MonitorCatheter, RequestCatheterMaintenance, ConfirmCatheterMaintenance
+from highcliff.colostomy import MonitorColostomyBag, RequestColostomyBagMaintenance, ConfirmColostomyBagMaintenance
+
+ACTION_FAMILIES = {
+    "temperature": [MonitorTemperature, AuthorizeTemperatureAdjustment, AdjustTemperature],
+    "airflow": [MonitorAirflow, AuthorizeAirflowAdjustment, AdjustAirflow],
+    "bed": [MonitorBed, RequestBedAdjustment, ConfirmBedAdjustment],
+    "medication": [MonitorMedication, RequestMedication, ConfirmMedicationGiven],
+    "catheter": [MonitorCatheter, RequestCatheterMaintenance, ConfirmCatheterMaintenance],
+    "colostomy": [MonitorColostomyBag, RequestColostomyBagMaintenance, ConfirmColostomyBagMaintenance]
+}
+
+# the phases of a run of the ai, by the name of the method that carries them out
+PHASES = {"select_goals": "_select_goals", "plan": "_plan", "act": "_act", "reflect": "_reflect"}
+
+
+class SyntheticAction(AIaction):
+    """A copy of an action from one of the action families, working on conditions of its own"""
+    def __init__(self, ai, name, effects, preconditions):
+        super().__init__(ai)
+        self.name = name
+        self.effects = effects
+        self.preconditions = preconditions
+
+    def behavior(self):
+        pass
+
+
+def build_capability_graph(ai, number_of_copies=10, depth=0, families=None):
+    """Give the ai a copy of each action family for each of the given number of copies, as if it served that many
+    rooms. Each copy is extended by a chain of the given depth of further steps. Returns the goals that make the ai
+    work through every step of every copy"""
+    goals = {}
+    for family_name in families or ACTION_FAMILIES:
+        # read the effects and preconditions of the family from actions given to a scratch ai
+        templates = [action_class(AI.new_instance()) for action_class in ACTION_FAMILIES[family_name]]
+
+        for copy_number in range(number_of_copies):
+            def rename(conditions):
+                return {condition + "_" + str(copy_number): value for condition, value in conditions.items()}
+
+            for template in templates:
+                SyntheticAction(ai, type(template).__name__, rename(template.effects), rename(template.preconditions))
+            goal = rename(templates[-1].effects)
+
+            # extend the family with a chain of further steps, each needing the one before
+            for step in range(depth):
+                step_effects = {family_name + "_step_" + str(step) + "_" + str(copy_number): True}
+                SyntheticAction(ai, family_name + " step " + str(step), step_effects, goal)
+                goal = step_effects
+
+            goals.update(goal)
+    return goals
+
+
+def _time_phases(ai, timings):
+    # replace each phase of the ai with a version of it that records how long it took
+    for phase, method_name in PHASES.items():
+        method = getattr(ai, method_name)
+
+        def timed_method(*args, __method=method, __timings=timings[phase], **kwargs):
+            started = time.perf_counter()
+            try:
+                return __method(*args, **kwargs)
+            finally:
+                __timings.append(time.perf_counter() - started)
+
+        setattr(ai, method_name, functools.wraps(method)(timed_method))
+
+
+def _summarise(timings):
+    if not timings:
+        return {"calls": 0}
+    ordered_timings = sorted(timings)
+    return {
+        "calls": len(timings),
+        "total_seconds": sum(timings),
+        "mean_seconds": statistics.mean(timings),
+        "p50_seconds": ordered_timings[len(ordered_timings) // 2],
+        "p95_seconds": ordered_timings[min(len(ordered_timings) - 1, int(len(ordered_timings) * 0.95))],
+        "max_seconds": ordered_timings[-1]
+    }
+
+
+def benchmark_tick(number_of_copies=10, depth=0, families=None, number_of_runs=None):
+    """Run an ai over a synthetic capability graph, without pausing between runs, and report how long each phase of
+    its runs took. By default the ai runs long enough to work through the whole graph"""
+    ai = AI.new_instance()
+    ai.set_network(LocalNetwork.new_instance())
+    goals = build_capability_graph(ai, number_of_copies, depth, families)
+    ai.set_goals(goals)
+
+    # each goal takes one run per step in its chain
+    if number_of_runs is None:
+        number_of_runs = len(goals) * (3 + depth)
+
+    timings = {phase: [] for phase in PHASES}
+    _time_phases(ai, timings)
+
+    started = time.perf_counter()
+    no_pause_between_runs = 0
+    ai._run_temporarily(number_of_runs, no_pause_between_runs)
+    seconds = time.perf_counter() - started
+
+    return {
+        "configuration": {"number_of_copies": number_of_copies, "depth": depth,
+                          "families": list(families or ACTION_FAMILIES), "number_of_runs": number_of_runs,
+                          "number_of_capabilities": len(ai.capabilities()), "number_of_goals": len(goals)},
+        "runs_per_second": number_of_runs / seconds,
+        "goals_met": sum(1 for goal, value in goals.items() if ai.network().the_world().get(goal) == value),
+        "phases": {phase: _summarise(phase_timings) for phase, phase_timings in timings.items()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the phases of the ai's runs over a synthetic capability graph")
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=0)
+    parser.add_argument("--families", nargs="*", default=None, choices=list(ACTION_FAMILIES))
+    parser.add_argument("--runs", type=int, default=None)
+    arguments = parser.parse_args()
+    json.dump(benchmark_tick(arguments.copies, arguments.depth, arguments.families, arguments.runs), sys.stdout,
+              indent=2)
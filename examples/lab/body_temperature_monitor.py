@@ -55,9 +55,8 @@ def run_body_temperature_monitor():
     highcliff_ai = connection.root.get_ai_instance()
     print("connected to the remote AI server")
 
-    # run the body temperature model and register it with the highcliff ai
+    # run the body temperature model. creating the action registers it with the highcliff ai
     monitor = BodyTemperatureMonitor(highcliff_ai)
-    highcliff_ai.add_capability(monitor)
     print("registered with the remote AI server")
 
     # keep the body temperature active in the background for a period of time
@@ -66,8 +65,10 @@ def run_body_temperature_monitor():
     monitor_execution_thread = Thread(target=time.sleep, args=(seconds_to_spend_monitoring_body_temperature,))
     monitor_execution_thread.start()
 
-    # todo: unregister from the ai
-    # disconnect from the ai
+    # unregister from the ai and disconnect once monitoring is done
+    monitor_execution_thread.join()
+    highcliff_ai.remove_capability(monitor)
+    connection.close()
 
 
 if __name__ == "__main__":
@@ -15,15 +15,29 @@ import copy
 
 
 class AIaction(Action):
+    # the cost of the action to the planner, before anything has been learned about it
+    cost = 1.0
+
+    # the cost the ai has learned from running the action, if it has run. see CostEstimator
+    estimated_cost = None
 
     def __init__(self, ai):
-        ai.add_capability(self)
-        # the intended effect of the action on the world
-        self.effects = {}
+        # the intended effect of the action on the world. each action gets its own copy of the effects and
+        # preconditions declared by its class, so changing them never changes another action
+        self.effects = copy.deepcopy(type(self).effects)
+        self.preconditions = copy.deepcopy(type(self).preconditions)
 
         # the actual effect of the action on the world
         self.actual_effects = None
 
+        ai.add_capability(self)
+
+    def get_cost(self, services):
+        # the planner prefers the actions that have proven fastest and most reliable
+        if self.estimated_cost is None:
+            return self.cost
+        return self.estimated_cost
+
     @staticmethod
     def update_the_world(network, update):
         # update the world state of highcliff
@@ -37,6 +51,10 @@ class AIaction(Action):
         self.behavior()
         self.update_the_world(network, self.actual_effects)
 
+    def in_progress(self):
+        # an action that runs in the background is still in progress until it reports its actual effects
+        return False
+
     def behavior(self):
         # custom behavior must be specified by anyone implementing an AI action
         raise NotImplementedError
@@ -46,3 +64,6 @@ class ActionStatus(Enum):
     SUCCESS = 'success'
     FAIL = 'fail'
 
+    # the action runs in the background and has not reported its actual effects yet
+    IN_PROGRESS = 'in_progress'
+
@@ -2,4 +2,4 @@ __author__ = "Jerry Overton"
 __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
-from bed import MonitorBed, AuthorizeBedAdjustment, AdjustBed, RequestBedAdjustment, ConfirmBedAdjustment
+from highcliff.bed.bed import MonitorBed, AuthorizeBedAdjustment, AdjustBed, RequestBedAdjustment, ConfirmBedAdjustment
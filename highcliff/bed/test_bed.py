@@ -3,11 +3,59 @@ __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
 import unittest
+from highcliff.bed import MonitorBed, AuthorizeBedAdjustment, AdjustBed, RequestBedAdjustment, ConfirmBedAdjustment
+from ai import AI
+from infrastructure import LocalNetwork
 
 
-class MyTestCase(unittest.TestCase):
-    def test_something(self):
-        self.assertEqual(True, False)
+class TestLearnedBedAdjustmentCosts(unittest.TestCase):
+    def setUp(self):
+        self.ai = AI.new_instance()
+        self.ai.set_network(LocalNetwork.new_instance())
+
+    def test_plans_converge_to_the_reliable_path(self):
+        # the problem with the bed is already known, so both paths start from authorizing or requesting an adjustment
+        class TestAuthorizeBedAdjustment(AuthorizeBedAdjustment):
+            preconditions = {}
+
+            def behavior(self):
+                pass
+
+        class TestAdjustBed(AdjustBed):
+            def behavior(self):
+                # the adjustment never works
+                self.actual_effects["problem_with_bed"] = True
+
+        class TestRequestBedAdjustment(RequestBedAdjustment):
+            preconditions = {}
+
+            def behavior(self):
+                pass
+
+        class TestConfirmBedAdjustment(ConfirmBedAdjustment):
+            def behavior(self):
+                pass
+
+        for action in [TestAuthorizeBedAdjustment, TestAdjustBed, TestRequestBedAdjustment, TestConfirmBedAdjustment]:
+            action(self.ai)
+
+        # each action has effects of its own, declared by its class
+        self.assertEqual({"bed_adjustment_authorized": True}, self.ai.capabilities()[0].effects)
+        self.assertFalse(self.ai.capabilities()[1].effects is AdjustBed.effects)
+
+        self.ai.network().update_the_world({"problem_with_bed": True, "bed_adjustment_authorized": False,
+                                            "bed_adjustment_requested": False})
+        self.ai.set_goals({"problem_with_bed": False})
+        for run in range(10):
+            self.ai._run_ai()
+            if not self.ai.network().the_world()["problem_with_bed"]:
+                break
+
+        # failing adjustments made the adjustment path costlier than requesting and confirming an adjustment
+        self.assertFalse(self.ai.network().the_world()["problem_with_bed"])
+        actions_taken = [type(entry["my_plan"][0].action).__name__ for entry in self.ai.diary()]
+        self.assertEqual("TestConfirmBedAdjustment", actions_taken[-1])
+        self.assertTrue(self.ai.capabilities()[1].get_cost({}) > 2)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to tell the real time and to wait in it
+import time
+
+# needed to run scheduled events in time order
+import heapq
+from itertools import count
+
+
+class SystemClock:
+    """The real clock. This is the default clock of the ai and its networks"""
+    @staticmethod
+    def time():
+        return time.time()
+
+    @staticmethod
+    def monotonic():
+        return time.monotonic()
+
+    @staticmethod
+    def sleep(seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """A clock that only moves when it is told to. Sleeping moves the clock forward at once, running every event
+    scheduled in the meantime, so simulated hours pass in moments. Events due at the same time run in the order they
+    were scheduled, so a simulation plays out the same way every time"""
+    def __init__(self, start=0.0):
+        self._now = start
+        self._events = []
+        self._event_numbers = count()
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def call_at(self, when, callback):
+        """Run the callback when the clock reaches the given time"""
+        heapq.heappush(self._events, (when, next(self._event_numbers), callback))
+
+    def call_later(self, seconds, callback):
+        self.call_at(self._now + seconds, callback)
+
+    def call_every(self, seconds, callback, first_call_in=0):
+        """Run the callback every given number of seconds, starting after first_call_in seconds"""
+        def call_and_repeat():
+            callback()
+            self.call_later(seconds, call_and_repeat)
+
+        self.call_later(first_call_in, call_and_repeat)
+
+    def pending(self):
+        return len(self._events)
+
+    def advance(self, seconds):
+        """Move the clock forward, running the events that fall due on the way, each at its own time"""
+        until = self._now + seconds
+        while self._events and self._events[0][0] <= until:
+            when, event_number, callback = heapq.heappop(self._events)
+            self._now = max(self._now, when)
+            callback()
+        self._now = until
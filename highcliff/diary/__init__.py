@@ -0,0 +1,6 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+from highcliff.diary.diary import Diary, describe_action
+from highcliff.diary.columns import DiaryExporter, DiaryColumns, export_diary, diary_entry_as_row
@@ -0,0 +1,182 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to write columns, and the manifest that describes them, to disk
+import os
+import json
+import gzip
+
+from highcliff.diary.diary import describe_action
+
+# describes the layout of an exported diary
+_manifest_file_name = "manifest.json"
+_format = "highcliff-diary-columns"
+_format_version = 1
+
+# the columns every row has. the state of the world before and after each run adds a column per condition
+FIXED_COLUMNS = ["timestamp", "goal", "action", "plan_length", "action_status", "seconds_acting"]
+WORLD_BEFORE_PREFIX = "world_before."
+WORLD_AFTER_PREFIX = "world_after."
+
+
+def diary_entry_as_row(diary_entry):
+    """Flatten a diary entry into a row with one column per field and one per condition of the world"""
+    plan = diary_entry["my_plan"]
+    row = {
+        "timestamp": diary_entry.get("timestamp"),
+        "goal": json.dumps(diary_entry["my_goal"], sort_keys=True),
+        "action": describe_action(plan[0].action) if plan else None,
+        "plan_length": None if plan is None else len(plan),
+        "action_status": diary_entry["action_status"].value,
+        "seconds_acting": diary_entry.get("seconds_acting")
+    }
+    for condition, value in (diary_entry.get("the_world_state_before") or {}).items():
+        row[WORLD_BEFORE_PREFIX + condition] = value
+    for condition, value in (diary_entry.get("the_world_state_after") or {}).items():
+        row[WORLD_AFTER_PREFIX + condition] = value
+    return row
+
+
+def _read_manifest(directory):
+    with open(os.path.join(directory, _manifest_file_name)) as manifest_file:
+        return json.load(manifest_file)
+
+
+class DiaryExporter:
+    """Streams diary entries to a directory of columns. Entries are held in memory only until there are enough to
+    fill a row group, which is then written as one compressed file per column. A manifest lists the row groups, the
+    columns each has and the times they cover. Exporting to a directory that already holds an export adds to it"""
+    def __init__(self, directory, rows_per_group=1000):
+        self._directory = directory
+        self._rows_per_group = rows_per_group
+        self._rows = []
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, _manifest_file_name)):
+            self._manifest = _read_manifest(directory)
+        else:
+            self._manifest = {"format": _format, "version": _format_version, "columns": list(FIXED_COLUMNS),
+                              "row_groups": []}
+
+    def write(self, diary_entry):
+        self._rows.append(diary_entry_as_row(diary_entry))
+        if len(self._rows) >= self._rows_per_group:
+            self.flush()
+
+    def write_all(self, diary_entries):
+        for diary_entry in diary_entries:
+            self.write(diary_entry)
+
+    def flush(self):
+        """Write the rows held in memory as a row group"""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+
+        # columns are kept in the order they first appear
+        columns = list(FIXED_COLUMNS)
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    columns.append(column)
+
+        row_group_number = len(self._manifest["row_groups"])
+        row_group_directory = "row_group_" + str(row_group_number).zfill(6)
+        os.makedirs(os.path.join(self._directory, row_group_directory), exist_ok=True)
+
+        # column names come from the world, so the files are numbered rather than named after them
+        column_files = {}
+        for column_number, column in enumerate(columns):
+            column_file = os.path.join(row_group_directory, str(column_number) + ".json.gz")
+            with gzip.open(os.path.join(self._directory, column_file), "wt", encoding="utf-8") as column_data:
+                json.dump([row.get(column) for row in rows], column_data)
+            column_files[column] = column_file
+
+        timestamps = [row["timestamp"] for row in rows if row["timestamp"] is not None]
+        self._manifest["row_groups"].append({
+            "name": row_group_directory,
+            "number_of_rows": len(rows),
+            "first_timestamp": min(timestamps) if timestamps else None,
+            "last_timestamp": max(timestamps) if timestamps else None,
+            "columns": column_files
+        })
+        for column in columns:
+            if column not in self._manifest["columns"]:
+                self._manifest["columns"].append(column)
+        self._write_manifest()
+
+    def close(self):
+        self.flush()
+
+    def _write_manifest(self):
+        # replace the manifest in one step, so a reader never sees a half written one
+        manifest_path = os.path.join(self._directory, _manifest_file_name)
+        with open(manifest_path + ".tmp", "w") as manifest_file:
+            json.dump(self._manifest, manifest_file, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def export_diary(diary, directory, start=0, rows_per_group=1000):
+    """Export the entries of a diary from the given position on, adding to any export already in the directory.
+    Returns the number of entries in the diary when the export was made, to pass as start on the next export.
+    Entries are found by their position rather than their time stamp, since entries can share a time stamp and the
+    clock can be set back"""
+    exporter = DiaryExporter(directory, rows_per_group)
+    end = len(diary)
+    exporter.write_all(diary[start:end])
+    exporter.close()
+    return end
+
+
+class DiaryColumns:
+    """Reads a diary export. Only the row groups that overlap the requested window, and only the requested columns of
+    those, are read, one row group at a time"""
+    def __init__(self, directory):
+        self._directory = directory
+        self._manifest = _read_manifest(directory)
+
+    def columns(self):
+        return list(self._manifest["columns"])
+
+    def number_of_rows(self):
+        return sum(row_group["number_of_rows"] for row_group in self._manifest["row_groups"])
+
+    def _row_groups_in(self, since, until):
+        for row_group in self._manifest["row_groups"]:
+            if since is not None and row_group["last_timestamp"] is not None and row_group["last_timestamp"] < since:
+                continue
+            if until is not None and row_group["first_timestamp"] is not None and \
+                    row_group["first_timestamp"] > until:
+                continue
+            yield row_group
+
+    def _read_column(self, row_group, column):
+        # a column that first appeared after the row group was written has no values in it
+        if column not in row_group["columns"]:
+            return [None] * row_group["number_of_rows"]
+        with gzip.open(os.path.join(self._directory, row_group["columns"][column]), "rt",
+                       encoding="utf-8") as column_data:
+            return json.load(column_data)
+
+    def read(self, columns=None, since=None, until=None):
+        """Yield the requested columns, by default all of them, of each row group in the window, as a dictionary of
+        lists of values. Rows outside the window are left out"""
+        columns = list(columns or self.columns())
+        for row_group in self._row_groups_in(since, until):
+            timestamps = self._read_column(row_group, "timestamp")
+            in_window = [(since is None and until is None) or
+                         (timestamp is not None and (since is None or timestamp >= since) and
+                          (until is None or timestamp <= until)) for timestamp in timestamps]
+            values = {}
+            for column in columns:
+                column_values = timestamps if column == "timestamp" else self._read_column(row_group, column)
+                values[column] = [value for value, keep in zip(column_values, in_window) if keep]
+            yield values
+
+    def rows(self, columns=None, since=None, until=None):
+        """Yield the rows in the window, one dictionary per row"""
+        for values in self.read(columns, since, until):
+            column_names = list(values)
+            for row in zip(*values.values()):
+                yield dict(zip(column_names, row))
@@ -0,0 +1,166 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to let the diary stand in for the list it replaces
+from collections.abc import Sequence
+
+# needed to find entries by time, and by position in an index
+from bisect import bisect_left, bisect_right
+
+# needed to time stamp entries and to read the diary while the ai writes to it
+import time
+import threading
+
+from highcliff.actions import ActionStatus
+
+# needed to report the memory the diary takes
+from highcliff.memory import deep_size_of
+
+
+def describe_action(action):
+    # remote capabilities are known by the name their client gave them
+    return getattr(action, "name", type(action).__name__)
+
+
+def _goal_key(goal):
+    return tuple(sorted(goal.items()))
+
+
+def _action_key(entry):
+    plan = entry["my_plan"]
+    return describe_action(plan[0].action) if plan else None
+
+
+def _percentile(ordered_values, percentile):
+    return ordered_values[min(len(ordered_values) - 1, int(len(ordered_values) * percentile / 100))]
+
+
+def _is_in(index, position):
+    # indexes hold positions in ascending order
+    found_at = bisect_left(index, position)
+    return found_at < len(index) and index[found_at] == position
+
+
+class Diary(Sequence):
+    """The ai's record of each run. It reads like the list of diary entries it replaces, and keeps indexes of the
+    entries by goal, by the action taken, by action status and by time, so that questions about a window of the
+    diary only look at the entries they are about"""
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._entries = []
+        self._timestamps = []
+        self._positions_by_goal = {}
+        self._positions_by_action = {}
+        self._positions_by_status = {}
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        """Record a diary entry, time stamping it if it has no time stamp"""
+        if entry.get("timestamp") is None:
+            entry["timestamp"] = self._clock()
+        with self._lock:
+            position = len(self._entries)
+            self._entries.append(entry)
+
+            # the time index must stay in order, even if the clock is set back
+            timestamp = entry["timestamp"]
+            if self._timestamps and timestamp < self._timestamps[-1]:
+                timestamp = self._timestamps[-1]
+            self._timestamps.append(timestamp)
+
+            self._positions_by_goal.setdefault(_goal_key(entry["my_goal"]), []).append(position)
+            self._positions_by_action.setdefault(_action_key(entry), []).append(position)
+            self._positions_by_status.setdefault(entry["action_status"], []).append(position)
+
+    def __getitem__(self, position):
+        with self._lock:
+            return self._entries[position]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def memory_report(self, seen=None):
+        """The number of entries in the diary, and the size, in bytes, of the entries and of their indexes"""
+        with self._lock:
+            entries = list(self._entries)
+            indexes = [list(self._timestamps), dict(self._positions_by_goal), dict(self._positions_by_action),
+                       dict(self._positions_by_status)]
+        return {"entries": len(entries), "bytes": deep_size_of(entries, seen),
+                "index_bytes": deep_size_of(indexes, seen)}
+
+    def actions(self):
+        """The names of the actions the diary has entries for"""
+        with self._lock:
+            return [action for action in self._positions_by_action if action is not None]
+
+    def _positions(self, goal=None, action=None, status=None, since=None, until=None):
+        # the positions of the entries that match every given filter, oldest first
+        with self._lock:
+            first = 0 if since is None else bisect_left(self._timestamps, since)
+            last = len(self._entries) if until is None else bisect_right(self._timestamps, until)
+
+            indexes = []
+            if goal is not None:
+                indexes.append(self._positions_by_goal.get(_goal_key(goal), []))
+            if action is not None:
+                indexes.append(self._positions_by_action.get(action, []))
+            if status is not None:
+                indexes.append(self._positions_by_status.get(ActionStatus(status), []))
+            if not indexes:
+                return list(range(first, last))
+
+            # walk the smallest index within the window, checking the others for each of its positions
+            indexes.sort(key=len)
+            smallest_index = indexes[0]
+            positions = smallest_index[bisect_left(smallest_index, first):bisect_left(smallest_index, last)]
+            return [position for position in positions if all(_is_in(index, position) for index in indexes[1:])]
+
+    def query(self, goal=None, action=None, status=None, since=None, until=None, start=0, count=None):
+        """Return the entries for the given goal, action name and action status, time stamped within the given window.
+        Every filter is optional. Entries are oldest first, and can be paged through with start and count"""
+        positions = self._positions(goal, action, status, since, until)
+        positions = positions[start:] if count is None else positions[start:start + count]
+        with self._lock:
+            return [self._entries[position] for position in positions]
+
+    def count(self, goal=None, action=None, status=None, since=None, until=None):
+        return len(self._positions(goal, action, status, since, until))
+
+    def success_rate(self, goal=None, action=None, since=None, until=None):
+        """The share of the matching entries whose action succeeded, or None if there are none. Actions still in
+        progress are left out"""
+        number_of_entries = self.count(goal, action, None, since, until) - \
+            self.count(goal, action, ActionStatus.IN_PROGRESS, since, until)
+        if number_of_entries == 0:
+            return None
+        return self.count(goal, action, ActionStatus.SUCCESS, since, until) / number_of_entries
+
+    def seconds_acting(self, goal=None, action=None, status=None, since=None, until=None, percentiles=(50, 95, 99)):
+        """Percentiles of the time the matching actions took, as a dictionary such as {"p50": ...}"""
+        timings = sorted(entry["seconds_acting"] for entry in self.query(goal, action, status, since, until)
+                         if entry.get("seconds_acting") is not None)
+        if not timings:
+            return {"p" + str(percentile): None for percentile in percentiles}
+        return {"p" + str(percentile): _percentile(timings, percentile) for percentile in percentiles}
+
+    def summary_by_action(self, since=None, until=None, percentiles=(50, 95, 99)):
+        """For each action, the number of times it ran within the window, how often it succeeded and how long it
+        took"""
+        summary = {}
+        for action in self.actions():
+            count = self.count(action=action, since=since, until=until)
+            if count:
+                summary[action] = {"count": count, "success_rate": self.success_rate(action=action, since=since,
+                                                                                     until=until),
+                                   "seconds_acting": self.seconds_acting(action=action, since=since, until=until,
+                                                                         percentiles=percentiles)}
+        return summary
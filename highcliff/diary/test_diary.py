@@ -0,0 +1,147 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import os
+import tempfile
+import unittest
+from collections import namedtuple
+
+from highcliff.diary import Diary, DiaryExporter, DiaryColumns, export_diary
+from highcliff.actions import ActionStatus
+
+PlanStep = namedtuple("PlanStep", "action services")
+
+
+class MonitorBodyTemperature:
+    pass
+
+
+class AuthorizeRoomTemperatureChange:
+    name = "authorize room temperature change"
+
+
+def diary_entry(goal, action, action_status, timestamp, seconds_acting=None, world_before=None, world_after=None):
+    return {"my_goal": goal, "the_world_state_before": world_before or {},
+            "my_plan": None if action is None else [PlanStep(action, {})], "action_status": action_status,
+            "the_world_state_after": world_after or {}, "timestamp": timestamp, "seconds_acting": seconds_acting}
+
+
+class TestDiary(unittest.TestCase):
+    def setUp(self):
+        self.diary = Diary()
+        monitor, authorize = MonitorBodyTemperature(), AuthorizeRoomTemperatureChange()
+        needed, authorized = {"is_room_temperature_change_needed": True}, {"is_room_temperature_change_authorized": True}
+        for entry in [diary_entry(needed, monitor, ActionStatus.SUCCESS, 10, 0.1),
+                      diary_entry(authorized, authorize, ActionStatus.FAIL, 20, 0.4),
+                      diary_entry(authorized, authorize, ActionStatus.SUCCESS, 30, 0.2),
+                      diary_entry(authorized, authorize, ActionStatus.SUCCESS, 40, 0.3),
+                      diary_entry({}, None, ActionStatus.SUCCESS, 50)]:
+            self.diary.append(entry)
+
+    def test_the_diary_reads_like_a_list(self):
+        self.assertEqual(5, len(self.diary))
+        self.assertEqual(ActionStatus.FAIL, self.diary[1]["action_status"])
+        self.assertEqual([50], [entry["timestamp"] for entry in self.diary[4:]])
+        self.assertEqual(list(self.diary), self.diary)
+        self.assertEqual([], Diary())
+
+        # entries are time stamped as they are written
+        diary = Diary(clock=lambda: 123)
+        diary.append(diary_entry({}, None, ActionStatus.FAIL, None))
+        diary.append({"my_goal": {}, "my_plan": None, "action_status": ActionStatus.FAIL})
+        self.assertEqual(123, diary[1]["timestamp"])
+
+    def test_queries_combine_filters(self):
+        self.assertEqual([20, 30, 40], [entry["timestamp"] for entry in
+                                        self.diary.query(action="authorize room temperature change")])
+        self.assertEqual([30, 40], [entry["timestamp"] for entry in
+                                    self.diary.query(goal={"is_room_temperature_change_authorized": True},
+                                                     status="success")])
+        self.assertEqual([20, 30], [entry["timestamp"] for entry in self.diary.query(since=15, until=35)])
+        self.assertEqual([30], [entry["timestamp"] for entry in self.diary.query(status=ActionStatus.SUCCESS,
+                                                                                 since=15, until=35)])
+        self.assertEqual([40], [entry["timestamp"] for entry in self.diary.query(status="success", start=2,
+                                                                                 count=1)])
+        self.assertEqual(0, self.diary.count(action="an action that never ran"))
+
+    def test_aggregates(self):
+        self.assertEqual(2 / 3, self.diary.success_rate(action="authorize room temperature change"))
+        self.assertEqual(None, self.diary.success_rate(since=100))
+        self.assertEqual({"p50": 0.3, "p99": 0.4},
+                         self.diary.seconds_acting(action="authorize room temperature change", percentiles=(50, 99)))
+
+        summary = self.diary.summary_by_action(since=15)
+        self.assertEqual(["authorize room temperature change"], list(summary))
+        self.assertEqual(3, summary["authorize room temperature change"]["count"])
+        self.assertEqual(0.4, summary["authorize room temperature change"]["seconds_acting"]["p99"])
+
+        self.assertEqual(["MonitorBodyTemperature", "authorize room temperature change"], self.diary.actions())
+
+
+class TestDiaryColumns(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), "diary")
+
+    def test_export_and_read_back_a_window(self):
+        diary = Diary()
+        monitor = MonitorBodyTemperature()
+        for timestamp in range(10):
+            diary.append(diary_entry({"is_room_temperature_change_needed": True}, monitor, ActionStatus.SUCCESS,
+                                     timestamp, 0.5, world_before={"is_room_temperature_change_needed": False},
+                                     world_after={"is_room_temperature_change_needed": True}))
+
+        # entries are written in row groups as they fill
+        self.assertEqual(10, export_diary(diary, self.directory, rows_per_group=4))
+        columns = DiaryColumns(self.directory)
+        self.assertEqual(10, columns.number_of_rows())
+        self.assertEqual(3, len(os.listdir(self.directory)) - 1)
+        self.assertIn("world_before.is_room_temperature_change_needed", columns.columns())
+
+        # a window only reads the row groups that overlap it, and only the columns asked for
+        row_groups = list(columns.read(["timestamp", "action"], since=3, until=5))
+        self.assertEqual([{"timestamp": [3], "action": ["MonitorBodyTemperature"]},
+                          {"timestamp": [4, 5], "action": ["MonitorBodyTemperature", "MonitorBodyTemperature"]}],
+                         row_groups)
+        row = next(columns.rows(since=9))
+        self.assertEqual({"timestamp": 9, "goal": '{"is_room_temperature_change_needed": true}',
+                          "action": "MonitorBodyTemperature", "plan_length": 1, "action_status": "success",
+                          "seconds_acting": 0.5, "world_before.is_room_temperature_change_needed": False,
+                          "world_after.is_room_temperature_change_needed": True}, row)
+
+        # a later export adds only the newer entries
+        diary.append(diary_entry({}, None, ActionStatus.FAIL, 10, world_before={"is_room_lit": False}))
+        self.assertEqual(11, export_diary(diary, self.directory, start=10))
+        self.assertEqual(11, DiaryColumns(self.directory).number_of_rows())
+
+    def test_exports_resume_where_the_last_one_stopped(self):
+        # entries that share a time stamp, and an entry written after the clock was set back
+        diary = Diary()
+        for timestamp in [5, 5, 5]:
+            diary.append(diary_entry({}, None, ActionStatus.SUCCESS, timestamp))
+        next_start = export_diary(diary, self.directory)
+        for timestamp in [5, 3, 6]:
+            diary.append(diary_entry({}, None, ActionStatus.FAIL, timestamp))
+        self.assertEqual(6, export_diary(diary, self.directory, start=next_start))
+
+        # every entry is exported exactly once
+        rows = list(DiaryColumns(self.directory).rows(["timestamp", "action_status"]))
+        self.assertEqual([5, 5, 5, 5, 3, 6], [row["timestamp"] for row in rows])
+        self.assertEqual(["success"] * 3 + ["fail"] * 3, [row["action_status"] for row in rows])
+
+        # with nothing new, nothing is added
+        self.assertEqual(6, export_diary(diary, self.directory, start=6))
+        self.assertEqual(6, DiaryColumns(self.directory).number_of_rows())
+
+    def test_columns_that_appear_later_are_empty_in_earlier_row_groups(self):
+        exporter = DiaryExporter(self.directory, rows_per_group=1)
+        exporter.write(diary_entry({}, None, ActionStatus.FAIL, 1))
+        exporter.write(diary_entry({}, None, ActionStatus.FAIL, 2, world_before={"is_room_lit": True}))
+        exporter.close()
+
+        self.assertEqual([None, True], [row["world_before.is_room_lit"] for row in
+                                        DiaryColumns(self.directory).rows(["world_before.is_room_lit"])])
+
+
+if __name__ == '__main__':
+    unittest.main()
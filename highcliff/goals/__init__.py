@@ -0,0 +1,5 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+from highcliff.goals.goals import Goal, GoalScheduler, goals_from_definitions, goals_as_plain_data, InvalidGoal
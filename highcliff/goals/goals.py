@@ -0,0 +1,148 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to measure how long goals have been unmet
+import time
+
+# needed to reload goals while the ai is scheduling them
+import threading
+
+
+class InvalidGoal(ValueError):
+    pass
+
+
+class Goal:
+    """A condition of the world the AI should bring about. Goals with a higher priority are pursued first. Among
+    goals of equal priority, the goal with the earliest deadline, in seconds from when the goal became unmet, comes
+    first. The weight sets how quickly a goal that keeps being passed over becomes starved"""
+    def __init__(self, condition, value=True, priority=0, deadline=None, weight=1.0):
+        if not isinstance(priority, (int, float)) or isinstance(priority, bool):
+            raise InvalidGoal("the priority of " + str(condition) + " must be a number")
+        if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+            raise InvalidGoal("the deadline of " + str(condition) + " must be a positive number of seconds")
+        if not isinstance(weight, (int, float)) or weight <= 0:
+            raise InvalidGoal("the weight of " + str(condition) + " must be a positive number")
+
+        self.condition = condition
+        self.value = value
+        self.priority = priority
+        self.deadline = deadline
+        self.weight = weight
+
+    def as_definition(self):
+        return {"value": self.value, "priority": self.priority, "deadline": self.deadline, "weight": self.weight}
+
+    def __eq__(self, other):
+        return isinstance(other, Goal) and (self.condition, self.as_definition()) == (other.condition,
+                                                                                      other.as_definition())
+
+    def __repr__(self):
+        return "Goal(" + repr(self.condition) + ", " + repr(self.as_definition()) + ")"
+
+
+def goals_from_definitions(goals):
+    """Read goals in any of the forms the AI accepts: a flat dictionary of conditions and values, in which earlier
+    goals come first; a dictionary of conditions and goal definitions with a value, priority, deadline and weight;
+    or a list of goals"""
+    if isinstance(goals, list):
+        return list(goals)
+    if not isinstance(goals, dict):
+        raise InvalidGoal("goals must be a dictionary or a list of goals")
+
+    goal_list = []
+    for condition, definition in goals.items():
+        if isinstance(definition, Goal):
+            goal_list.append(definition)
+        elif isinstance(definition, dict):
+            try:
+                goal_list.append(Goal(condition, **definition))
+            except TypeError as error:
+                raise InvalidGoal("the goal for " + str(condition) + " is not a goal definition: " + str(error))
+        else:
+            goal_list.append(Goal(condition, definition))
+    return goal_list
+
+
+def goals_as_plain_data(goals):
+    """Return the given goals with every Goal replaced by its definition, so they can be copied as json and read
+    back by goals_from_definitions. A list of goals becomes a dictionary of conditions and goal definitions"""
+    if isinstance(goals, list):
+        return {goal.condition: goal.as_definition() for goal in goals}
+    if isinstance(goals, dict):
+        return {condition: definition.as_definition() if isinstance(definition, Goal) else definition
+                for condition, definition in goals.items()}
+    return goals
+
+
+class GoalScheduler:
+    """Orders the unmet goals the AI could pursue in a tick. Higher priorities come first and, within a priority,
+    earlier deadlines. A goal that has been passed over long enough is starved and goes ahead of every other goal
+    once, so every goal is pursued within a bounded number of ticks"""
+    def __init__(self, starvation_threshold=10, clock=time.monotonic):
+        # a goal is starved once the ticks it has waited, times its weight, reach the threshold
+        self.starvation_threshold = starvation_threshold
+        self._clock = clock
+        self._goals = []
+        self._unmet_since = {}
+        self._ticks_waited = {}
+        self._last_scheduled_goals = []
+
+        # goals can be reloaded from another thread, such as a GoalFileWatcher, while the ai schedules them
+        self._lock = threading.Lock()
+
+    def set_goals(self, goals):
+        # goals that carry over keep the time they have already spent waiting. the new goals and their waiting times
+        # are published together
+        goals = list(goals)
+        conditions = {goal.condition for goal in goals}
+        with self._lock:
+            self._goals = goals
+            self._unmet_since = {condition: since for condition, since in self._unmet_since.items()
+                                 if condition in conditions}
+            self._ticks_waited = {condition: ticks for condition, ticks in self._ticks_waited.items()
+                                  if condition in conditions}
+
+    def goals(self):
+        with self._lock:
+            return list(self._goals)
+
+    def schedule(self, world_state):
+        """Return the goals that are not met in the given world, in the order they should be pursued"""
+        with self._lock:
+            return self._schedule(world_state)
+
+    def _schedule(self, world_state):
+        now = self._clock()
+        unmet_goals = []
+        for goal in self._goals:
+            if goal.condition in world_state and world_state[goal.condition] == goal.value:
+                self._unmet_since.pop(goal.condition, None)
+                self._ticks_waited.pop(goal.condition, None)
+                continue
+            self._unmet_since.setdefault(goal.condition, now)
+            self._ticks_waited.setdefault(goal.condition, 0)
+            unmet_goals.append(goal)
+
+        order = {goal.condition: index for index, goal in enumerate(self._goals)}
+
+        def urgency(goal):
+            starved = self._ticks_waited[goal.condition] * goal.weight >= self.starvation_threshold
+            deadline = float("inf") if goal.deadline is None else self._unmet_since[goal.condition] + goal.deadline
+            if starved:
+                # starved goals go first, the longest waiting of them first
+                return 0, -self._ticks_waited[goal.condition], 0, order[goal.condition]
+            return 1, -goal.priority, deadline, order[goal.condition]
+
+        self._last_scheduled_goals = sorted(unmet_goals, key=urgency)
+        return list(self._last_scheduled_goals)
+
+    def pursued(self, goal):
+        """Record the goal pursued this tick. Every other goal that was scheduled waits one more tick"""
+        with self._lock:
+            for scheduled_goal in self._last_scheduled_goals:
+                if scheduled_goal.condition in self._ticks_waited:
+                    self._ticks_waited[scheduled_goal.condition] += 1
+            if goal.condition in self._ticks_waited:
+                self._ticks_waited[goal.condition] = 0
@@ -0,0 +1,111 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import unittest
+
+# needed to reload goals while they are being scheduled
+import sys
+import threading
+from highcliff.goals import Goal, GoalScheduler, goals_from_definitions, goals_as_plain_data, InvalidGoal
+
+
+class TestGoals(unittest.TestCase):
+    def setUp(self):
+        # a clock the test can move forward
+        self.now = 0
+        self.scheduler = GoalScheduler(starvation_threshold=3, clock=lambda: self.now)
+
+    def test_goal_definitions(self):
+        # a flat dictionary of goals keeps working
+        self.assertEqual([Goal("is_room_dark", True), Goal("is_room_quiet", False)],
+                         goals_from_definitions({"is_room_dark": True, "is_room_quiet": False}))
+
+        goals = goals_from_definitions({"is_medication_given": {"value": True, "priority": 10, "deadline": 60}})
+        self.assertEqual(10, goals[0].priority)
+        self.assertEqual(60, goals[0].deadline)
+        self.assertEqual(1.0, goals[0].weight)
+
+        self.assertRaises(InvalidGoal, goals_from_definitions, {"is_room_dark": {"value": True, "urgency": 1}})
+        self.assertRaises(InvalidGoal, goals_from_definitions, {"is_room_dark": {"value": True, "deadline": -1}})
+        self.assertRaises(InvalidGoal, goals_from_definitions, "is_room_dark")
+
+    def test_goals_as_plain_data(self):
+        goals = [Goal("is_medication_given", True, priority=10, deadline=60), Goal("is_room_dark", False)]
+        plain_goals = goals_as_plain_data(goals)
+        self.assertEqual({"value": True, "priority": 10, "deadline": 60, "weight": 1.0},
+                         plain_goals["is_medication_given"])
+        self.assertEqual(goals, goals_from_definitions(plain_goals))
+
+        # goals that are already plain data are left as they are
+        self.assertEqual({"is_room_dark": True}, goals_as_plain_data({"is_room_dark": True}))
+
+    def test_higher_priorities_go_first(self):
+        self.scheduler.set_goals(goals_from_definitions({
+            "is_room_lit": {"value": True, "priority": 1},
+            "is_medication_given": {"value": True, "priority": 10},
+            "is_catheter_emptied": {"value": True, "priority": 10}
+        }))
+
+        scheduled_goals = self.scheduler.schedule({"is_catheter_emptied": True})
+        self.assertEqual(["is_medication_given", "is_room_lit"], [goal.condition for goal in scheduled_goals])
+
+    def test_earlier_deadlines_go_first(self):
+        self.scheduler.set_goals([Goal("is_room_lit", deadline=300), Goal("is_medication_given", deadline=60),
+                                  Goal("is_room_quiet")])
+        self.assertEqual(["is_medication_given", "is_room_lit", "is_room_quiet"],
+                         [goal.condition for goal in self.scheduler.schedule({})])
+
+        # deadlines count from when a goal became unmet
+        self.scheduler.set_goals([Goal("is_room_lit", deadline=300), Goal("is_medication_given", deadline=60)])
+        self.scheduler.schedule({"is_medication_given": True})
+        self.now = 250
+        self.assertEqual(["is_room_lit", "is_medication_given"],
+                         [goal.condition for goal in self.scheduler.schedule({})])
+
+    def test_goals_that_wait_too_long_go_first_once(self):
+        self.scheduler.set_goals([Goal("is_medication_given", priority=10), Goal("is_room_lit", priority=1)])
+
+        # the lighting goal is passed over until it starves
+        for tick in range(3):
+            scheduled_goals = self.scheduler.schedule({})
+            self.assertEqual("is_medication_given", scheduled_goals[0].condition)
+            self.scheduler.pursued(scheduled_goals[0])
+
+        scheduled_goals = self.scheduler.schedule({})
+        self.assertEqual("is_room_lit", scheduled_goals[0].condition)
+        self.scheduler.pursued(scheduled_goals[0])
+
+        # once pursued, it waits its turn again
+        self.assertEqual("is_medication_given", self.scheduler.schedule({})[0].condition)
+
+    def test_goals_can_be_reloaded_while_they_are_scheduled(self):
+        every_goal = [Goal("is_condition_" + str(number), priority=number % 3, deadline=number + 1)
+                      for number in range(50)]
+        reloads_done = threading.Event()
+
+        # switch threads often, so that reloads land in the middle of scheduling
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(0.000001)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        def reload_goals():
+            # goals come and go, as they would when a goal file is edited
+            for reload in range(3000):
+                self.scheduler.set_goals(every_goal[reload % 2::2] if reload % 3 else every_goal)
+            self.scheduler.set_goals(every_goal)
+            reloads_done.set()
+
+        reloader = threading.Thread(target=reload_goals)
+        reloader.start()
+        while not reloads_done.is_set():
+            scheduled_goals = self.scheduler.schedule({})
+            if scheduled_goals:
+                self.scheduler.pursued(scheduled_goals[0])
+        reloader.join()
+
+        self.assertEqual(50, len(self.scheduler.schedule({})))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,4 +2,4 @@ __author__ = "Jerry Overton"
 __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
-from highcliff.logging.logging import log_event_to_the_terminal_window
+from highcliff.logging.logging import log_event_to_the_terminal_window, set_logging_clock, logging_clock
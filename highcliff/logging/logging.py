@@ -2,10 +2,25 @@ __author__ = "Jerry Overton"
 __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
-# needed to log events to the terminal window
-import arrow
+# the clock events are time stamped by. None is the real clock
+_clock = None
+
+
+def set_logging_clock(clock):
+    """Time stamp logged events by the given clock, such as the VirtualClock of a simulation, or None for the real
+    clock"""
+    global _clock
+    _clock = clock
+
+
+def logging_clock():
+    """The clock logged events are time stamped by, or None for the real clock"""
+    return _clock
 
 
 def log_event_to_the_terminal_window(event):
-    time_stamp = arrow.utcnow().format('YYYY-MM-DD HH:mm:ss A')
+    # arrow is slow to import, so it is only loaded when the first event is logged
+    import arrow
+    moment = arrow.utcnow() if _clock is None else arrow.get(_clock.time())
+    time_stamp = moment.format('YYYY-MM-DD HH:mm:ss A')
     print(time_stamp, "|", event)
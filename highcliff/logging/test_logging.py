@@ -3,7 +3,8 @@ __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
 import unittest
-from highcliff.logging import log_event_to_the_terminal_window
+from highcliff.logging import log_event_to_the_terminal_window, set_logging_clock
+from highcliff.clock import VirtualClock
 
 # needed to redirect terminal window output to a variable so that logging output can be tested
 from io import StringIO
@@ -29,6 +30,19 @@ class MyTestCase(unittest.TestCase):
         # restore the terminal output
         sys.stdout = terminal_window
 
+    def test_logging_by_a_virtual_clock(self):
+        text_captured_from_terminal = StringIO()
+        terminal_window = sys.stdout
+        sys.stdout = text_captured_from_terminal
+
+        # events are time stamped by the clock they are logged by
+        set_logging_clock(VirtualClock(start=60))
+        log_event_to_the_terminal_window("test event")
+        set_logging_clock(None)
+
+        self.assertTrue(text_captured_from_terminal.getvalue().startswith("1970-01-01 00:01:00 AM | test event"))
+        sys.stdout = terminal_window
+
 
 if __name__ == '__main__':
     unittest.main()
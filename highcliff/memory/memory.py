@@ -0,0 +1,125 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to measure objects and everything they hold
+import sys
+import types
+from enum import Enum
+from collections import deque
+
+# needed to recognise proxies, whose contents live somewhere else
+import weakref
+
+# needed to find the code that allocated the memory gained between two points in time
+import tracemalloc
+import threading
+
+# used to share one set of snapshots across the process
+from highcliff.singleton import Singleton
+
+# code, and values shared by the whole process, are not part of the size of the objects that refer to them
+_not_measured = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, Enum)
+
+# the allocations of tracemalloc itself are not part of a comparison of snapshots
+_snapshot_filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                     tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+
+
+def _is_proxy(value):
+    # proxies stand in for objects held by another process, or by someone else. reading anything from a remote proxy,
+    # even its class, is a call over the network, so they are recognised by their own type and not measured. rpyc is
+    # slow to import, and there are no remote proxies until something else has imported it
+    proxies = weakref.ProxyTypes
+    netref = sys.modules.get("rpyc.core.netref")
+    if netref is not None:
+        proxies = proxies + (netref.BaseNetref,)
+    return issubclass(type(value), proxies)
+
+
+def deep_size_of(value, seen=None):
+    """The size, in bytes, of a value and of everything it holds. Objects in seen, a dictionary of objects by id, are
+    not counted, and the objects counted are added to it, so a report made of several parts counts shared objects
+    once. Holding on to the objects keeps their ids from being reused while the report is made"""
+    seen = {} if seen is None else seen
+    size = 0
+    values_to_measure = [value]
+    while values_to_measure:
+        value = values_to_measure.pop()
+        if id(value) in seen or _is_proxy(value) or isinstance(value, _not_measured):
+            continue
+        seen[id(value)] = value
+        size += sys.getsizeof(value)
+
+        # containers are copied before they are read, so that they can be measured while other threads change them
+        if isinstance(value, dict):
+            for key, item in list(value.items()):
+                values_to_measure.append(key)
+                values_to_measure.append(item)
+        elif isinstance(value, (list, tuple, set, frozenset, deque)):
+            values_to_measure.extend(list(value))
+        else:
+            if hasattr(value, "__dict__"):
+                values_to_measure.append(vars(value))
+            for slot in getattr(type(value), "__slots__", ()):
+                if hasattr(value, slot):
+                    values_to_measure.append(getattr(value, slot))
+    return size
+
+
+def size_report(values, seen=None):
+    """The number of values in a container, and their size in bytes"""
+    return {"count": len(values), "bytes": deep_size_of(values, seen)}
+
+
+def total_bytes(report):
+    """The sum of the sizes in a memory report, and in the reports it is made of"""
+    total = 0
+    for name, value in report.items():
+        if isinstance(value, dict):
+            total += total_bytes(value)
+        elif name.endswith("bytes"):
+            total += value
+    return total
+
+
+@Singleton
+class MemorySnapshots:
+    """Takes named tracemalloc snapshots and compares them, to find the code that allocated the memory gained between
+    two points in time. Memory allocations are traced from the first snapshot until stop is called. Tracing slows
+    the process down, so it is best switched on only while looking for a leak"""
+    def __init__(self):
+        self._snapshots = {}
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    def take(self, label, number_of_frames=1):
+        """Take a snapshot of the memory allocated so far, under the given label. The first snapshot starts tracing
+        allocations, keeping the given number of frames of the stack that made each one"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(number_of_frames)
+                self._started_tracing = True
+            self._snapshots[label] = tracemalloc.take_snapshot().filter_traces(_snapshot_filters)
+
+    def labels(self):
+        with self._lock:
+            return list(self._snapshots)
+
+    def compare(self, first_label, second_label, key_type="lineno", limit=10):
+        """The places that gained the most memory between two snapshots, most first, as plain data"""
+        with self._lock:
+            first_snapshot, second_snapshot = self._snapshots[first_label], self._snapshots[second_label]
+        differences = second_snapshot.compare_to(first_snapshot, key_type)
+        return [{"location": [f"{frame.filename}:{frame.lineno}" for frame in difference.traceback],
+                 "bytes": difference.size, "bytes_gained": difference.size_diff,
+                 "allocations": difference.count, "allocations_gained": difference.count_diff}
+                for difference in differences[:limit]]
+
+    def stop(self):
+        """Forget every snapshot, and stop tracing allocations if the first snapshot started it"""
+        with self._lock:
+            self._snapshots = {}
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
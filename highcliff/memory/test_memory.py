@@ -0,0 +1,82 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import sys
+import weakref
+import unittest
+
+from highcliff.memory import MemorySnapshots, deep_size_of, total_bytes
+
+# needed to hold a reference to an object served by another connection
+import rpyc
+from rpyc.utils.factory import connect_thread
+
+
+class Reading:
+    def __init__(self, value):
+        self.value = value
+        self.history = [value] * 100
+
+
+def allocate_readings():
+    return [Reading(number) for number in range(5000)]
+
+
+class TestMemory(unittest.TestCase):
+    def test_deep_size_of_counts_everything_held(self):
+        values = list(range(1000))
+        self.assertTrue(deep_size_of({"values": values}) > sys.getsizeof(values) + 1000 * sys.getsizeof(1000))
+
+        # the attributes of an object are part of its size. its class and methods are not
+        self.assertTrue(deep_size_of(Reading(1)) > sys.getsizeof(Reading(1).history))
+
+    def test_shared_objects_are_counted_once(self):
+        shared = list(range(1000))
+        seen = {}
+        first_size = deep_size_of({"first": shared}, seen)
+        second_size = deep_size_of({"second": shared}, seen)
+        self.assertTrue(first_size > deep_size_of(shared) > second_size)
+
+    def test_proxies_are_not_followed(self):
+        class CapabilityService(rpyc.Service):
+            def exposed_get_capability(self):
+                return Reading(1)
+
+        # a capability registered by a remote client is a reference to an object on the client
+        connection = connect_thread(remote_service=CapabilityService, remote_config={"allow_all_attrs": True})
+        capabilities = [connection.root.get_capability()]
+        self.assertEqual(sys.getsizeof(capabilities), deep_size_of(capabilities))
+
+        # measuring the reference makes no calls over the network, so it works once the client has gone
+        connection.close()
+        self.assertEqual(sys.getsizeof(capabilities), deep_size_of(capabilities))
+
+        # nor is the object behind a weak proxy, which belongs to whoever holds it
+        reading = Reading(1)
+        proxies = [weakref.proxy(reading)]
+        self.assertEqual(sys.getsizeof(proxies), deep_size_of(proxies))
+
+    def test_total_bytes(self):
+        self.assertEqual(60, total_bytes({"diary": {"entries": 3, "bytes": 10, "index_bytes": 20},
+                                          "network": {"world": {"bytes": 30}}}))
+
+    def test_snapshots_find_the_code_that_allocated_memory(self):
+        snapshots = MemorySnapshots.new_instance()
+        try:
+            snapshots.take("before")
+            readings = allocate_readings()
+            snapshots.take("after")
+
+            differences = snapshots.compare("before", "after", limit=3)
+            self.assertEqual(["before", "after"], snapshots.labels())
+            self.assertTrue(any("test_memory.py" in difference["location"][0] and difference["bytes_gained"] > 0
+                                for difference in differences))
+        finally:
+            snapshots.stop()
+        self.assertEqual([], snapshots.labels())
+        del readings
+
+
+if __name__ == '__main__':
+    unittest.main()
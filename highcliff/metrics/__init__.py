@@ -0,0 +1,6 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+from highcliff.metrics.metrics import Metrics, Counter, Gauge, Histogram, render_prometheus_text, \
+    render_metrics_json, serve_metrics
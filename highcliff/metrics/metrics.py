@@ -0,0 +1,205 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to update metrics from several threads
+import threading
+
+# needed to find the bucket an observation falls in
+from bisect import bisect_left
+
+# needed to serve metrics to scrapers over http
+import json
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# the default upper bounds, in seconds, of the buckets of latency histograms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(text, quoted=True):
+    # the prometheus text format escapes backslashes, then line feeds and, in label values, double quotes
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quoted else text
+
+
+def _format_labels(label_key):
+    if not label_key:
+        return ""
+    return "{" + ",".join(name + '="' + _escape(value) + '"' for name, value in label_key) + "}"
+
+
+class Counter:
+    """A count that only goes up, kept separately for each combination of labels"""
+    metric_type = "counter"
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def increment(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def as_plain_data(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """A value that can go up and down"""
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """Counts observations in buckets by their size, along with their number and sum"""
+    metric_type = "histogram"
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._bucket_counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._bucket_counts[bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+
+    def count(self):
+        return self._count
+
+    def sum(self):
+        return self._sum
+
+    def as_plain_data(self):
+        with self._lock:
+            return {"buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"],
+                                        self._cumulative_counts())),
+                    "count": self._count, "sum": self._sum}
+
+    def samples(self):
+        with self._lock:
+            samples = [(self.name + "_bucket", (("le", str(bound)),), count)
+                       for bound, count in zip(list(self.buckets) + ["+Inf"], self._cumulative_counts())]
+            samples.append((self.name + "_count", (), self._count))
+            samples.append((self.name + "_sum", (), self._sum))
+            return samples
+
+    def _cumulative_counts(self):
+        cumulative_counts = []
+        running_count = 0
+        for bucket_count in self._bucket_counts:
+            running_count += bucket_count
+            cumulative_counts.append(running_count)
+        return cumulative_counts
+
+
+class Metrics:
+    """The counters, gauges and histograms of one component, by name"""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, description):
+        return self._add(Counter(name, description))
+
+    def gauge(self, name, description):
+        return self._add(Gauge(name, description))
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, description, buckets))
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics[name]
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def as_plain_data(self):
+        return {metric.name: {"type": metric.metric_type, "description": metric.description,
+                              "values": metric.as_plain_data()} for metric in self.metrics()}
+
+    def as_prometheus_text(self, **labels):
+        return render_prometheus_text([(labels, self)])
+
+
+def render_prometheus_text(labelled_metrics):
+    """Render metrics in the prometheus text exposition format. Takes a list of (labels, metrics) pairs, so that the
+    metrics of several components, told apart by their labels, are exposed together"""
+    lines = []
+    families = {}
+    for labels, metrics in labelled_metrics:
+        for metric in metrics.metrics():
+            families.setdefault(metric.name, []).append((labels, metric))
+
+    for name, labelled_family in families.items():
+        lines.append("# HELP " + name + " " + _escape(labelled_family[0][1].description, quoted=False))
+        lines.append("# TYPE " + name + " " + labelled_family[0][1].metric_type)
+        for labels, metric in labelled_family:
+            for sample_name, sample_labels, value in metric.samples():
+                lines.append(sample_name + _format_labels(_label_key(labels) + sample_labels) + " " + repr(float(value)))
+    return "\n".join(lines) + "\n"
+
+
+def render_metrics_json(labelled_metrics):
+    """Render metrics as a json list of their labels and plain data. Takes a list of (labels, metrics) pairs"""
+    return json.dumps([{"labels": labels, "metrics": metrics.as_plain_data()} for labels, metrics in labelled_metrics])
+
+
+def serve_metrics(port, labelled_metrics, host="0.0.0.0"):
+    """Serve metrics over http in a background thread: prometheus text at /metrics and json at /metrics.json. Takes
+    a function that returns the (labels, metrics) pairs to serve, so that metrics added later are served too. Returns
+    the http server, which is stopped with shutdown"""
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = render_prometheus_text(labelled_metrics()).encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body = render_metrics_json(labelled_metrics()).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # scrapes are frequent. leave the terminal to the ai's own log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,73 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import json
+import unittest
+from urllib.request import urlopen
+
+from highcliff.metrics import Metrics, render_prometheus_text, serve_metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counters_are_kept_by_label(self):
+        metrics = Metrics()
+        outcomes = metrics.counter("outcomes_total", "Outcomes")
+        outcomes.increment(status="success")
+        outcomes.increment(2, status="fail")
+        outcomes.increment(status="success")
+        self.assertEqual(2, outcomes.value(status="success"))
+        self.assertEqual(2, outcomes.value(status="fail"))
+        self.assertEqual(0, outcomes.value(status="unknown"))
+
+        # asking for a metric that exists returns the one already there
+        self.assertTrue(outcomes is metrics.counter("outcomes_total", "Outcomes"))
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = Metrics()
+        latency = metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for seconds in [0.05, 0.5, 0.5, 5.0]:
+            latency.observe(seconds)
+
+        self.assertEqual({"buckets": {"0.1": 1, "1.0": 3, "+Inf": 4}, "count": 4, "sum": 6.05},
+                         latency.as_plain_data())
+
+    def test_prometheus_text(self):
+        first_metrics, second_metrics = Metrics(), Metrics()
+        first_metrics.counter("runs_total", "Runs").increment()
+        second_metrics.counter("runs_total", "Runs").increment(3)
+        second_metrics.histogram("plan_length", "Plan length", buckets=(1,)).observe(1)
+
+        text = render_prometheus_text([({"tenant": "a"}, first_metrics), ({"tenant": "b"}, second_metrics)])
+
+        # each metric is described once, however many labelled sets of metrics it appears in
+        self.assertEqual(1, text.count("# TYPE runs_total counter"))
+        self.assertIn('runs_total{tenant="a"} 1.0', text)
+        self.assertIn('runs_total{tenant="b"} 3.0', text)
+        self.assertIn('plan_length_bucket{tenant="b",le="1"} 1.0', text)
+        self.assertIn('plan_length_bucket{tenant="b",le="+Inf"} 1.0', text)
+        self.assertIn('plan_length_count{tenant="b"} 1.0', text)
+
+    def test_prometheus_text_escapes_label_values(self):
+        metrics = Metrics()
+        metrics.counter("runs_total", "Runs\nof the ai").increment(home='C:\\homes\\"first"\nfloor')
+        text = render_prometheus_text([({}, metrics)])
+
+        self.assertIn('runs_total{home="C:\\\\homes\\\\\\"first\\"\\nfloor"} 1.0', text)
+        self.assertIn("# HELP runs_total Runs\\nof the ai\n", text)
+
+    def test_serve_metrics(self):
+        metrics = Metrics()
+        metrics.gauge("world_state_size", "World size").set(7)
+        server = serve_metrics(0, lambda: [({}, metrics)], host="localhost")
+        try:
+            address = "http://localhost:" + str(server.server_address[1])
+            self.assertIn("world_state_size 7.0", urlopen(address + "/metrics").read().decode("utf-8"))
+            served_json = json.loads(urlopen(address + "/metrics.json").read().decode("utf-8"))
+            self.assertEqual([{"labels": {}, "value": 7}], served_json[0]["metrics"]["world_state_size"]["values"])
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,5 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+from highcliff.planning.planning import LocalPlanner, ProcessPoolPlanner, CostEstimator
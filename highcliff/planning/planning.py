@@ -0,0 +1,135 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# AI, GOAP
+from goap.planner import RegressivePlanner, PlanStep
+from goap.action import Action
+
+# needed to keep a bounded number of action tables in each worker
+from collections import OrderedDict
+
+
+class LocalPlanner:
+    """Plans on the calling thread. This is the AI's default planner"""
+    @staticmethod
+    def find_plan(world_state, capabilities, goal):
+        return RegressivePlanner(world_state, capabilities).find_plan(goal)
+
+    def shutdown(self):
+        pass
+
+
+class _TableAction(Action):
+    # a stand-in, inside a planning worker, for one row of an action table
+    def __init__(self, index, effects, preconditions, cost, precedence):
+        self.index = index
+        self.effects = effects
+        self.preconditions = preconditions
+        self.service_names = [key for key, value in effects.items() if value is Ellipsis]
+        self.cost = cost
+        self.precedence = precedence
+
+
+class _ActionTableMissing(Exception):
+    pass
+
+
+# the action tables a planning worker has already been sent, by table key, most recently used last
+_action_tables = OrderedDict()
+_maximum_number_of_cached_action_tables = 32
+
+
+def _find_plan_in_worker(table_key, action_table, costs, world_state, goal):
+    # the action table is only sent when the worker does not already have it
+    if action_table is not None:
+        _action_tables[table_key] = [_TableAction(index, effects, preconditions, None, precedence)
+                                     for index, (effects, preconditions, precedence) in enumerate(action_table)]
+        if len(_action_tables) > _maximum_number_of_cached_action_tables:
+            _action_tables.popitem(last=False)
+    elif table_key not in _action_tables:
+        raise _ActionTableMissing(table_key)
+
+    _action_tables.move_to_end(table_key)
+
+    # costs change as the ai learns, so they are sent with every request rather than kept in the table
+    for action, cost in zip(_action_tables[table_key], costs):
+        action.cost = cost
+
+    plan = RegressivePlanner(world_state, _action_tables[table_key]).find_plan(goal)
+
+    # only the position of each action in the table travels back
+    return [(step.action.index, step.services) for step in plan]
+
+
+class ProcessPoolPlanner:
+    """Plans in a pool of worker processes, so a large search uses other cores and never holds the GIL of the
+    process that runs the ai. Workers receive the world state and a compact table of each action's effects,
+    preconditions and precedence, and keep the table between calls. The current cost of each action is sent with every
+    call, so learning a cost does not resend the table. Plans come back as positions in the table and are mapped back
+    to the ai's own capabilities"""
+    def __init__(self, number_of_workers=None):
+        # multiprocessing is slow to import, so it is only loaded when a process pool planner is created
+        from concurrent.futures import ProcessPoolExecutor
+        self._workers = ProcessPoolExecutor(max_workers=number_of_workers)
+
+    @staticmethod
+    def action_table(capabilities):
+        return tuple((dict(action.effects), dict(action.preconditions), action.precedence) for action in capabilities)
+
+    @staticmethod
+    def table_key(action_table):
+        return hash(repr(action_table))
+
+    def find_plan(self, world_state, capabilities, goal):
+        action_table = self.action_table(capabilities)
+        table_key = self.table_key(action_table)
+        costs = tuple(action.get_cost({}) for action in capabilities)
+
+        try:
+            plan = self._workers.submit(_find_plan_in_worker, table_key, None, costs, dict(world_state),
+                                        goal).result()
+        except _ActionTableMissing:
+            # the worker has not seen this table yet. send it along with the request
+            plan = self._workers.submit(_find_plan_in_worker, table_key, action_table, costs, dict(world_state),
+                                        goal).result()
+
+        return [PlanStep(capabilities[index], services) for index, services in plan]
+
+    def shutdown(self):
+        self._workers.shutdown(wait=True)
+
+
+class CostEstimator:
+    """Learns what each action costs from the outcomes of running it. An action's estimated cost is its own cost plus
+    the time it takes to run, divided by the rate at which it succeeds, which is the expected cost of running it
+    until it succeeds. Recent outcomes count most, so estimates follow actions whose behavior changes"""
+    def __init__(self, learning_rate=0.2, cost_per_second=1.0, minimum_success_rate=0.05):
+        self.learning_rate = learning_rate
+        self.cost_per_second = cost_per_second
+        self.minimum_success_rate = minimum_success_rate
+
+        # outcomes are kept by the identity of their action, with the action, so that learning about an action never
+        # calls its __hash__ or __eq__. those of an action registered by a remote client are calls over the network
+        self._outcomes = {}
+
+    def record(self, action, succeeded, seconds):
+        """Learn from one run of an action. Returns the action's new estimated cost"""
+        _, outcomes = self._outcomes.setdefault(id(action), (action, {"success_rate": 1.0, "seconds": seconds}))
+        outcomes["success_rate"] += self.learning_rate * ((1.0 if succeeded else 0.0) - outcomes["success_rate"])
+        outcomes["seconds"] += self.learning_rate * (seconds - outcomes["seconds"])
+        return self.estimate(action)
+
+    def estimate(self, action):
+        outcomes = self.outcomes(action)
+        if not outcomes:
+            return action.cost
+        success_rate = max(outcomes["success_rate"], self.minimum_success_rate)
+        return (action.cost + self.cost_per_second * outcomes["seconds"]) / success_rate
+
+    def outcomes(self, action):
+        _, outcomes = self._outcomes.get(id(action), (None, {}))
+        return dict(outcomes)
+
+    def forget(self, action):
+        self._outcomes.pop(id(action), None)
@@ -0,0 +1,118 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import unittest
+from highcliff.planning import LocalPlanner, ProcessPoolPlanner, CostEstimator
+from highcliff.exampleactions import MonitorBodyTemperature, AuthorizeRoomTemperatureChange, ChangeRoomTemperature
+from ai import AI
+from infrastructure import LocalNetwork
+
+# needed to check what happens when no plan can be found
+from goap.algo.astar import PathNotFoundException
+
+
+class TestPlanners(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.process_pool_planner = ProcessPoolPlanner(number_of_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.process_pool_planner.shutdown()
+
+    def setUp(self):
+        self.ai = AI.new_instance()
+        MonitorBodyTemperature(self.ai)
+        AuthorizeRoomTemperatureChange(self.ai)
+        ChangeRoomTemperature(self.ai)
+        self.world_state = {"is_room_temperature_change_needed": False,
+                            "is_room_temperature_change_authorized": False,
+                            "is_room_temperature_comfortable": False}
+
+    def test_the_process_pool_plans_like_the_local_planner(self):
+        goal = {"is_room_temperature_comfortable": True}
+        local_plan = LocalPlanner().find_plan(self.world_state, self.ai.capabilities(), goal)
+
+        # planning twice uses the action table the workers already have
+        for attempt in range(2):
+            process_pool_plan = self.process_pool_planner.find_plan(self.world_state, self.ai.capabilities(), goal)
+            self.assertEqual(3, len(process_pool_plan))
+            self.assertEqual(local_plan, process_pool_plan)
+
+        # the plan is made of the ai's own capabilities
+        self.assertTrue(process_pool_plan[0].action is self.ai.capabilities()[0])
+
+    def test_costs_are_sent_without_resending_the_action_table(self):
+        table = self.process_pool_planner.action_table(self.ai.capabilities())
+        self.ai.capabilities()[0].estimated_cost = 5.0
+        self.assertEqual(self.process_pool_planner.table_key(table),
+                         self.process_pool_planner.table_key(self.process_pool_planner.action_table(
+                             self.ai.capabilities())))
+
+        # the workers plan with the current costs: a cheaper duplicate of the expensive action is preferred
+        cheaper_monitor = MonitorBodyTemperature(self.ai)
+        goal = {"is_room_temperature_change_needed": True}
+        for attempt in range(2):
+            plan = self.process_pool_planner.find_plan(self.world_state, self.ai.capabilities(), goal)
+            self.assertTrue(plan[0].action is cheaper_monitor)
+
+        # making the duplicate the expensive one changes the plan, although the table is the same
+        self.ai.capabilities()[0].estimated_cost = None
+        cheaper_monitor.estimated_cost = 5.0
+        plan = self.process_pool_planner.find_plan(self.world_state, self.ai.capabilities(), goal)
+        self.assertTrue(plan[0].action is self.ai.capabilities()[0])
+
+    def test_planning_failures_are_reported_as_they_are_locally(self):
+        self.assertRaises(KeyError, self.process_pool_planner.find_plan, self.world_state, self.ai.capabilities(),
+                          {"is_room_humidity_comfortable": True})
+
+        # no capability makes the room uncomfortable
+        self.world_state["is_room_temperature_comfortable"] = True
+        self.assertRaises(PathNotFoundException, self.process_pool_planner.find_plan, self.world_state,
+                          self.ai.capabilities(), {"is_room_temperature_comfortable": False})
+
+    def test_an_ai_can_plan_in_worker_processes(self):
+        class TestAction(MonitorBodyTemperature):
+            def behavior(self):
+                pass
+
+        ai = AI.new_instance()
+        ai.set_network(LocalNetwork.new_instance())
+        ai.set_planner(self.process_pool_planner)
+        TestAction(ai)
+        ai.set_goals({"is_room_temperature_change_needed": True})
+        ai.run(life_span_in_iterations=1)
+
+        self.assertEqual(1, len(ai.diary()[0]["my_plan"]))
+        self.assertEqual({"is_room_temperature_change_needed": True}, ai.network().the_world())
+
+
+class TestCostEstimator(unittest.TestCase):
+    def setUp(self):
+        class TestAction:
+            cost = 2.0
+
+        self.action = TestAction()
+        self.estimator = CostEstimator(learning_rate=0.5, cost_per_second=1.0)
+
+    def test_actions_that_have_not_run_cost_what_they_declare(self):
+        self.assertEqual(2.0, self.estimator.estimate(self.action))
+
+    def test_slow_actions_cost_more(self):
+        self.assertEqual(3.0, self.estimator.record(self.action, True, 1.0))
+        self.assertEqual(4.0, self.estimator.record(self.action, True, 3.0))
+
+    def test_unreliable_actions_cost_more(self):
+        self.assertEqual(4.0, self.estimator.record(self.action, False, 0.0))
+        self.assertEqual(8.0, self.estimator.record(self.action, False, 0.0))
+
+        # the estimate recovers as the action starts succeeding again
+        self.assertAlmostEqual(2 / 0.625, self.estimator.record(self.action, True, 0.0))
+
+        self.estimator.forget(self.action)
+        self.assertEqual(2.0, self.estimator.estimate(self.action))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,6 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+from highcliff.profiling.profiling import SamplingProfiler, ProfilerAlreadyRunning, MAXIMUM_PROFILING_SECONDS, \
+    collapse_stack, render_collapsed_stacks
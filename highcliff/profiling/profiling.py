@@ -0,0 +1,104 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to sample the stacks of every thread from a thread of its own
+import sys
+import threading
+
+# needed to pace sampling and to bound the profiling window
+import time
+
+# needed to name the frames of a stack
+import os
+
+# needed to count the samples of each stack
+from collections import Counter
+
+# a window is never longer than this, so a profiler that is never stopped does not sample forever
+MAXIMUM_PROFILING_SECONDS = 600
+
+
+class ProfilerAlreadyRunning(Exception):
+    pass
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    # collapsed stacks separate frames with semicolons
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse_stack(thread_name, frame):
+    """The stack of a thread, from its outermost frame to the given one, as a line of a collapsed stack file"""
+    frame_names = []
+    while frame is not None:
+        frame_names.append(_frame_name(frame))
+        frame = frame.f_back
+    frame_names.append(thread_name.replace(";", ":").replace(" ", "_"))
+    return ";".join(reversed(frame_names))
+
+
+def render_collapsed_stacks(stack_counts):
+    """Render the number of samples of each stack in the collapsed format read by flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stack_counts.items()))
+
+
+class SamplingProfiler:
+    """Samples the stack of every thread in the process, from a thread of its own, for a bounded window. Nothing is
+    sampled, and no thread runs, while the profiler is off. When a window ends, by stopping it or by running out of
+    time, the samples are kept as collapsed stacks and, if an output path was given, written to it"""
+    def __init__(self, seconds_between_samples=0.01):
+        self._seconds_between_samples = seconds_between_samples
+        self._lock = threading.Lock()
+        self._sampling_thread = None
+        self._stop_sampling = None
+        self._last_profile = None
+
+    def start(self, seconds=30, output_path=None):
+        """Sample for the given number of seconds, at most MAXIMUM_PROFILING_SECONDS"""
+        with self._lock:
+            if self.is_running():
+                raise ProfilerAlreadyRunning("The profiler is already sampling")
+
+            self._stop_sampling = threading.Event()
+            self._sampling_thread = threading.Thread(
+                target=self._sample, args=(min(seconds, MAXIMUM_PROFILING_SECONDS), output_path,
+                                           self._stop_sampling),
+                name="sampling-profiler", daemon=True)
+            self._sampling_thread.start()
+
+    def stop(self):
+        """End the window early. Returns the collapsed stacks of the last window, or None if there has not been one"""
+        with self._lock:
+            sampling_thread = self._sampling_thread
+            if sampling_thread is not None:
+                self._stop_sampling.set()
+        if sampling_thread is not None:
+            sampling_thread.join()
+        return self.last_profile()
+
+    def is_running(self):
+        return self._sampling_thread is not None and self._sampling_thread.is_alive()
+
+    def last_profile(self):
+        """The collapsed stacks of the last window to end"""
+        return self._last_profile
+
+    def _sample(self, seconds, output_path, stop_sampling):
+        stack_counts = Counter()
+        sampling_thread_id = threading.get_ident()
+        window_ends = time.monotonic() + seconds
+
+        while not stop_sampling.is_set() and time.monotonic() < window_ends:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                # the profiler's own stack is not part of the profile
+                if thread_id != sampling_thread_id:
+                    stack_counts[collapse_stack(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+            stop_sampling.wait(self._seconds_between_samples)
+
+        self._last_profile = render_collapsed_stacks(stack_counts)
+        if output_path is not None:
+            with open(output_path, "w") as output_file:
+                output_file.write(self._last_profile)
@@ -0,0 +1,65 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import os
+import time
+import tempfile
+import threading
+import unittest
+
+from highcliff.profiling import SamplingProfiler, ProfilerAlreadyRunning
+
+
+def keep_busy(seconds):
+    busy_until = time.monotonic() + seconds
+    while time.monotonic() < busy_until:
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_collapsed_stacks_of_a_busy_thread(self):
+        profiler = SamplingProfiler(seconds_between_samples=0.001)
+        busy_thread = threading.Thread(target=keep_busy, args=(0.5,), name="busy worker")
+        busy_thread.start()
+
+        profiler.start(seconds=10)
+        time.sleep(0.2)
+        collapsed_stacks = profiler.stop()
+        busy_thread.join()
+
+        busy_stacks = [line for line in collapsed_stacks.splitlines() if line.startswith("busy_worker;")]
+        self.assertTrue(busy_stacks)
+        stack, count = busy_stacks[0].rsplit(" ", 1)
+        self.assertIn("keep_busy (test_profiling.py:", stack)
+        self.assertTrue(int(count) > 0)
+
+        # the profiler does not profile itself
+        self.assertNotIn("sampling-profiler", collapsed_stacks)
+
+    def test_windows_are_bounded(self):
+        output_path = os.path.join(tempfile.mkdtemp(), "profile.collapsed")
+        profiler = SamplingProfiler()
+        profiler.start(seconds=0.1, output_path=output_path)
+        self.assertTrue(profiler.is_running())
+        with self.assertRaises(ProfilerAlreadyRunning):
+            profiler.start()
+
+        time.sleep(0.5)
+        self.assertFalse(profiler.is_running())
+        with open(output_path) as output_file:
+            self.assertEqual(profiler.last_profile(), output_file.read())
+
+    def test_nothing_runs_while_the_profiler_is_off(self):
+        threads_before = threading.active_count()
+        profiler = SamplingProfiler()
+        self.assertEqual(threads_before, threading.active_count())
+        self.assertIsNone(profiler.stop())
+
+        profiler.start()
+        profiler.stop()
+        self.assertEqual(threads_before, threading.active_count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,6 +30,15 @@ class Singleton:
             self._instance = self._decorated()
             return self._instance
 
+    def new_instance(self):
+        """
+        Returns a new instance of the decorated class, independent of the
+        singleton instance. Use this where several isolated instances are
+        needed side by side, such as one per tenant on a shared server.
+
+        """
+        return self._decorated()
+
     def __call__(self):
         raise TypeError('Singletons must be accessed through `instance()`.')
 
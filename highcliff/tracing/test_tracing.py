@@ -0,0 +1,67 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+import json
+import os
+import tempfile
+import unittest
+
+from highcliff.tracing import Tracer, MemorySink, JsonLinesSink, current_trace_id
+
+
+class TestTracing(unittest.TestCase):
+    def test_tracing_is_off_without_a_sink(self):
+        tracer = Tracer.new_instance()
+        self.assertFalse(tracer.enabled())
+        self.assertEqual(None, tracer.record("plan", "trace", 0, 1))
+        with tracer.span("plan", "trace"):
+            self.assertEqual(None, current_trace_id())
+
+    def test_spans_do_their_work_on_behalf_of_their_trace(self):
+        sink = MemorySink()
+        tracer = Tracer.new_instance()
+        tracer.set_sink(sink)
+
+        with tracer.span("receive message", "trace", topic="temperature") as attributes:
+            self.assertEqual("trace", current_trace_id())
+
+            # spans inside a span belong to the same trace
+            with tracer.span("world update"):
+                pass
+            attributes["effects"] = 1
+        self.assertEqual(None, current_trace_id())
+
+        self.assertEqual(["world update", "receive message"], [span.name for span in sink.spans])
+        self.assertEqual(["trace", "trace"], [span.trace_id for span in sink.spans])
+        self.assertEqual("temperature", sink.spans[1].attributes["topic"])
+        self.assertEqual(1, sink.spans[1].attributes["effects"])
+
+    def test_spans_measure_the_time_since_their_trace_started(self):
+        sink = MemorySink()
+        tracer = Tracer.new_instance()
+        tracer.set_sink(sink)
+
+        tracer.record("receive message", "trace", 100.0, 0.5)
+        tracer.record("act", "trace", 102.0, 1.0)
+        self.assertEqual([0.5, 3.0], [span.attributes["seconds_since_trace_started"] for span in sink.spans])
+
+    def test_json_lines_sink(self):
+        path = os.path.join(tempfile.mkdtemp(), "spans.jsonl")
+        sink = JsonLinesSink(path)
+        tracer = Tracer.new_instance()
+        tracer.set_sink(sink)
+
+        first_span_id = tracer.record("ai run", "trace", 0, 1, goal={"is_room_lit": True})
+        tracer.record("plan", "trace", 0, 0.5, first_span_id)
+        sink.close()
+
+        with open(path) as spans_file:
+            spans = [json.loads(line) for line in spans_file]
+        self.assertEqual(["ai run", "plan"], [span["name"] for span in spans])
+        self.assertEqual({"is_room_lit": True}, spans[0]["attributes"]["goal"])
+        self.assertEqual(first_span_id, spans[1]["parent_span_id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to identify traces and spans
+from uuid import uuid4
+
+# needed to time spans
+import time
+
+# needed to follow the current trace through the calls made on its behalf, on any thread
+import contextvars
+from contextlib import contextmanager
+
+# needed to export spans from several threads
+import json
+import threading
+
+# needed to remember when a bounded number of recent traces started
+from collections import OrderedDict
+
+# used to share one tracer across the process
+from highcliff.singleton import Singleton
+
+# the trace that the work under way belongs to, if any
+_current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+
+
+def current_trace_id():
+    """The id of the trace the calling code is working on behalf of, or None"""
+    return _current_trace_id.get()
+
+
+class Span:
+    """A named, timed piece of work on behalf of a trace. A trace starts when a message arrives and follows it through
+    the world update, goal selection, planning and action it leads to"""
+    def __init__(self, name, trace_id, span_id, parent_span_id, start, seconds, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_span_id = parent_span_id
+        self.start = start
+        self.seconds = seconds
+        self.attributes = attributes
+
+    def as_plain_data(self):
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_span_id": self.parent_span_id, "start": self.start, "seconds": self.seconds,
+                "attributes": self.attributes}
+
+
+class MemorySink:
+    """Keeps exported spans in a list"""
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class JsonLinesSink:
+    """Appends each exported span to a file as a line of json"""
+    def __init__(self, path):
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.as_plain_data(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+@Singleton
+class Tracer:
+    """Records spans and exports them to a sink. Any object with an export(span) method can be a sink. Without a sink,
+    tracing is off and costs next to nothing"""
+    def __init__(self):
+        self._sink = None
+        self._trace_starts = OrderedDict()
+        self._maximum_number_of_trace_starts = 10000
+        self._lock = threading.Lock()
+
+    def set_sink(self, sink):
+        self._sink = sink
+
+    def enabled(self):
+        return self._sink is not None
+
+    @staticmethod
+    def new_id():
+        return uuid4().hex
+
+    def record(self, name, trace_id, start, seconds, parent_span_id=None, **attributes):
+        """Export a span for work that has already been timed. Returns the id of the span. Each span says how long
+        after the start of its trace it ended, which for an action is the time it took to react to a message"""
+        if self._sink is None:
+            return None
+
+        with self._lock:
+            trace_start = self._trace_starts.setdefault(trace_id, start)
+            self._trace_starts.move_to_end(trace_id)
+            if len(self._trace_starts) > self._maximum_number_of_trace_starts:
+                self._trace_starts.popitem(last=False)
+        attributes["seconds_since_trace_started"] = start + seconds - trace_start
+
+        span = Span(name, trace_id, self.new_id(), parent_span_id, start, seconds, attributes)
+        self._sink.export(span)
+        return span.span_id
+
+    @contextmanager
+    def span(self, name, trace_id=None, parent_span_id=None, **attributes):
+        """Time the work done in the with block as a span of the given trace, or of the current trace. The work is
+        done on behalf of the trace, so the messages it publishes carry the trace on"""
+        trace_id = trace_id or current_trace_id()
+        if self._sink is None or trace_id is None:
+            yield attributes
+            return
+
+        token = _current_trace_id.set(trace_id)
+        start = time.time()
+        try:
+            yield attributes
+        finally:
+            _current_trace_id.reset(token)
+            self.record(name, trace_id, start, time.time() - start, parent_span_id, **attributes)
+
+    @contextmanager
+    def working_on(self, trace_id):
+        """Do the work in the with block on behalf of the given trace, without timing it"""
+        token = _current_trace_id.set(trace_id)
+        try:
+            yield
+        finally:
+            _current_trace_id.reset(token)
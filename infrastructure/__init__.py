@@ -3,3 +3,8 @@ __copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
 __version__ = "0.0.1"
 
 from infrastructure.network import Network, LocalNetwork, MqttNetwork, AiMqttNetwork, InvalidTopic, InvalidMessageFormat
+from infrastructure.broker import LocalBroker, LocalMqttConnection, topic_matches
+from infrastructure.encoding import JSON_WIRE_FORMAT, COMPACT_WIRE_FORMAT, encode_message, decode_message
+from infrastructure.rules import TopicRule, TopicRules, InvalidTopicRule
+from infrastructure.recording import RecordedMessage, TopicRecorder, read_temperature_csv, read_topic_dump, \
+    write_topic_dump
@@ -0,0 +1,277 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to deliver messages from several publishing threads
+import threading
+
+# needed to simulate network latency
+import time
+
+# needed to hand back the same futures returned by awscrt mqtt connections
+from concurrent.futures import Future
+
+# needed to number the packets sent through the broker
+from itertools import count
+
+# quality of service levels understood by the broker. these match the values of awscrt.mqtt.QoS
+AT_MOST_ONCE = 0
+AT_LEAST_ONCE = 1
+
+# connection return code reported to resumed connections. this matches awscrt.mqtt.ConnectReturnCode.ACCEPTED
+ACCEPTED = 0
+
+
+class ClientNotConnected(Exception):
+    pass
+
+
+def topic_matches(topic_filter, topic):
+    """Check whether a topic name matches an mqtt topic filter that may contain + and # wildcards"""
+    # topics reserved by the broker (starting with $) are never matched by a leading wildcard
+    if topic.startswith('$') and topic_filter[:1] in ('+', '#'):
+        return False
+
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for index, filter_level in enumerate(filter_levels):
+        # a multi-level wildcard matches the parent level and everything below it
+        if filter_level == '#':
+            return True
+        if index >= len(topic_levels):
+            return False
+        if filter_level != '+' and filter_level != topic_levels[index]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+class LocalBroker:
+    """An in-process stand-in for an mqtt broker, such as AWS IoT core. It supports QoS 0 and 1,
+    + and # wildcards, retained messages and persistent sessions. Latency and disconnects can be
+    injected to see how the networks that use it behave under less than perfect conditions"""
+    def __init__(self, latency=0.0):
+        # the number of seconds each delivery takes to reach a subscriber
+        self.latency = latency
+
+        self.__lock = threading.RLock()
+        self.__connections = {}
+        self.__sessions = {}
+        self.__retained = {}
+        self.__packet_ids = count(1)
+        self.__statistics = {"published": 0, "delivered": 0, "queued": 0, "dropped": 0}
+
+    def create_connection(self, client_id, on_connection_interrupted=None, on_connection_resumed=None,
+                          clean_session=True):
+        """Create a connection that behaves like an awscrt.mqtt.Connection"""
+        return LocalMqttConnection(self, client_id, on_connection_interrupted, on_connection_resumed,
+                                   clean_session)
+
+    def statistics(self):
+        """Return counts of messages published, delivered, queued for offline clients and dropped"""
+        with self.__lock:
+            return dict(self.__statistics)
+
+    def retained(self, topic):
+        """Return the payload retained for the given topic, if any"""
+        with self.__lock:
+            return self.__retained.get(topic)
+
+    def disconnect_client(self, client_id, error="connection interrupted by the local broker"):
+        """Simulate the loss of a client's connection. The client is notified the way awscrt notifies it"""
+        connection = self.__connections[client_id]
+        connection._interrupt()
+        if connection.on_connection_interrupted is not None:
+            connection.on_connection_interrupted(connection=connection, error=error)
+
+    def resume_client(self, client_id):
+        """Simulate a client re-establishing its lost connection"""
+        connection = self.__connections[client_id]
+        session_present = self._attach(connection)
+        if connection.on_connection_resumed is not None:
+            connection.on_connection_resumed(connection=connection, return_code=ACCEPTED,
+                                             session_present=session_present)
+        connection._resume()
+
+    def _next_packet_id(self):
+        with self.__lock:
+            return next(self.__packet_ids)
+
+    def _attach(self, connection):
+        # link a connection to its session. returns true if the session already existed
+        with self.__lock:
+            self.__connections[connection.client_id] = connection
+            session_present = connection.client_id in self.__sessions and not connection.clean_session
+            if not session_present:
+                self.__sessions[connection.client_id] = {"subscriptions": {}, "queue": []}
+            return session_present
+
+    def _detach(self, connection):
+        with self.__lock:
+            if self.__connections.get(connection.client_id) is connection:
+                del self.__connections[connection.client_id]
+            if connection.clean_session:
+                self.__sessions.pop(connection.client_id, None)
+
+    def _interrupted(self, connection):
+        # a clean session does not survive the loss of its connection
+        with self.__lock:
+            if connection.clean_session:
+                self.__sessions[connection.client_id] = {"subscriptions": {}, "queue": []}
+
+    def _subscribe(self, connection, topic_filter, qos, callback):
+        with self.__lock:
+            self.__sessions[connection.client_id]["subscriptions"][topic_filter] = (qos, callback)
+            retained = [(topic, message) for topic, message in self.__retained.items()
+                        if topic_matches(topic_filter, topic)]
+
+        # new subscribers receive the retained message for each matching topic
+        for topic, (payload, retained_qos) in retained:
+            self._deliver(connection, callback, topic, payload, min(qos, retained_qos), retain=True)
+
+    def _unsubscribe(self, connection, topic_filter):
+        with self.__lock:
+            self.__sessions[connection.client_id]["subscriptions"].pop(topic_filter, None)
+
+    def _subscriptions(self, connection):
+        with self.__lock:
+            return dict(self.__sessions[connection.client_id]["subscriptions"])
+
+    def _publish(self, topic, payload, qos, retain):
+        with self.__lock:
+            self.__statistics["published"] += 1
+
+            # a retained message with an empty payload clears the retained message for the topic
+            if retain:
+                if payload:
+                    self.__retained[topic] = (payload, qos)
+                else:
+                    self.__retained.pop(topic, None)
+
+            # find every session with a matching subscription
+            deliveries = []
+            for client_id, session in self.__sessions.items():
+                for topic_filter, (subscribed_qos, callback) in session["subscriptions"].items():
+                    if topic_matches(topic_filter, topic):
+                        deliveries.append((client_id, callback, min(qos, subscribed_qos)))
+
+                        # a subscriber receives a message once, even if several of its filters match
+                        break
+
+        for client_id, callback, delivery_qos in deliveries:
+            connection = self.__connections.get(client_id)
+            if connection is not None and connection.is_connected():
+                self._deliver(connection, callback, topic, payload, delivery_qos, retain=False)
+            elif delivery_qos >= AT_LEAST_ONCE:
+                # at least once delivery means holding the message until the client comes back
+                with self.__lock:
+                    self.__sessions[client_id]["queue"].append((callback, topic, payload, delivery_qos))
+                    self.__statistics["queued"] += 1
+            else:
+                with self.__lock:
+                    self.__statistics["dropped"] += 1
+
+    def _deliver_queued(self, connection):
+        # deliver messages held for a client while it was disconnected
+        with self.__lock:
+            session = self.__sessions.get(connection.client_id, {"queue": []})
+            queued, session["queue"] = session["queue"], []
+
+        for callback, topic, payload, qos in queued:
+            self._deliver(connection, callback, topic, payload, qos, retain=False, dup=True)
+
+    def _deliver(self, connection, callback, topic, payload, qos, retain, dup=False):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self.__lock:
+            self.__statistics["delivered"] += 1
+        callback(topic=topic, payload=payload, dup=dup, qos=qos, retain=retain)
+
+
+class LocalMqttConnection:
+    """A connection to a LocalBroker. It offers the subset of the awscrt.mqtt.Connection interface used by
+    the mqtt networks, so a network can be pointed at the local broker without any other change"""
+    def __init__(self, broker, client_id, on_connection_interrupted=None, on_connection_resumed=None,
+                 clean_session=True):
+        self.client_id = client_id
+        self.clean_session = clean_session
+        self.on_connection_interrupted = on_connection_interrupted
+        self.on_connection_resumed = on_connection_resumed
+
+        self.__broker = broker
+        self.__connected = False
+        self.__outbox = []
+        self.__subscriptions_before_interruption = {}
+        self.__lock = threading.Lock()
+
+    def is_connected(self):
+        return self.__connected
+
+    def connect(self):
+        session_present = self.__broker._attach(self)
+        self.__connected = True
+        self.__broker._deliver_queued(self)
+        return self.__done({"session_present": session_present})
+
+    def disconnect(self):
+        self.__connected = False
+        self.__broker._detach(self)
+        return self.__done({})
+
+    def publish(self, topic, payload, qos, retain=False):
+        packet_id = self.__broker._next_packet_id()
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+
+        with self.__lock:
+            if not self.__connected:
+                # at least once messages are sent when the connection resumes. others are lost
+                if int(qos) >= AT_LEAST_ONCE:
+                    publish_future = Future()
+                    self.__outbox.append((publish_future, packet_id, topic, payload, int(qos), retain))
+                    return publish_future, packet_id
+                raise ClientNotConnected(self.client_id)
+
+        self.__broker._publish(topic, payload, int(qos), retain)
+        return self.__done({"packet_id": packet_id}), packet_id
+
+    def subscribe(self, topic, qos, callback=None):
+        packet_id = self.__broker._next_packet_id()
+        self.__broker._subscribe(self, topic, int(qos), callback)
+        return self.__done({"packet_id": packet_id, "topic": topic, "qos": qos}), packet_id
+
+    def unsubscribe(self, topic):
+        packet_id = self.__broker._next_packet_id()
+        self.__broker._unsubscribe(self, topic)
+        return self.__done({"packet_id": packet_id}), packet_id
+
+    def resubscribe_existing_topics(self):
+        # the broker forgets the subscriptions of a clean session. the connection remembers them for resubscription
+        packet_id = self.__broker._next_packet_id()
+        topics = []
+        for topic_filter, (qos, callback) in self.__subscriptions_before_interruption.items():
+            self.__broker._subscribe(self, topic_filter, qos, callback)
+            topics.append((topic_filter, qos))
+        return self.__done({"packet_id": packet_id, "topics": topics}), packet_id
+
+    def _interrupt(self):
+        self.__subscriptions_before_interruption = self.__broker._subscriptions(self)
+        self.__connected = False
+        self.__broker._interrupted(self)
+
+    def _resume(self):
+        self.__connected = True
+        self.__broker._deliver_queued(self)
+
+        # send the messages published while the connection was down
+        with self.__lock:
+            outbox, self.__outbox = self.__outbox, []
+        for publish_future, packet_id, topic, payload, qos, retain in outbox:
+            self.__broker._publish(topic, payload, qos, retain)
+            publish_future.set_result({"packet_id": packet_id})
+
+    @staticmethod
+    def __done(result):
+        future = Future()
+        future.set_result(result)
+        return future
@@ -0,0 +1,49 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed for the default, human-readable wire format
+import json
+
+# needed for the compact, binary wire format
+import msgpack
+
+from .message import Message
+
+# names of the wire formats a network can publish with
+JSON_WIRE_FORMAT = 'json'
+COMPACT_WIRE_FORMAT = 'compact'
+
+# compact payloads start with a byte that never begins a json document or a msgpack object,
+# followed by the version of the compact layout. this makes every payload self-describing
+COMPACT_CONTENT_TYPE_MARKER = b'\xc1\x01'
+
+# in the compact layout each message field is keyed by its position in the message definition
+_field_indexes = {field: index for index, field in enumerate(Message._fields)}
+
+
+class UnknownWireFormat(Exception):
+    pass
+
+
+def encode_message(message, wire_format=JSON_WIRE_FORMAT):
+    """Serialise a message dictionary for publishing in the given wire format"""
+    if wire_format == JSON_WIRE_FORMAT:
+        return json.dumps(message)
+
+    if wire_format == COMPACT_WIRE_FORMAT:
+        # fields that are null are left out of the compact layout entirely
+        indexed_fields = {_field_indexes[field]: value for field, value in message.items() if value is not None}
+        return COMPACT_CONTENT_TYPE_MARKER + msgpack.packb(indexed_fields)
+
+    raise UnknownWireFormat(wire_format)
+
+
+def decode_message(payload):
+    """Deserialise a received payload, whatever wire format it was published in, into a message dictionary"""
+    if isinstance(payload, bytes) and payload.startswith(COMPACT_CONTENT_TYPE_MARKER):
+        indexed_fields = msgpack.unpackb(payload[len(COMPACT_CONTENT_TYPE_MARKER):], strict_map_key=False)
+        return {field: indexed_fields.get(index) for index, field in enumerate(Message._fields)}
+
+    # anything without the compact marker is json
+    return json.loads(payload)
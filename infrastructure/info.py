@@ -42,6 +42,12 @@ class Info():
     def effects(self):
         return self.message.effects
 
+    @property
+    def trace_id(self):
+        if isinstance(self.message.context, dict):
+            return self.message.context.get('trace_id')
+        return None
+
     @property
     def location(self):
         if self.message.event_tags and 'location' in self.message.event_tags:
@@ -5,25 +5,37 @@ __version__ = "0.0.1"
 # needed to make local variables behave like centralized infrastructure
 from highcliff.singleton import Singleton
 
-# needed for message queuing and validation
-from jsonschema import validate, ValidationError
+# needed for message queuing
 import json
 
-# needed to reference the json schema file from within the host application
-import pkgutil
-
 # used to log system messages in the event of network connection failure
 import sys
 
+# needed to publish coalesced world updates after a delay
+import threading
+
 # MQTT Networks
-from awscrt import io, mqtt
-from awsiot import mqtt_connection_builder
 from uuid import uuid4
-import time
+
+# needed to number the messages published by a network
+from itertools import count
+
+# needed to follow each message through the work it leads to
+from highcliff.tracing import Tracer, current_trace_id
+
+# needed to time stamp messages by the real clock, or by a virtual one
+from highcliff.clock import SystemClock
+
+# needed to report the memory a network takes
+from highcliff.memory import deep_size_of, size_report
 
 from .info import Info
 from .message import Message
+from .encoding import encode_message, decode_message, JSON_WIRE_FORMAT, COMPACT_WIRE_FORMAT, UnknownWireFormat
 from .world import World
+from .rules import TopicRules
+from .validation import is_valid_message
+from .broker import AT_LEAST_ONCE, ACCEPTED
 
 
 class InvalidMessageFormat(Exception):
@@ -61,16 +73,27 @@ class Network:
         # when a message is published to the given topic
         raise NotImplementedError
 
+    def trace_ids_of(self, conditions):
+        # returns the trace that last set each of the given conditions of the world. see Tracer
+        return {}
+
+    def memory_report(self, seen=None):
+        # reports the number and size, in bytes, of the things the network keeps in memory. see AI.memory_report
+        return {}
+
 
 @Singleton
 class LocalNetwork(Network):
-    __the_world = {}
-    __message_queue = {}
+    def __init__(self):
+        self.__the_world = {}
+        self.__message_queue = {}
+        self.__trace_ids = {}
+
+        # follows each message published through the work it leads to
+        self.__tracer = Tracer.instance()
 
-    # refer to the package schema file in the host
-    __json_schema_file_path = 'schema.json'
-    __json_schema_string = pkgutil.get_data(__name__, __json_schema_file_path).decode("utf-8")
-    __json_schema = json.loads(__json_schema_string)
+    def set_tracer(self, tracer):
+        self.__tracer = tracer
 
     def the_world(self):
         return self.__the_world
@@ -78,6 +101,24 @@ class LocalNetwork(Network):
     def update_the_world(self, update):
         self.__the_world.update(update)
 
+        # remember which trace last set each condition, so the work it leads to can carry the trace on
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            for condition in update:
+                self.__trace_ids[condition] = trace_id
+
+    def trace_ids_of(self, conditions):
+        return {condition: self.__trace_ids[condition] for condition in conditions if condition in self.__trace_ids}
+
+    def memory_report(self, seen=None):
+        return {
+            "world": {"conditions": len(self.__the_world), "traced_conditions": len(self.__trace_ids),
+                      "bytes": deep_size_of([self.__the_world, self.__trace_ids], seen)},
+            "message_queue": {"topics": len(self.__message_queue),
+                              "subscribers": sum(len(callbacks) for callbacks in list(self.__message_queue.values())),
+                              "bytes": deep_size_of(self.__message_queue, seen)}
+        }
+
     def create_topic(self, topic):
         self.__message_queue[topic] = []
 
@@ -93,12 +134,19 @@ class LocalNetwork(Network):
 
         self.__validate_message(message)
 
-        # add the effects associated with the message to the world
-        self.update_the_world(message["effects"])
+        # a message carries on the trace it belongs to. while tracing, any other message starts a trace of its own
+        context = message.get("context")
+        trace_id = context.get("trace_id") if isinstance(context, dict) else None
+        if trace_id is None and current_trace_id() is None and self.__tracer.enabled():
+            trace_id = self.__tracer.new_id()
+
+        with self.__tracer.span("receive message", trace_id, topic=topic):
+            # add the effects associated with the message to the world
+            self.update_the_world(message["effects"])
 
-        # call each callback function registered under the given topic
-        for callback in self.__message_queue[topic]:
-            callback(topic, message)
+            # call each callback function registered under the given topic
+            for callback in self.__message_queue[topic]:
+                callback(topic, message)
 
     def subscribe(self, topic, callback_function):
         # register the callback function under the given topic
@@ -108,6 +156,7 @@ class LocalNetwork(Network):
         # clears all state
         self.__the_world = {}
         self.__message_queue = {}
+        self.__trace_ids = {}
 
     def __validate_topic(self, topic):
         # validate the the topic exists in the communication infrastructure
@@ -116,9 +165,7 @@ class LocalNetwork(Network):
 
     def __validate_message(self, json_message):
         # validate the schema against the message and raise an error if invalid
-        try:
-            validate(json_message, self.__json_schema)
-        except ValidationError:
+        if not is_valid_message(json_message):
             raise InvalidMessageFormat
 
 
@@ -128,13 +175,30 @@ class MqttNetwork(Network):
     def __init__(self):
         """Init the MQTT client"""
         self.__mqtt_client = None
+        self.__client_id = None
+        self.__wire_format = JSON_WIRE_FORMAT
+
+        # the quality of service used to publish and subscribe, as the connection's own library expresses it
+        self.__at_least_once = AT_LEAST_ONCE
+
+        # the network prints the messages it sends and receives unless debug logging is turned off
+        self.__debug_logging = True
 
     def __del__(self):
         if self.__mqtt_client is not None:
-            print("Disconnecting...")
+            if self.__debug_logging:
+                print("Disconnecting...")
             disconnect_future = self.__mqtt_client.disconnect()
             disconnect_future.result()
-            print("Disconnected!")
+            if self.__debug_logging:
+                print("Disconnected!")
+
+    def set_debug_logging(self, debug_logging):
+        """Print the messages the network sends and receives, or not"""
+        self.__debug_logging = debug_logging
+
+    def debug_logging(self):
+        return self.__debug_logging
 
     def connect(self, endpoint="a15645u9kev0b1-ats.iot.eu-west-2.amazonaws.com",
                 port=8883, cert="/home/ubuntu/certs/certificate.pem.crt",
@@ -142,6 +206,12 @@ class MqttNetwork(Network):
         """Connect to an MQTT server"""
         if client_id is None:
             client_id = "HighCliff-" + str(uuid4())
+        self.__client_id = client_id
+
+        # the aws mqtt libraries are slow to import, so they are only loaded by networks that connect to aws
+        from awscrt import io, mqtt
+        from awsiot import mqtt_connection_builder
+        self.__at_least_once = mqtt.QoS.AT_LEAST_ONCE
 
         event_loop_group = io.EventLoopGroup(1)
         host_resolver = io.DefaultHostResolver(event_loop_group)
@@ -162,16 +232,44 @@ class MqttNetwork(Network):
         connect_future = self.__mqtt_client.connect()
         connect_future.result()
 
+    def connect_to_local_broker(self, broker, client_id=None):
+        """Connect to an in-process LocalBroker instead of an MQTT server"""
+        if client_id is None:
+            client_id = "HighCliff-" + str(uuid4())
+        self.__client_id = client_id
+        self.__at_least_once = AT_LEAST_ONCE
+
+        self.__mqtt_client = broker.create_connection(
+            client_id,
+            on_connection_interrupted=self.__on_connection_interrupted,
+            on_connection_resumed=self.__on_connection_resumed,
+            clean_session=True
+        )
+        connect_future = self.__mqtt_client.connect()
+        connect_future.result()
+
+    def client_id(self):
+        """Return the client id this network connected with"""
+        return self.__client_id
+
+    def set_wire_format(self, wire_format):
+        """Choose how published messages are serialised. Every payload carries a marker for its format,
+        so subscribers decode json and compact messages alike"""
+        if wire_format not in (JSON_WIRE_FORMAT, COMPACT_WIRE_FORMAT):
+            raise UnknownWireFormat(wire_format)
+        self.__wire_format = wire_format
+
     def publish(self, topic, message):
         """Publish a message in a topic"""
         self.__validate_connection()
         self.__validate_message(message)
-        payload = json.dumps(message)
-        print(f'Publishing in topic {topic}: {payload}')
+        payload = encode_message(message, self.__wire_format)
+        if self.__debug_logging:
+            print(f'Publishing in topic {topic}: {payload}')
         self.__mqtt_client.publish(
             topic=topic,
             payload=payload,
-            qos=mqtt.QoS.AT_LEAST_ONCE,
+            qos=self.__at_least_once,
         )
 
     def subscribe(self, topic, callback_function):
@@ -179,11 +277,12 @@ class MqttNetwork(Network):
         self.__validate_connection()
         subscribe_future, _ = self.__mqtt_client.subscribe(
             topic=topic,
-            qos=mqtt.QoS.AT_LEAST_ONCE,
+            qos=self.__at_least_once,
             callback=callback_function,
         )
         subscribe_result = subscribe_future.result()
-        print(f'Subscribed to {topic}')
+        if self.__debug_logging:
+            print(f'Subscribed to {topic}')
 
     def create_topic(self, topic):
         """Doesn't need to create topics using
@@ -192,9 +291,7 @@ class MqttNetwork(Network):
 
     def __validate_message(self, json_message):
         """Validate a message format"""
-        try:
-            validate(json_message, self.__json_schema)
-        except ValidationError:
+        if not is_valid_message(json_message):
             raise InvalidMessageFormat
 
     def __validate_connection(self):
@@ -212,7 +309,7 @@ class MqttNetwork(Network):
         """Execute on connection resume to restore everything"""
         print("Connection resumed. return_code: {} session_present: {}".format(return_code, session_present))
 
-        if return_code == mqtt.ConnectReturnCode.ACCEPTED and not session_present:
+        if return_code == ACCEPTED and not session_present:
             print("Session did not persist. Resubscribing to existing topics...")
             resubscribe_future, _ = connection.resubscribe_existing_topics()
 
@@ -238,6 +335,25 @@ class AiMqttNetwork(MqttNetwork):
         self.__the_world = World()
         self.__world_topic = 'world'
 
+        # world updates made within the coalescing window are merged and published once
+        self.__coalescing_window = 0
+        self.__pending_update = {}
+        self.__pending_update_lock = threading.Lock()
+        self.__pending_update_timer = None
+
+        # world updates are tagged with their origin so that the network can recognise its own messages
+        self.__sequence_numbers = count(1)
+        self.__last_sequence_numbers = {}
+
+        # rules that turn raw telemetry published to a topic into effects on the world
+        self.__topic_rules = TopicRules()
+
+        # follows each message received through the work it leads to
+        self.__tracer = Tracer.instance()
+
+        # the clock messages are time stamped by
+        self.__clock = SystemClock()
+
     def connect(self, endpoint="a15645u9kev0b1-ats.iot.eu-west-2.amazonaws.com",
                 port=8883, cert="/home/ubuntu/certs/certificate.pem.crt",
                 key="/home/ubuntu/certs/private.pem.key", client_id=None):
@@ -245,40 +361,164 @@ class AiMqttNetwork(MqttNetwork):
         super().connect(endpoint, port, cert, key, client_id)
         self.__subscribe_everything()
 
+    def connect_to_local_broker(self, broker, client_id=None):
+        """Connect to an in-process LocalBroker and subscribe to every topic"""
+        super().connect_to_local_broker(broker, client_id)
+        self.__subscribe_everything()
+
     def __subscribe_everything(self):
         """Listen in every existing topic"""
         self.subscribe('#', self.process_external_world_update)
 
     def process_external_world_update(self, topic, payload, **kwargs):
         """Update the world for every message received"""
-        decoded_payload = str(payload.decode("utf-8", "ignore"))
-        data = json.loads(decoded_payload)
-        print(f'Received from topic {topic} data: {data}')
+        data = decode_message(payload)
+
+        # the network already applied its own updates when it made them
+        origin, sequence_number = self.__origin_of(data)
+        if origin == self.client_id():
+            return
+
+        # ignore redeliveries of a message that has already been processed
+        if origin is not None:
+            if kwargs.get('dup') and sequence_number <= self.__last_sequence_numbers.get(origin, 0):
+                return
+            self.__last_sequence_numbers[origin] = sequence_number
+
+        if self.debug_logging():
+            print(f'Received from topic {topic} data: {data}')
+
+        # a message carries on the trace it belongs to. any other message starts a trace of its own
+        if not self.__tracer.enabled():
+            self.__apply_to_the_world(topic, data)
+            return
+        trace_id = self.__trace_id_of(data) or self.__tracer.new_id()
+        with self.__tracer.span("receive message", trace_id, topic=topic):
+            self.__apply_to_the_world(topic, data)
+
+    def __apply_to_the_world(self, topic, data):
+        # raw telemetry is turned into effects on the world by the rules for its topic
+        rule_effects = self.__topic_rules.evaluate(topic, data)
+        if rule_effects:
+            self.__the_world.update(topic, self.__create_message(rule_effects, event_source=topic))
+
         try:
             message = Message(**data)
+            if current_trace_id() is not None and isinstance(message.context, (dict, type(None))):
+                message = message._replace(context=dict(message.context or {}, trace_id=current_trace_id()))
             self.__the_world.update(topic, message)
         except TypeError as err:
-            print(f'Error while processing message {data}: {err}')
+            # payloads that are not messages are expected on topics that have rules
+            if not self.__topic_rules.rules_for(topic) and self.debug_logging():
+                print(f'Error while processing message {data}: {err}')
+
+    def set_tracer(self, tracer):
+        """Trace the messages received with the given Tracer, rather than the tracer shared by the process"""
+        self.__tracer = tracer
+
+    def set_clock(self, clock):
+        """Time stamp messages by the given clock, such as the VirtualClock of a simulation"""
+        self.__clock = clock
+
+    def trace_ids_of(self, conditions):
+        """Return the trace that last set each of the given conditions of the world"""
+        return self.__the_world.trace_ids_of(conditions)
+
+    def set_topic_rules(self, topic_rules):
+        """Use the given TopicRules to turn raw telemetry into effects on the world"""
+        self.__topic_rules = topic_rules
+
+    def memory_report(self, seen=None):
+        """The number and size, in bytes, of the things the network keeps in memory: the world, the updates waiting
+        to be published, the last message seen from each origin and the topic rules, with the rules found for each
+        topic"""
+        with self.__pending_update_lock:
+            pending_update = dict(self.__pending_update)
+        return {
+            "world": self.__the_world.memory_report(seen),
+            "pending_update": size_report(pending_update, seen),
+            "origins": size_report(self.__last_sequence_numbers, seen),
+            "topic_rules": {"bytes": deep_size_of(self.__topic_rules, seen)}
+        }
+
+    def set_coalescing_window(self, seconds):
+        """Merge the world updates made within the given number of seconds into a single publish.
+        A window of 0, the default, publishes every update as soon as it is made"""
+        self.flush()
+        self.__coalescing_window = seconds
 
     def update_the_world(self, update):
-        """Update the world with given effects"""
-        message = self.__create_message(update)
-        self.publish(self.__world_topic, message._asdict())
-        self.__the_world.update(self.__world_topic, message)
-
-    @classmethod
-    def __create_message(cls, effects):
+        """Update the world with given effects. Only effects that change the world are published"""
+        changes = self.__changes_to_the_world(update)
+
+        # an update that would leave the world as it is does not need to be shared
+        if not changes:
+            return
+
+        if self.__coalescing_window <= 0:
+            message = self.__create_message(changes)
+            self.publish(self.__world_topic, message._asdict())
+            self.__the_world.update(self.__world_topic, message)
+            return
+
+        # apply the changes locally right away and publish them with any others made within the window
+        self.__the_world.update(self.__world_topic, self.__create_message(changes))
+        with self.__pending_update_lock:
+            self.__pending_update.update(changes)
+            if self.__pending_update_timer is None:
+                self.__pending_update_timer = threading.Timer(self.__coalescing_window, self.flush)
+                self.__pending_update_timer.daemon = True
+                self.__pending_update_timer.start()
+
+    def flush(self):
+        """Publish any coalesced world updates that are still waiting for their window to close"""
+        with self.__pending_update_lock:
+            pending_update, self.__pending_update = self.__pending_update, {}
+            if self.__pending_update_timer is not None:
+                self.__pending_update_timer.cancel()
+                self.__pending_update_timer = None
+
+        if pending_update:
+            message = self.__create_message(pending_update)
+            self.publish(self.__world_topic, message._asdict())
+
+    def __changes_to_the_world(self, update):
+        """Return the effects in the given update that differ from the current state of the world"""
+        world = self.__the_world.effects
+        return {key: value for key, value in update.items() if key not in world or world[key] != value}
+
+    @staticmethod
+    def __origin_of(data):
+        """Return the client id and sequence number a message was tagged with, if any"""
+        context = data.get('context') if isinstance(data, dict) else None
+        if not isinstance(context, dict) or 'origin' not in context:
+            return None, None
+        return context['origin'], context.get('sequence', 0)
+
+    @staticmethod
+    def __trace_id_of(data):
+        """Return the trace a message belongs to, if any"""
+        context = data.get('context') if isinstance(data, dict) else None
+        return context.get('trace_id') if isinstance(context, dict) else None
+
+    def __create_message(self, effects, event_source='highcliff_sdk'):
         """Create a formated message given only the effects"""
+        context = {'origin': self.client_id(), 'sequence': next(self.__sequence_numbers)}
+
+        # the message carries on the trace of the work that made it
+        if current_trace_id() is not None:
+            context['trace_id'] = current_trace_id()
+
         message = Message(
             event_type='effects',
             event_tags=None,
-            event_source='highcliff_sdk',
-            timestamp=time.time(),
+            event_source=event_source,
+            timestamp=self.__clock.time(),
             device_info=None,
             application_info=None,
             user_info=None,
             environment=None,
-            context=None,
+            context=context,
             effects=effects,
             data=None,
         )
@@ -288,3 +528,12 @@ class AiMqttNetwork(MqttNetwork):
     def the_world(self):
         """Return the world effects"""
         return self.__the_world.effects
+
+    def reset(self):
+        """Forget everything known about the world"""
+        with self.__pending_update_lock:
+            self.__pending_update = {}
+            if self.__pending_update_timer is not None:
+                self.__pending_update_timer.cancel()
+                self.__pending_update_timer = None
+        self.__the_world = World()
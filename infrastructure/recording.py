@@ -0,0 +1,73 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to read and write recordings
+import csv
+import json
+
+# needed to read the time stamps of recorded temperatures
+import calendar
+from datetime import datetime
+
+# needed to record the traffic on a network
+import threading
+from highcliff.clock import SystemClock
+
+# needed to describe a recorded message
+from collections import namedtuple
+
+from .encoding import decode_message
+
+# a message as it was recorded: when it was published, the topic it was published to and its payload
+RecordedMessage = namedtuple("RecordedMessage", "timestamp topic payload")
+
+# the layout of the time stamps in temperature recordings, such as aws/iot/python/temps.csv
+TEMPERATURE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def read_temperature_csv(path, topic="test/temperatures", device_id="temperature-recording"):
+    """Read a recording of temperatures, one "time, temperature" row per reading, as the messages the temperature
+    monitor publishes for them. Time stamps are taken to be utc"""
+    with open(path, newline="") as csv_file:
+        for row in csv.reader(csv_file):
+            if not row:
+                continue
+            sample_time, temperature = row[0].strip(), float(row[1])
+            timestamp = calendar.timegm(datetime.strptime(sample_time, TEMPERATURE_TIME_FORMAT).timetuple())
+            yield RecordedMessage(timestamp, topic, {"device_id": device_id, "type": "temperature",
+                                                     "sample_time": sample_time, "value": temperature})
+
+
+def read_topic_dump(path):
+    """Read a dump of the traffic on a network: one json object per line, with the time stamp, topic and payload
+    of a message"""
+    with open(path) as dump_file:
+        for line in dump_file:
+            if line.strip():
+                recorded = json.loads(line)
+                yield RecordedMessage(recorded["timestamp"], recorded["topic"], recorded["payload"])
+
+
+def write_topic_dump(path, recorded_messages):
+    with open(path, "w") as dump_file:
+        for recorded_message in recorded_messages:
+            dump_file.write(json.dumps(recorded_message._asdict()) + "\n")
+
+
+class TopicRecorder:
+    """Records the messages a subscription receives, to be written as a topic dump. Pass the recorder as the callback
+    of a subscription"""
+    def __init__(self, clock=None):
+        self._clock = clock or SystemClock()
+        self._recorded_messages = []
+        self._lock = threading.Lock()
+
+    def __call__(self, topic, payload, **kwargs):
+        recorded_message = RecordedMessage(self._clock.time(), topic, decode_message(payload))
+        with self._lock:
+            self._recorded_messages.append(recorded_message)
+
+    def recorded_messages(self):
+        with self._lock:
+            return list(self._recorded_messages)
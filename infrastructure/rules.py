@@ -0,0 +1,135 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to compile rule conditions
+import operator
+
+# needed to read rules from a json rules file
+import json
+
+# needed to index rules by topic, keeping only the topics seen most recently
+from collections import defaultdict, OrderedDict
+import threading
+
+from .broker import topic_matches
+
+# the comparisons a rule can make between a payload field and its threshold
+_comparisons = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+class InvalidTopicRule(Exception):
+    pass
+
+
+class TopicRule:
+    """Maps a field in the payloads published to a topic onto a key in the world.
+    For example, a temperature reading of 39 or more on a topic means that a room temperature change is needed"""
+    def __init__(self, topic, field, world_key, comparison='==', threshold=True, value=True, otherwise=None):
+        if comparison not in _comparisons:
+            raise InvalidTopicRule(f'Unknown comparison {comparison} in the rule for {world_key}')
+
+        self.topic = topic
+        self.field = field
+        self.world_key = world_key
+        self.comparison = comparison
+        self.threshold = threshold
+
+        # the value given to the world key when the condition holds and, unless None, when it does not
+        self.value = value
+        self.otherwise = otherwise
+
+        # compile the field path and the condition once, rather than for every message
+        self.__field_path = field.split('.')
+        self.__compare = _comparisons[comparison]
+
+    def apply(self, payload, effects):
+        """Add the effect of this rule on the given payload to the given effects"""
+        reading = payload
+        for name in self.__field_path:
+            if not isinstance(reading, dict) or name not in reading:
+                # a payload without the field says nothing about the world key
+                return
+            reading = reading[name]
+
+        try:
+            condition_holds = self.__compare(reading, self.threshold)
+        except TypeError:
+            # a reading that can't be compared with the threshold says nothing about the world key
+            return
+
+        if condition_holds:
+            effects[self.world_key] = self.value
+        elif self.otherwise is not None:
+            effects[self.world_key] = self.otherwise
+
+
+class TopicRules:
+    """A set of topic rules, indexed so that only the rules for a message's topic are evaluated"""
+    def __init__(self, rules=(), maximum_indexed_topics=10000):
+        self.__rules_by_topic = defaultdict(list)
+        self.__wildcard_rules = []
+
+        # the rules that apply to each of the topics seen most recently. topics come and go with the devices that
+        # publish to them, so the least recently seen topic is dropped once the index is full
+        self.__index = OrderedDict()
+        self.__index_lock = threading.Lock()
+        self.__maximum_indexed_topics = maximum_indexed_topics
+
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def from_definitions(cls, definitions):
+        """Create topic rules from a list of rule definitions, such as those read from a json rules file"""
+        return cls(TopicRule(**definition) for definition in definitions)
+
+    @classmethod
+    def from_json_file(cls, path):
+        """Create topic rules from a json file holding a list of rule definitions"""
+        with open(path) as json_file:
+            return cls.from_definitions(json.load(json_file))
+
+    def add(self, rule):
+        if '+' in rule.topic or '#' in rule.topic:
+            self.__wildcard_rules.append(rule)
+        else:
+            self.__rules_by_topic[rule.topic].append(rule)
+
+        # a new rule may apply to topics that have already been indexed
+        with self.__index_lock:
+            self.__index = OrderedDict()
+
+    def rules_for(self, topic):
+        """Return the rules that apply to the given topic"""
+        with self.__index_lock:
+            rules = self.__index.get(topic)
+            if rules is not None:
+                self.__index.move_to_end(topic)
+                return rules
+
+        rules = tuple(self.__rules_by_topic.get(topic, [])) + \
+            tuple(rule for rule in self.__wildcard_rules if topic_matches(rule.topic, topic))
+        with self.__index_lock:
+            self.__index[topic] = rules
+            if len(self.__index) > self.__maximum_indexed_topics:
+                self.__index.popitem(last=False)
+        return rules
+
+    def number_of_indexed_topics(self):
+        with self.__index_lock:
+            return len(self.__index)
+
+    def evaluate(self, topic, payload):
+        """Return the world effects that the rules for the topic derive from the given payload"""
+        effects = {}
+        for rule in self.rules_for(topic):
+            rule.apply(payload, effects)
+        return effects
@@ -3,6 +3,22 @@ import unittest
 # needed to test local infrastructure
 from infrastructure import LocalNetwork
 
+# needed to test the mqtt networks without a remote mqtt server
+from infrastructure import LocalBroker, MqttNetwork, AiMqttNetwork, topic_matches
+
+# needed to test the wire formats used by the mqtt networks
+from infrastructure import COMPACT_WIRE_FORMAT, encode_message, decode_message
+
+# needed to test turning raw telemetry into effects on the world
+from infrastructure import TopicRules
+
+# needed to test the world the ai keeps of the messages it receives
+from infrastructure.world import World
+from infrastructure.message import Message
+
+# needed to test following messages through the work they lead to
+from highcliff.tracing import Tracer, MemorySink
+
 
 class TestInfrastructure(unittest.TestCase):
     def test_local_infrastructure_reset(self):
@@ -65,5 +81,306 @@ class TestInfrastructure(unittest.TestCase):
         self.assertEqual(topic_list, second_local_network.topics())
 
 
+class TestLocalBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = LocalBroker()
+        self.received = []
+
+    def record(self, topic, payload, **kwargs):
+        self.received.append((topic, payload, kwargs["retain"]))
+
+    def test_topic_wildcards(self):
+        self.assertTrue(topic_matches("#", "home/bedroom/temperature"))
+        self.assertTrue(topic_matches("home/+/temperature", "home/bedroom/temperature"))
+        self.assertTrue(topic_matches("home/#", "home"))
+        self.assertFalse(topic_matches("home/+", "home/bedroom/temperature"))
+        self.assertFalse(topic_matches("#", "$SYS/broker"))
+
+    def test_retained_messages_reach_late_subscribers(self):
+        publisher = self.broker.create_connection("publisher")
+        publisher.connect()
+        publisher.publish("home/temperature", "38", qos=1, retain=True)
+
+        subscriber = self.broker.create_connection("subscriber")
+        subscriber.connect()
+        subscriber.subscribe("home/#", qos=1, callback=self.record)
+
+        self.assertEqual([("home/temperature", b"38", True)], self.received)
+
+    def test_at_least_once_delivery_survives_a_disconnect(self):
+        subscriber = self.broker.create_connection("subscriber", clean_session=False)
+        subscriber.connect()
+        subscriber.subscribe("home/temperature", qos=1, callback=self.record)
+
+        publisher = self.broker.create_connection("publisher")
+        publisher.connect()
+
+        # messages published while the subscriber is away are held for it
+        self.broker.disconnect_client("subscriber")
+        publisher.publish("home/temperature", "39", qos=1)
+        publisher.publish("home/temperature", "40", qos=0)
+        self.assertEqual([], self.received)
+
+        self.broker.resume_client("subscriber")
+        self.assertEqual([("home/temperature", b"39", False)], self.received)
+        self.assertEqual(1, self.broker.statistics()["dropped"])
+
+    def test_ai_mqtt_network_shares_the_world_through_the_broker(self):
+        ai_network = AiMqttNetwork.instance()
+        ai_network.connect_to_local_broker(self.broker, client_id="ai")
+
+        device_network = MqttNetwork()
+        device_network.connect_to_local_broker(self.broker, client_id="device")
+
+        # a device publishes its effects and the ai adds them to the world
+        device_message = {
+            "event_type": "reading",
+            "event_tags": None,
+            "event_source": "thermometer",
+            "timestamp": 1234567.89,
+            "device_info": None,
+            "application_info": None,
+            "user_info": None,
+            "environment": None,
+            "context": None,
+            "effects": {"is_room_temperature_change_needed": True},
+            "data": None
+        }
+        device_network.publish("home/temperature", device_message)
+        self.assertEqual({"is_room_temperature_change_needed": True}, ai_network.the_world())
+
+        # the ai network resubscribes to everything after losing its session
+        self.broker.disconnect_client("ai")
+        self.broker.resume_client("ai")
+        device_message["effects"] = {"is_room_temperature_change_needed": False}
+        device_network.publish("home/temperature", device_message)
+        self.assertEqual({"is_room_temperature_change_needed": False}, ai_network.the_world())
+
+        ai_network.reset()
+
+
+class TestAiMqttNetworkWorldUpdates(unittest.TestCase):
+    def setUp(self):
+        self.broker = LocalBroker()
+        self.ai_network = AiMqttNetwork.instance()
+        self.ai_network.connect_to_local_broker(self.broker, client_id="ai")
+
+        # watch what the ai publishes to the world topic
+        self.published_effects = []
+        observer = self.broker.create_connection("observer")
+        observer.connect()
+        observer.subscribe("world", qos=1, callback=self.record)
+
+    def record(self, topic, payload, **kwargs):
+        self.published_effects.append(decode_message(payload)["effects"])
+
+    def tearDown(self):
+        self.ai_network.set_coalescing_window(0)
+        self.ai_network.reset()
+
+    def test_updates_that_change_nothing_are_not_published(self):
+        self.ai_network.update_the_world({"is_room_temperature_comfortable": True})
+        self.ai_network.update_the_world({"is_room_temperature_comfortable": True})
+
+        # only the part of an update that changes the world is published
+        self.ai_network.update_the_world({"is_room_temperature_comfortable": True, "problem_with_bed": False})
+        self.assertEqual([{"is_room_temperature_comfortable": True}, {"problem_with_bed": False}],
+                         self.published_effects)
+
+    def test_rapid_updates_are_coalesced_into_one_publish(self):
+        self.ai_network.set_coalescing_window(60)
+        self.ai_network.update_the_world({"is_room_temperature_change_needed": True})
+        self.ai_network.update_the_world({"is_room_temperature_change_authorized": True})
+
+        # the world is updated locally straight away, but nothing is published until the window closes
+        self.assertEqual({"is_room_temperature_change_needed": True, "is_room_temperature_change_authorized": True},
+                         self.ai_network.the_world())
+        self.assertEqual([], self.published_effects)
+
+        self.ai_network.flush()
+        self.assertEqual([{"is_room_temperature_change_needed": True, "is_room_temperature_change_authorized": True}],
+                         self.published_effects)
+
+    def test_received_messages_start_traces_that_updates_carry_on(self):
+        sink = MemorySink()
+        tracer = Tracer.new_instance()
+        tracer.set_sink(sink)
+        self.ai_network.set_tracer(tracer)
+
+        # a reading from a device starts a trace, recorded against the conditions it sets
+        device = MqttNetwork()
+        device.connect_to_local_broker(self.broker, client_id="thermometer")
+        device.publish("temperature", {"event_type": "reading", "event_tags": [], "event_source": "thermometer",
+                                       "timestamp": 0, "device_info": {}, "application_info": {}, "user_info": {},
+                                       "environment": "test", "context": {},
+                                       "effects": {"is_room_temperature_change_needed": True}, "data": {}})
+        self.assertEqual(["receive message"], [span.name for span in sink.spans])
+        trace_id = sink.spans[0].trace_id
+        self.assertEqual({"is_room_temperature_change_needed": trace_id},
+                         self.ai_network.trace_ids_of(["is_room_temperature_change_needed", "unknown_condition"]))
+
+        # updates made on behalf of the trace carry it on to the world and to the messages that share them
+        published_contexts = []
+        observer = self.broker.create_connection("trace observer")
+        observer.connect()
+        observer.subscribe("world", qos=1,
+                           callback=lambda topic, payload, **kwargs: published_contexts.append(
+                               decode_message(payload)["context"]))
+        with tracer.working_on(trace_id):
+            self.ai_network.update_the_world({"is_room_temperature_change_authorized": True})
+        self.assertEqual(trace_id, published_contexts[0]["trace_id"])
+        self.assertEqual({"is_room_temperature_change_authorized": trace_id},
+                         self.ai_network.trace_ids_of(["is_room_temperature_change_authorized"]))
+
+        self.ai_network.set_tracer(Tracer.instance())
+
+    def test_echoes_of_the_networks_own_updates_are_ignored(self):
+        self.ai_network.update_the_world({"is_room_temperature_comfortable": True})
+        stale_echo = {
+            "event_type": "effects",
+            "event_tags": None,
+            "event_source": "highcliff_sdk",
+            "timestamp": 1234567.89,
+            "device_info": None,
+            "application_info": None,
+            "user_info": None,
+            "environment": None,
+            "context": {"origin": "ai", "sequence": 1},
+            "effects": {"is_room_temperature_comfortable": False},
+            "data": None
+        }
+
+        # a late copy of an earlier update made by the ai should not overwrite the ai's newer state
+        device = self.broker.create_connection("device")
+        device.connect()
+        device.publish("world", encode_message(stale_echo), qos=1)
+        self.assertEqual({"is_room_temperature_comfortable": True}, self.ai_network.the_world())
+
+    def test_redelivered_messages_are_processed_once(self):
+        message = {
+            "event_type": "effects",
+            "event_tags": None,
+            "event_source": "thermometer",
+            "timestamp": 1234567.89,
+            "device_info": None,
+            "application_info": None,
+            "user_info": None,
+            "environment": None,
+            "context": {"origin": "thermometer", "sequence": 7},
+            "effects": {"is_room_temperature_change_needed": True},
+            "data": None
+        }
+        payload = encode_message(message).encode("utf-8")
+        self.ai_network.process_external_world_update("home/temperature", payload, dup=False)
+        self.ai_network.update_the_world({"is_room_temperature_change_needed": False})
+
+        # a duplicate of an already processed message does not undo the newer update
+        self.ai_network.process_external_world_update("home/temperature", payload, dup=True)
+        self.assertEqual({"is_room_temperature_change_needed": False}, self.ai_network.the_world())
+
+
+class TestWorld(unittest.TestCase):
+    def test_messages_without_effects_leave_the_world_as_it_is(self):
+        world = World()
+        world.update("world", Message("effects", None, "highcliff_sdk", 1234567.89, None, None, None, None, None,
+                                      {"is_room_temperature_change_needed": True}, None))
+
+        # a reading that carries data but no effects
+        world.update("home/temperature", Message("reading", None, "thermometer", 1234567.89, None, None, None, None,
+                                                 {"trace_id": "a trace"}, None, {"temperature": 36.6}))
+        self.assertEqual({"is_room_temperature_change_needed": True}, world.effects)
+        self.assertEqual({}, world.trace_ids_of(["is_room_temperature_change_needed"]))
+        self.assertEqual({"temperature": 36.6}, world.get_all_info()["thermometer"]["data"])
+
+
+class TestTopicRules(unittest.TestCase):
+    def setUp(self):
+        self.rules = TopicRules.from_definitions([
+            {"topic": "+/temperatures", "field": "value", "world_key": "is_room_temperature_change_needed",
+             "comparison": ">=", "threshold": 39, "value": True, "otherwise": False},
+            {"topic": "home/humidity", "field": "data.percent", "world_key": "is_humidity_change_needed",
+             "comparison": ">", "threshold": 60}
+        ])
+
+    def test_rules_map_payload_fields_to_world_keys(self):
+        self.assertEqual({"is_room_temperature_change_needed": True},
+                         self.rules.evaluate("test/temperatures", {"type": "temperature", "value": 40.9}))
+        self.assertEqual({"is_room_temperature_change_needed": False},
+                         self.rules.evaluate("test/temperatures", {"type": "temperature", "value": 37}))
+
+        # a rule without an otherwise value only changes the world when its condition holds
+        self.assertEqual({"is_humidity_change_needed": True},
+                         self.rules.evaluate("home/humidity", {"data": {"percent": 65}}))
+        self.assertEqual({}, self.rules.evaluate("home/humidity", {"data": {"percent": 40}}))
+
+        # topics without rules and payloads without the field have no effect
+        self.assertEqual((), self.rules.rules_for("home/lighting"))
+        self.assertEqual({}, self.rules.evaluate("test/temperatures", {"type": "temperature"}))
+
+    def test_the_index_keeps_only_the_topics_seen_most_recently(self):
+        rules = TopicRules(self.rules.rules_for("test/temperatures"), maximum_indexed_topics=2)
+        for device_number in range(100):
+            rules.evaluate(f"device-{device_number}/temperatures", {"value": 40})
+        self.assertEqual(2, rules.number_of_indexed_topics())
+
+        # a topic dropped from the index still finds its rules
+        self.assertEqual({"is_room_temperature_change_needed": True},
+                         rules.evaluate("device-0/temperatures", {"value": 40}))
+
+    def test_raw_telemetry_drives_the_ai_world(self):
+        broker = LocalBroker()
+        ai_network = AiMqttNetwork.instance()
+        ai_network.connect_to_local_broker(broker, client_id="ai")
+        ai_network.set_topic_rules(self.rules)
+
+        sensor = broker.create_connection("sensor")
+        sensor.connect()
+        sensor.publish("test/temperatures", '{"device_id": "sensor", "type": "temperature", "value": 40.9}', qos=1)
+        self.assertEqual({"is_room_temperature_change_needed": True}, ai_network.the_world())
+
+        ai_network.set_topic_rules(TopicRules())
+        ai_network.reset()
+
+
+class TestWireFormats(unittest.TestCase):
+    def setUp(self):
+        self.message = {
+            "event_type": "effects",
+            "event_tags": None,
+            "event_source": "highcliff_sdk",
+            "timestamp": 1234567.89,
+            "device_info": None,
+            "application_info": None,
+            "user_info": None,
+            "environment": None,
+            "context": None,
+            "effects": {"is_room_temperature_change_needed": True},
+            "data": None
+        }
+
+    def test_json_and_compact_payloads_decode_to_the_same_message(self):
+        json_payload = encode_message(self.message).encode("utf-8")
+        compact_payload = encode_message(self.message, COMPACT_WIRE_FORMAT)
+
+        self.assertEqual(self.message, decode_message(json_payload))
+        self.assertEqual(self.message, decode_message(compact_payload))
+
+        # the compact payload should be much smaller than the json payload
+        self.assertTrue(len(compact_payload) < len(json_payload) / 2)
+
+    def test_ai_mqtt_network_receives_compact_messages(self):
+        broker = LocalBroker()
+        ai_network = AiMqttNetwork.instance()
+        ai_network.connect_to_local_broker(broker, client_id="ai")
+
+        device_network = MqttNetwork()
+        device_network.set_wire_format(COMPACT_WIRE_FORMAT)
+        device_network.connect_to_local_broker(broker, client_id="device")
+        device_network.publish("home/temperature", self.message)
+
+        self.assertEqual({"is_room_temperature_change_needed": True}, ai_network.the_world())
+        ai_network.reset()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,31 @@
+__author__ = "Jerry Overton"
+__copyright__ = "Copyright (C) 2022 appliedAIstudio LLC"
+__version__ = "0.0.1"
+
+# needed to read the json schema file from within the host application
+import pkgutil
+import json
+
+# needed to read the schema and compile its validator only once
+from functools import lru_cache
+
+# refer to the package schema file in the host
+_json_schema_file_path = 'schema.json'
+
+
+@lru_cache(maxsize=None)
+def message_schema():
+    """The json schema every message must follow, read the first time it is needed"""
+    return json.loads(pkgutil.get_data(__name__, _json_schema_file_path).decode("utf-8"))
+
+
+@lru_cache(maxsize=None)
+def message_validator():
+    """A validator compiled once for the message schema. jsonschema is slow to import, so it is only loaded the first
+    time a message is validated"""
+    from jsonschema import Draft4Validator
+    return Draft4Validator(message_schema())
+
+
+def is_valid_message(message):
+    return message_validator().is_valid(message)
@@ -2,10 +2,14 @@
 
 from .info import Info
 
+# needed to report the memory the world takes
+from highcliff.memory import deep_size_of
+
 class World():
     def __init__(self):
         self.__information = {}
         self.__effects = {}
+        self.__trace_ids = {}
 
     def __str__(self):
         return str(self.get_all_info())
@@ -14,7 +18,15 @@ class World():
         try:
             info = Info(topic, message)
             self.__information[info.device] = info
-            self.__effects.update(info.effects)
+
+            # a message without effects, such as a plain reading, leaves the conditions of the world as they are
+            effects = info.effects or {}
+            self.__effects.update(effects)
+
+            # remember which trace last set each condition, so the work it leads to can carry the trace on
+            if info.trace_id is not None:
+                for condition in effects:
+                    self.__trace_ids[condition] = info.trace_id
         except TypeError as err:
             print(f'Unable to proccess message from topic {topic}: {message}')
             raise
@@ -25,6 +37,16 @@ class World():
             world.update(info.get_summary())
         return world
 
+    def trace_ids_of(self, conditions):
+        """Return the trace that last set each of the given conditions, for those set by a traced message"""
+        return {condition: self.__trace_ids[condition] for condition in conditions if condition in self.__trace_ids}
+
+    def memory_report(self, seen=None):
+        """The number of conditions, devices and traced conditions the world keeps, and their size in bytes"""
+        return {"conditions": len(self.__effects), "devices": len(self.__information),
+                "traced_conditions": len(self.__trace_ids),
+                "bytes": deep_size_of([self.__effects, self.__information, self.__trace_ids], seen)}
+
     @property
     def effects(self):
         return self.__effects